@@ -4,21 +4,57 @@
 publish.py — Obsidian 笔记一键发布到 Valaxy 博客
 
 用法:
-    python publish.py <Obsidian笔记的Markdown文件路径>
+    python publish.py <Obsidian笔记的Markdown文件路径> [--plan [-o plan.json]]
+    python publish.py --apply plan.json
+    python publish.py stats [-n 最近次数] [--csv 导出文件]
+    python publish.py check-links [--ttl 小时] [--force]
+    python publish.py check-site [文章...]
+    python publish.py normalize [--dry-run] [-j 进程数]
+    python publish.py maintain [--target 名称] [--no-measure]
+    python publish.py audit-history [--target 名称] [--top 条数]
+
+若 publish_daemon.py 常驻进程正在运行，本脚本只负责交互补全 Front Matter，
+其余步骤交给常驻进程完成。
 
 功能:
     1. 将 Markdown 文件复制到 Valaxy 的 pages/posts/ 目录
-    2. 自动迁移本地图片到 public/assets/ 并更新引用路径
+    2. 自动迁移本地图片及音视频 / PDF 附件到 public/assets/ 并更新引用路径，
+       动图 GIF 转码为 MP4 / 动画 WebP（保留原 GIF 作为回退），内嵌的 base64 图片提取为文件
+       Obsidian 笔记嵌入 ![[笔记]] 内联展开，双链 [[笔记]] 改写为已发布文章的链接
     3. 自动补全 Front Matter（title / date / tags 等）
-    4. 执行 git add / commit / push 完成发布
+    4. 预计算相关文章，写入 public/related-posts.json；更新文章清单 public/posts.json
+    5. 执行 git add / commit / push 完成发布（可在 publish-targets.yaml 中配置镜像目标，并发发布）
 """
 
 import sys
 import os
 import re
+import csv
+import difflib
+import json
 import shutil
+import hmac
+import html
+import base64
+import bisect
+import binascii
+import hashlib
+import functools
+import heapq
+import math
+import time
+import argparse
+import importlib.util
+import mimetypes
+import threading
 import subprocess
-from datetime import datetime
+import http.client
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
 from pathlib import Path
 
 # ━━━━━━━ 修正 Windows 终端编码 ━━━━━━━
@@ -40,6 +76,17 @@ except ImportError:
     print("   pip install pyyaml")
     sys.exit(1)
 
+# ━━━━━━━━━━━ 可选依赖（缺失时跳过对应功能）━━━━━━━━━━━
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image, features as pil_features
+except ImportError:
+    Image = None
+
 # ━━━━━━━━━━━━━━━━ 配置区域 ━━━━━━━━━━━━━━━━
 # Valaxy 博客项目根目录（请根据实际情况修改）
 VALAXY_ROOT = Path(r"D:\myWeb")
@@ -47,10 +94,60 @@ VALAXY_ROOT = Path(r"D:\myWeb")
 POSTS_DIR = VALAXY_ROOT / "pages" / "posts"
 # 图片资源存放目录
 ASSETS_DIR = VALAXY_ROOT / "public" / "assets"
+# Obsidian 库根目录（GUI 的笔记选择器在此建立索引）
+OBSIDIAN_VAULT = Path(r"D:\Obsidian")
 # Obsidian 中常见的附件文件夹名称（脚本会依次搜索）
 OBSIDIAN_ATTACHMENT_NAMES = ["attachments", "assets", "images", "附件", "Attachments"]
 # 支持的图片扩展名
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".bmp", ".ico"}
+# 会被迁移的媒体附件：扩展名 → 引用改写方式（image / video / audio / link）
+MEDIA_EXTENSIONS = {
+    **{ext: "image" for ext in IMAGE_EXTENSIONS},
+    ".mp4": "video", ".webm": "video", ".mov": "video", ".m4v": "video",
+    ".mp3": "audio", ".wav": "audio", ".ogg": "audio", ".m4a": "audio", ".flac": "audio",
+    ".pdf": "link",
+}
+# 常驻进程（publish_daemon.py）监听地址，仅限本机访问
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 4860
+# 不小于该大小的附件分块复制（支持断点续传与进度显示）
+CHUNK_COPY_THRESHOLD = 8 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+# 附件存储后端：git（复制到 public/assets 并随仓库提交，默认）/ directory / s3
+#   directory：{"type": "directory", "path": r"E:\cdn\assets", "base_url": "https://cdn.example.com/assets/"}
+#   s3：{"type": "s3", "endpoint": "https://<S3 兼容接口>", "bucket": "blog-assets", "region": "auto",
+#        "base_url": "https://cdn.example.com/"}，密钥读取环境变量 PUBLISH_S3_ACCESS_KEY / PUBLISH_S3_SECRET_KEY
+# 非 git 后端按内容哈希命名对象，文章中的引用改写为 base_url + 对象名，大文件不再进入仓库历史
+ASSET_STORAGE = {"type": "git"}
+# 动图 GIF 转码：本机有 ffmpeg 时转为 MP4，否则用 Pillow 转为动画 WebP；设为 False 则原样复制
+GIF_TRANSCODE = True
+# 小于该大小的 GIF 不转码（收益太小）
+GIF_TRANSCODE_MIN_BYTES = 256 * 1024
+# 多目标发布配置（镜像站点 / 分支），文件不存在时只发布到 VALAXY_ROOT
+PUBLISH_TARGETS_FILE = Path(__file__).resolve().with_name("publish-targets.yaml")
+# 自定义转换阶段：该文件存在时在转换前导入，其中用 @transform_stage 注册的阶段会加入流水线
+STAGE_PLUGINS_FILE = Path(__file__).resolve().with_name("publish_stages.py")
+# 发布工具的本地缓存目录（已在 .gitignore 中忽略，不会被提交）
+CACHE_DIR = VALAXY_ROOT / ".publish-cache"
+# 外部链接检查：同时检查的域名数、每个域名的并发连接数与两次请求的最小间隔（秒）
+LINK_CHECK_WORKERS = 8
+LINK_CHECK_PER_HOST = 2
+LINK_CHECK_HOST_INTERVAL = 0.5
+# 链接检查结果的缓存有效期（小时），过期的才会重新检查
+LINK_CHECK_TTL_HOURS = 72
+# 相关文章数据输出位置（前端可直接 fetch("/related-posts.json")）
+RELATED_POSTS_FILE = VALAXY_ROOT / "public" / "related-posts.json"
+# 每篇文章保留的相关文章数量
+RELATED_TOP_K = 5
+# 文章清单（slug / 标题 / 日期 / 标签 / 摘要 / 字数 / 阅读时间 / 封面），前端可直接 fetch("/posts.json")
+POSTS_MANIFEST_FILE = VALAXY_ROOT / "public" / "posts.json"
+# 估算阅读时间的速度：每分钟 CJK 字数 / 其它语言词数
+READING_SPEED_CJK = 300
+READING_SPEED_WORDS = 200
+# 笔记嵌入 ![[笔记]] 的最大展开层数，超过时保留为指向该笔记的链接
+TRANSCLUDE_MAX_DEPTH = 4
+# 文章链接前缀：双链 [[笔记]] 改写为 POST_URL_PREFIX + slug
+POST_URL_PREFIX = "/posts/"
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
 
@@ -78,17 +175,252 @@ def parse_front_matter(content: str):
     return None, content
 
 
+class _FrontMatterDumper(yaml.SafeDumper):
+    """列表项缩进两格（tags:\n  - a），与手写文章的习惯一致；不输出 &id001 之类的锚点。"""
+
+    def ignore_aliases(self, data):
+        return True
+
+    def increase_indent(self, flow=False, indentless=False):
+        return super().increase_indent(flow, False)
+
+
 def dump_front_matter(meta: dict, body: str) -> str:
-    """将 Front Matter 字典和正文合并为完整 Markdown 内容。"""
+    """
+    将 Front Matter 字典和正文合并为完整 Markdown 内容，字段原样序列化。
+    需要统一格式时由调用方先经 normalize_front_matter 整理（批量规范化、新建 Front Matter）。
+    """
     # 使用 allow_unicode 以正确显示中文
-    yaml_str = yaml.dump(meta, default_flow_style=False, allow_unicode=True, sort_keys=False)
+    yaml_str = yaml.dump(meta, Dumper=_FrontMatterDumper, default_flow_style=False,
+                         allow_unicode=True, sort_keys=False)
     return f"---\n{yaml_str}---\n{body}"
 
 
+# 规范格式中常用字段的顺序，其余字段按原顺序排在后面
+FRONT_MATTER_ORDER = ("title", "date", "updated", "categories", "tags", "excerpt", "cover")
+
+
+def meta_labels(meta: dict, field: str) -> list[str]:
+    """取出 tags / categories 字段，兼容列表和单个字符串两种写法。"""
+    value = meta.get(field)
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if v is not None and str(v).strip()]
+    if isinstance(value, (str, int, float)) and str(value).strip():
+        return [str(value).strip()]
+    return []
+
+
+def parse_post_date(value) -> datetime | None:
+    """
+    解析 Front Matter 中的日期，无法识别时返回 None。接受 YAML 日期 / 时间对象与字符串：
+    ISO 格式、以 / 分隔的 2026/04/01 10:00，以及不补零的 2026-4-1。
+    规范化（_canonical_datetime）与推送前检查（check_front_matter_schema）共用这一规则。
+    """
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().replace("/", "-")
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _canonical_datetime(value):
+    """日期统一为 datetime（YAML 输出为不带引号的 YYYY-MM-DD HH:MM:SS），无法识别的原样返回。"""
+    parsed = parse_post_date(value)
+    return value if parsed is None else parsed.replace(microsecond=0)
+
+
+def normalize_front_matter(meta: dict) -> dict:
+    """
+    把 Front Matter 整理为统一格式，返回新字典：
+      - date / updated 为 datetime（带引号的字符串、纯日期都统一），缺少 updated 时取 date
+      - categories / tags 为字符串列表，单个字符串转为列表，空值去掉
+      - 数字标题转为字符串
+      - FRONT_MATTER_ORDER 中的字段排在前面，其余字段保持原顺序
+    """
+    meta = dict(meta)
+    for key in ("date", "updated"):
+        if meta.get(key) not in (None, ""):
+            meta[key] = _canonical_datetime(meta[key])
+    if meta.get("date") not in (None, "") and meta.get("updated") in (None, ""):
+        meta["updated"] = meta["date"]
+    for key in ("categories", "tags"):
+        if key in meta:
+            labels = meta_labels(meta, key)
+            if labels:
+                meta[key] = labels
+            else:
+                del meta[key]
+    if isinstance(meta.get("title"), (int, float)) and not isinstance(meta["title"], bool):
+        meta["title"] = str(meta["title"])
+    ordered = {key: meta.pop(key) for key in FRONT_MATTER_ORDER if key in meta}
+    ordered.update(meta)
+    return ordered
+
+
+# 只匹配 Front Matter 本身（不吞掉结束行之后的空行），保证正文逐字节不变
+FRONT_MATTER_RAW_PATTERN = re.compile(r"^---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(\r?\n|$)", re.DOTALL)
+# 顶层字段所在的行：key: / "key": / 'key':（列表项、注释、缩进行属于上一个字段）
+FRONT_MATTER_KEY_PATTERN = re.compile(r"""(?:"([^"\n]*)"|'([^'\n]*)'|([^\s#'"?:\-][^:\n]*?))[ \t]*:(?=[ \t]|\r?\n|$)""")
+
+
+def _front_matter_value(key: str, value):
+    """新写入字段的值按 normalize_front_matter 的规则整理（日期为 datetime，标签 / 分类为列表）。"""
+    if key in ("date", "updated") and value not in (None, ""):
+        return _canonical_datetime(value)
+    if key in ("categories", "tags"):
+        return meta_labels({key: value}, key) or value
+    return value
+
+
+def _same_front_matter_value(key: str, old, new) -> bool:
+    if key in ("date", "updated"):
+        return _canonical_datetime(old) == _canonical_datetime(new)
+    if key in ("categories", "tags"):
+        # 标签 / 分类不分先后（GUI 按字母顺序给出），只是顺序不同时不改写
+        return set(meta_labels({key: old}, key)) == set(meta_labels({key: new}, key))
+    return old == new
+
+
+def _front_matter_spans(yaml_text: str) -> dict[str, tuple[int, int]] | None:
+    """
+    定位每个顶层字段在 YAML 文本中的范围 [起点, 终点)：从字段所在行到其值的最后一行（含换行符），
+    字段之间的空行与顶格注释不计入。遇到重复的键或无法识别的顶格行时返回 None。
+    """
+    spans: dict[str, list[int]] = {}
+    current = None
+    pos = 0
+    for line in yaml_text.splitlines(keepends=True):
+        end = pos + len(line)
+        m = FRONT_MATTER_KEY_PATTERN.match(line)
+        if m:
+            key = next(g for g in m.groups() if g is not None)
+            if key in spans:
+                return None
+            spans[key] = [pos, end]
+            current = key
+        elif line.strip() and not line.startswith("#"):
+            if current is None or not line.startswith((" ", "\t", "-")):
+                return None
+            spans[current][1] = end
+        pos = end
+    return {key: (start, end) for key, (start, end) in spans.items()}
+
+
+def update_front_matter(content: str, changes: dict) -> str:
+    """
+    按 changes 修改或追加 Front Matter 字段，返回新内容。与 dump_front_matter 整体重写不同，
+    未改动的字段逐字节保留（引号、顺序、注释、换行符都不变）：改动的字段原位替换，新字段追加在末尾，
+    正文原样保留。值与原来相同的字段（日期、标签按规范化后的值比较）不算改动，全部相同时原样返回 content。
+    没有 Front Matter 时按 normalize_front_matter 的格式新建；原有 YAML 无法逐字段定位时，
+    退回 dump_front_matter 整体重写（原有字段的值不做规范化）。
+    """
+    meta, body = parse_front_matter(content)
+    if meta is None:
+        return dump_front_matter(normalize_front_matter(changes), body)
+    changes = {key: _front_matter_value(key, value) for key, value in changes.items()
+               if key not in meta or not _same_front_matter_value(key, meta[key], value)}
+    if not changes:
+        return content
+
+    fm = FRONT_MATTER_RAW_PATTERN.match(content)
+    spans = _front_matter_spans(fm.group(1)) if fm else None
+    if spans is None or set(spans) != {str(key) for key in meta}:
+        return dump_front_matter({**meta, **changes}, body)
+
+    yaml_text = fm.group(1)
+    eol = "\r\n" if "\r\n" in fm.group(0) else "\n"
+
+    def render(key: str, value) -> str:
+        text = yaml.dump({key: value}, Dumper=_FrontMatterDumper, default_flow_style=False,
+                         allow_unicode=True, sort_keys=False)
+        return text.rstrip("\n").replace("\n", eol)
+
+    # 从后往前替换，前面字段的偏移量不受影响
+    edits = sorted(((spans[key], key) for key in changes if key in spans), reverse=True)
+    for (start, end), key in edits:
+        newline = eol if yaml_text[start:end].endswith("\n") else ""
+        yaml_text = yaml_text[:start] + render(key, changes[key]) + newline + yaml_text[end:]
+    for key in changes:
+        if key not in spans:
+            yaml_text += (eol if yaml_text else "") + render(key, changes[key])
+
+    # 校验：按原样解析新旧 YAML，除改动的字段外必须完全一致
+    try:
+        # 空的或只有注释的 Front Matter 解析为 None，按空字典处理
+        valid = (yaml.safe_load(yaml_text + eol) or {}) == {**(yaml.safe_load(fm.group(1) + eol) or {}), **changes}
+    except yaml.YAMLError:
+        valid = False
+    if not valid:
+        return dump_front_matter({**meta, **changes}, body)
+    start, end = fm.span(1)
+    return content[:start] + yaml_text + content[end:]
+
+
 # ──────────────────────────────────────────
 #  图片处理
 # ──────────────────────────────────────────
 
+# 标准 Markdown 图片 ![alt](path)，排除 http/https 开头的远程链接
+MD_IMAGE_PATTERN = re.compile(r"!\[([^\]]*)\]\((?!https?://)([^)]+)\)")
+# Obsidian Wiki 嵌入 ![[filename.png]] 或 ![[filename.png|alt text]]
+WIKI_EMBED_PATTERN = re.compile(r"!\[\[([^\]|]+?)(\|[^\]]*)?\]\]")
+
+
+def iter_local_media_refs(content: str):
+    """
+    按出现顺序列出笔记中引用的本地媒体附件，产出 (引用路径, 媒体类型)。
+    与 migrate_images 使用相同的匹配规则；已迁移的 /assets/、/images/ 路径不计入。
+    """
+    refs = []
+    for m in MD_IMAGE_PATTERN.finditer(content):
+        ref = m.group(2).strip()
+        if not ref.startswith(("/assets/", "/images/")):
+            refs.append((m.start(), ref))
+    for m in WIKI_EMBED_PATTERN.finditer(content):
+        refs.append((m.start(), m.group(1).strip()))
+    for _, ref in sorted(refs):
+        kind = MEDIA_EXTENSIONS.get(Path(ref).suffix.lower())
+        if kind:
+            yield ref, kind
+
+
+MD_LINK_URL_PATTERN = re.compile(r"\]\(\s*<?(https?://[^)\s>]+)")
+AUTOLINK_PATTERN = re.compile(r"<(https?://[^>\s]+)>")
+HTML_URL_PATTERN = re.compile(r"""\b(?:href|src)\s*=\s*["'](https?://[^"'\s]+)["']""", re.IGNORECASE)
+FRONT_MATTER_URL_PATTERN = re.compile(r"""^[ \t-]*[\w-]+:[ \t]*["']?(https?://[^\s"']+)""", re.MULTILINE)
+CODE_PATTERN = re.compile(r"^(```|~~~).*?^\1[^\n]*$|`[^`\n]+`", re.MULTILINE | re.DOTALL)
+
+
+def iter_external_links(content: str):
+    """
+    按出现顺序列出笔记中的外部链接，产出 (URL, 行号)。
+    覆盖 Markdown 链接 / 图片、<自动链接>、HTML href / src，以及 Front Matter 中的 URL 值
+    （友链页面的 url / avatar）；代码块与行内代码中的 URL 不计入。
+    """
+    # 代码替换为等长空白，保持偏移量（行号）不变
+    masked = CODE_PATTERN.sub(lambda m: re.sub(r"[^\n]", " ", m.group(0)), content)
+    found = []
+    fm = re.match(r"^---\s*\n.*?\n---\s*(?:\n|$)", masked, re.DOTALL)
+    if fm:
+        found += [(m.start(1), m.group(1)) for m in FRONT_MATTER_URL_PATTERN.finditer(masked, 0, fm.end())]
+    for pattern in (MD_LINK_URL_PATTERN, AUTOLINK_PATTERN, HTML_URL_PATTERN):
+        found += [(m.start(1), m.group(1)) for m in pattern.finditer(masked, fm.end() if fm else 0)]
+    for offset, url in sorted(found):
+        yield url, masked.count("\n", 0, offset) + 1
+
+
 def find_image_file(image_ref: str, md_file_path: Path) -> Path | None:
     """
     根据图片引用路径，在 Obsidian 笔记所在目录及其附件子目录中搜索图片文件。
@@ -133,392 +465,4387 @@ def find_image_file(image_ref: str, md_file_path: Path) -> Path | None:
     return None
 
 
-def migrate_images(content: str, md_file_path: Path) -> str:
+def _unique_asset_dest(src: Path) -> Path:
+    """目标路径：默认同名；已存在且大小不同的同名文件时追加时间戳避免冲突。"""
+    dest = ASSETS_DIR / src.name
+    if dest.exists() and dest.stat().st_size != src.stat().st_size:
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        dest = ASSETS_DIR / f"{src.stem}_{timestamp}{src.suffix}"
+    return dest
+
+
+def copy_file_resumable(src: Path, dest: Path, progress=None, chunk_size: int = COPY_CHUNK_SIZE) -> Path:
     """
-    识别 Markdown 中的本地图片链接，将图片复制到 Valaxy 的 assets 目录，
-    并更新 Markdown 中的引用路径。支持：
-      - 标准 Markdown: ![alt](path/to/image.png)
-      - Obsidian Wiki:  ![[image.png]]  或  ![[image.png|alt]]
+    分块复制大文件，支持断点续传与完整性校验：
+      - 复制过程写入 .publish-cache/partial/ 下的 .part 文件，完成后再原子替换到 dest，
+        中断时不会在 public/ 留下半个文件（也就不会被 git add 提交）
+      - .part 按源文件路径的哈希命名（目标名可能带时间戳，每次不同），
+        再次复制同一源文件（路径 / 大小 / 修改时间均未变）时从 .part 末尾继续，
+        已复制部分先与源文件对应前缀比对哈希，不一致则从头复制
+      - 结束时校验大小与 SHA-256
+    progress(copied_bytes, total_bytes) 在每个分块后回调。
     """
-    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
-    migrated_count = 0
+    st = src.stat()
+    total = st.st_size
+    partial_dir = CACHE_DIR / "partial"
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    key = hashlib.sha1(str(src.resolve()).encode("utf-8")).hexdigest()[:16]
+    part = partial_dir / f"{key}{src.suffix}.part"
+    marker = partial_dir / f"{key}{src.suffix}.part.json"
+    identity = {"source": str(src), "size": total, "mtime_ns": st.st_mtime_ns}
 
-    # ── 处理标准 Markdown 图片 ──
-    # 匹配 ![alt](path)，排除 http/https 开头的远程链接
-    md_img_pattern = re.compile(r"!\[([^\]]*)\]\((?!https?://)([^)]+)\)")
+    offset = 0
+    if part.exists():
+        try:
+            saved = json.loads(marker.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            saved = None
+        if saved == identity and part.stat().st_size <= total:
+            offset = part.stat().st_size
+    marker.write_text(json.dumps(identity, ensure_ascii=False), encoding="utf-8")
 
-    def replace_md_image(match):
-        nonlocal migrated_count
-        alt_text = match.group(1)
-        img_path_raw = match.group(2).strip()
+    src_hash = hashlib.sha256()
+    with open(src, "rb") as fin:
+        if offset:
+            # 校验已复制的前缀，确认可以续传
+            part_hash = hashlib.sha256()
+            with open(part, "rb") as fpart:
+                while chunk := fpart.read(chunk_size):
+                    part_hash.update(chunk)
+            remaining = offset
+            while remaining:
+                chunk = fin.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                src_hash.update(chunk)
+                remaining -= len(chunk)
+            if remaining or part_hash.digest() != src_hash.digest():
+                offset = 0
+                fin.seek(0)
+                src_hash = hashlib.sha256()
 
-        # 跳过已经是 /assets/ 路径的图片（已迁移过）
-        if img_path_raw.startswith("/assets/"):
-            return match.group(0)
+        copied = offset
+        if progress:
+            progress(copied, total)
+        with open(part, "ab" if offset else "wb") as fout:
+            while chunk := fin.read(chunk_size):
+                fout.write(chunk)
+                src_hash.update(chunk)
+                copied += len(chunk)
+                if progress:
+                    progress(copied, total)
 
-        # 跳过已经是 /images/ 路径的图片（博客原有图片）
-        if img_path_raw.startswith("/images/"):
-            return match.group(0)
+    # ── 完整性校验：大小 + 哈希 ──
+    dest_hash = hashlib.sha256()
+    with open(part, "rb") as fpart:
+        while chunk := fpart.read(chunk_size):
+            dest_hash.update(chunk)
+    if part.stat().st_size != total or dest_hash.digest() != src_hash.digest():
+        part.unlink(missing_ok=True)
+        marker.unlink(missing_ok=True)
+        raise OSError(f"复制校验失败：{src.name}（源文件可能在复制过程中被修改）")
 
-        img_file = find_image_file(img_path_raw, md_file_path)
-        if img_file:
-            dest = ASSETS_DIR / img_file.name
-            # 如果目标已存在同名文件，添加时间戳避免冲突
-            if dest.exists() and dest.stat().st_size != img_file.stat().st_size:
-                stem = img_file.stem
-                suffix = img_file.suffix
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                dest = ASSETS_DIR / f"{stem}_{timestamp}{suffix}"
-            shutil.copy2(str(img_file), str(dest))
-            migrated_count += 1
-            print(f"  📷 已迁移图片: {img_file.name} → public/assets/{dest.name}")
-            return f"![{alt_text}](/assets/{dest.name})"
-        else:
-            print(f"  ⚠️  警告：未找到图片文件「{img_path_raw}」，保留原始引用")
-            return match.group(0)
+    shutil.copystat(str(src), str(part))
+    os.replace(part, dest)
+    marker.unlink(missing_ok=True)
+    return dest
 
-    content = md_img_pattern.sub(replace_md_image, content)
 
-    # ── 处理 Obsidian Wiki 链接图片 ──
-    # 匹配 ![[filename.png]] 或 ![[filename.png|alt text]]
-    wiki_img_pattern = re.compile(r"!\[\[([^\]|]+?)(\|[^\]]*)?\]\]")
+def copy_asset(src: Path, progress=None, stats: dict | None = None, dest: Path | None = None) -> Path:
+    """
+    把附件复制到 ASSETS_DIR，大文件走分块续传。返回目标路径。
+    dest 为调用方已确定的目标路径，默认按 _unique_asset_dest 计算。
+    目标已存在且大小、修改时间均与源文件一致时跳过复制（copy2 会保留修改时间）。
+    stats 字典（可选）累计 bytes_copied / bytes_skipped。
+    """
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    dest = dest or _unique_asset_dest(src)
+    st = src.stat()
+    if stats is None:
+        stats = {}
 
-    def replace_wiki_image(match):
-        nonlocal migrated_count
-        img_ref = match.group(1).strip()
-        alt_part = match.group(2)
-        alt_text = alt_part[1:].strip() if alt_part else Path(img_ref).stem
+    if dest.exists():
+        dst = dest.stat()
+        if dst.st_size == st.st_size and int(dst.st_mtime) == int(st.st_mtime):
+            stats["bytes_skipped"] = stats.get("bytes_skipped", 0) + st.st_size
+            if progress:
+                progress(st.st_size, st.st_size)
+            return dest
 
-        # 检查是否是图片文件
-        ext = Path(img_ref).suffix.lower()
-        if ext not in IMAGE_EXTENSIONS:
-            return match.group(0)  # 不是图片，保留原样
-
-        img_file = find_image_file(img_ref, md_file_path)
-        if img_file:
-            dest = ASSETS_DIR / img_file.name
-            if dest.exists() and dest.stat().st_size != img_file.stat().st_size:
-                stem = img_file.stem
-                suffix = img_file.suffix
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                dest = ASSETS_DIR / f"{stem}_{timestamp}{suffix}"
-            shutil.copy2(str(img_file), str(dest))
-            migrated_count += 1
-            print(f"  📷 已迁移图片: {img_file.name} → public/assets/{dest.name}")
-            return f"![{alt_text}](/assets/{dest.name})"
-        else:
-            print(f"  ⚠️  警告：未找到图片文件「{img_ref}」，保留原始引用")
-            return match.group(0)
+    stats["bytes_copied"] = stats.get("bytes_copied", 0) + st.st_size
+    if st.st_size >= CHUNK_COPY_THRESHOLD:
+        return copy_file_resumable(src, dest, progress=progress)
+    # 先复制到缓存目录再原子替换，避免并发发布暂存到不完整的文件
+    partial_dir = CACHE_DIR / "partial"
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    tmp = partial_dir / f"{dest.name}.{os.getpid()}.tmp"
+    shutil.copy2(str(src), str(tmp))
+    os.replace(tmp, dest)
+    if progress:
+        size = dest.stat().st_size
+        progress(size, size)
+    return dest
 
-    content = wiki_img_pattern.sub(replace_wiki_image, content)
 
-    if migrated_count == 0:
-        print("  ℹ️  未发现需要迁移的本地图片")
-    else:
-        print(f"  ✅ 共迁移 {migrated_count} 张图片")
+# ──────────────────────────────────────────
+#  取消发布
+# ──────────────────────────────────────────
 
-    return content
+class PublishCancelled(Exception):
+    """发布被用户取消（CancelToken.check 抛出）。"""
+
+
+class CancelToken:
+    """协作式取消令牌：界面线程调用 cancel()，发布线程在各个检查点调用 check()。"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise PublishCancelled("发布已取消")
 
 
 # ──────────────────────────────────────────
-#  标签处理
+#  附件存储后端
 # ──────────────────────────────────────────
 
-def collect_existing_tags() -> list[str]:
-    """扫描 pages/posts/ 目录下所有文章，收集已有标签并按出现频率排序。"""
-    tag_count: dict[str, int] = {}
-    if not POSTS_DIR.exists():
-        return []
+ASSET_HASH_INDEX = "asset-hashes.json"
 
-    for md_file in POSTS_DIR.glob("*.md"):
-        try:
-            text = md_file.read_text(encoding="utf-8")
-        except Exception:
-            continue
-        meta, _ = parse_front_matter(text)
-        if meta and "tags" in meta:
-            tags = meta["tags"]
-            if isinstance(tags, list):
-                for t in tags:
-                    tag_str = str(t).strip()
-                    if tag_str:
-                        tag_count[tag_str] = tag_count.get(tag_str, 0) + 1
-            elif isinstance(tags, str):
-                tag_str = tags.strip()
-                if tag_str:
-                    tag_count[tag_str] = tag_count.get(tag_str, 0) + 1
 
-    # 按频率降序排列
-    sorted_tags = sorted(tag_count.items(), key=lambda x: x[1], reverse=True)
-    return [t[0] for t in sorted_tags]
+class GitAssetStore:
+    """默认后端：复制到 public/assets/，随文章一起提交到仓库。"""
+
+    base_url = "/assets/"
+
+    def put(self, src: Path, name: str | None = None, progress=None, stats: dict | None = None,
+            created: list | None = None) -> str:
+        """
+        保存附件并返回引用 URL。name 指定目标文件名（如转码产物沿用原图的文件名）。
+        created 列表（可选）记录本次新建的文件，取消发布时据此回滚。
+        """
+        # 目标路径只计算一次，created 记录的就是实际写入的文件
+        dest = ASSETS_DIR / name if name else _unique_asset_dest(src)
+        if created is not None and not dest.exists():
+            created.append(dest)
+        return f"/assets/{copy_asset(src, progress=progress, stats=stats, dest=dest).name}"
 
+    def label(self, url: str) -> str:
+        return "public" + url
 
-def interactive_tags() -> list[str]:
+    def close(self):
+        pass
+
+
+class HashedAssetStore(ABC):
     """
-    交互式标签选择：
-      - 列出博客已有标签供用户选择（输入序号，逗号分隔）
-      - 也可直接输入新标签
+    按内容哈希命名对象的存储后端基类：同一文件只上传一次，改名或在多篇文章中引用都不会重复存储。
+    「路径 + 大小 + 修改时间 → SHA-256」的映射缓存在 .publish-cache/asset-hashes.json，
+    未修改的大文件无需重新计算哈希。子类实现 _exists / _upload。
     """
-    existing_tags = collect_existing_tags()
 
-    print("\n🏷️  标签设置")
-    print("─" * 40)
+    def __init__(self, base_url: str):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self._index_file = CACHE_DIR / ASSET_HASH_INDEX
+        try:
+            self._hashes: dict[str, str] = json.loads(self._index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._hashes = {}
 
-    if existing_tags:
-        print("博客已有标签：")
-        for i, tag in enumerate(existing_tags, 1):
-            print(f"  [{i:2d}] {tag}")
-        print()
-        print("请输入标签序号（逗号分隔）或直接输入新标签名称（逗号分隔）")
-        print("也可混合使用，例如: 1,3,新标签名")
-        print("直接回车跳过标签设置")
-    else:
-        print("博客暂无已有标签，请输入新标签（逗号分隔）：")
-        print("直接回车跳过标签设置")
+    def object_key(self, src: Path) -> str:
+        st = src.stat()
+        ident = f"{src}|{st.st_size}|{st.st_mtime_ns}"
+        digest = self._hashes.get(ident)
+        if digest is None:
+            digest = _file_sha256(src)
+            self._hashes[ident] = digest
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(self._index_file, json.dumps(self._hashes))
+        return f"{digest[:24]}{src.suffix.lower()}"
 
-    print("─" * 40)
-    user_input = input("👉 标签: ").strip()
+    def put(self, src: Path, name: str | None = None, progress=None, stats: dict | None = None,
+            created: list | None = None) -> str:
+        key = self.object_key(src)
+        size = src.stat().st_size
+        if stats is None:
+            stats = {}
+        if self._exists(key):
+            stats["bytes_skipped"] = stats.get("bytes_skipped", 0) + size
+            if progress:
+                progress(size, size)
+        else:
+            self._upload(src, key, progress)
+            stats["bytes_copied"] = stats.get("bytes_copied", 0) + size
+            local = self.local_path(key)
+            if created is not None and local is not None:
+                created.append(local)
+        return self.object_url(key)
 
-    if not user_input:
-        return []
+    def local_path(self, key: str) -> Path | None:
+        """对象在本机上的路径（可回滚删除）；远程存储返回 None。"""
+        return None
 
-    selected_tags = []
-    parts = [p.strip() for p in user_input.split(",") if p.strip()]
+    def object_url(self, key: str) -> str:
+        return self.base_url + urllib.parse.quote(key)
 
-    for part in parts:
-        # 尝试解析为数字序号
-        try:
-            idx = int(part)
-            if 1 <= idx <= len(existing_tags):
-                tag = existing_tags[idx - 1]
-                if tag not in selected_tags:
-                    selected_tags.append(tag)
-            else:
-                print(f"  ⚠️  序号 {idx} 超出范围，已忽略")
-        except ValueError:
-            # 不是数字，视为新标签
-            if part not in selected_tags:
-                selected_tags.append(part)
+    def label(self, url: str) -> str:
+        return url
 
-    if selected_tags:
-        print(f"  ✅ 已选择标签: {', '.join(selected_tags)}")
+    def close(self):
+        pass
 
-    return selected_tags
+    @abstractmethod
+    def _exists(self, key: str) -> bool:
+        """对象是否已存在。"""
 
+    @abstractmethod
+    def _upload(self, src: Path, key: str, progress=None):
+        """上传 src 为对象 key，progress(已传字节, 总字节) 报告进度。"""
 
-# ──────────────────────────────────────────
-#  Front Matter 补全
-# ──────────────────────────────────────────
 
-def ensure_front_matter(content: str, title: str) -> str:
-    """
-    检查并补全 Front Matter：
-      - 没有 Front Matter → 自动生成（title, date, tags 交互选择）
-      - 有 Front Matter 但缺少 tags → 交互补全
-      - 有 Front Matter 且完整 → 保持不变
-    """
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    meta, body = parse_front_matter(content)
+class DirectoryAssetStore(HashedAssetStore):
+    """本地目录（或挂载到本机的对象存储 / CDN 源站目录）。"""
 
-    if meta is None:
-        # ── 完全没有 Front Matter，生成一个 ──
-        print("\n📝 未检测到 Front Matter，正在自动生成...")
-        tags = interactive_tags()
-        meta = {
-            "title": title,
-            "date": now_str,
-            "updated": now_str,
-        }
-        if tags:
-            meta["tags"] = tags
+    def __init__(self, path: Path, base_url: str):
+        super().__init__(base_url)
+        self.path = path
 
-        # 询问分类
-        print("\n📂 请输入文章分类（直接回车跳过）：")
-        category = input("👉 分类: ").strip()
-        if category:
-            meta["categories"] = [category]
+    def _exists(self, key: str) -> bool:
+        return (self.path / key).is_file()
 
-        # 询问摘要
-        print("\n📋 请输入文章摘要（直接回车跳过）：")
-        excerpt = input("👉 摘要: ").strip()
-        if excerpt:
-            meta["excerpt"] = excerpt
+    def local_path(self, key: str) -> Path | None:
+        return self.path / key
 
-        return dump_front_matter(meta, body)
+    def _upload(self, src: Path, key: str, progress=None):
+        # 临时文件放在目标目录内，保证 os.replace 不跨磁盘
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / f".{key}.{os.getpid()}.tmp"
+        total = src.stat().st_size
+        copied = 0
+        try:
+            with open(src, "rb") as fin, open(tmp, "wb") as fout:
+                while chunk := fin.read(COPY_CHUNK_SIZE):
+                    fout.write(chunk)
+                    copied += len(chunk)
+                    if progress:
+                        progress(copied, total)
+            os.replace(tmp, self.path / key)
+        finally:
+            tmp.unlink(missing_ok=True)
 
-    else:
-        # ── 已有 Front Matter，检查缺失字段 ──
-        changed = False
 
-        if "title" not in meta or not meta["title"]:
-            meta["title"] = title
-            changed = True
+class _ProgressReader:
+    """包装文件对象，http.client 流式上传时每读一块回调一次进度。"""
 
-        if "date" not in meta or not meta["date"]:
-            meta["date"] = now_str
-            changed = True
+    def __init__(self, fh, total: int, progress=None):
+        self._fh = fh
+        self._total = total
+        self._progress = progress
+        self._read = 0
 
-        if "updated" not in meta:
-            meta["updated"] = now_str
-            changed = True
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._fh.read(size)
+        self._read += len(chunk)
+        if self._progress and chunk:
+            self._progress(self._read, self._total)
+        return chunk
 
-        # 检查 tags
-        if "tags" not in meta or not meta["tags"]:
-            print(f"\n📝 文章已有 Front Matter，但缺少标签（tags）")
-            tags = interactive_tags()
-            if tags:
-                meta["tags"] = tags
-                changed = True
 
-        if changed:
-            return dump_front_matter(meta, body)
-        else:
-            print("  ✅ Front Matter 已完整，无需修改")
-            return content
+class S3AssetStore(HashedAssetStore):
+    """
+    S3 兼容对象存储（AWS S3 / Cloudflare R2 / MinIO 等），路径风格寻址，
+    用标准库实现 AWS Signature V4 签名，文件流式上传，连接在一次迁移中复用。
+    """
 
+    def __init__(self, endpoint: str, bucket: str, base_url: str, region: str = "us-east-1",
+                 access_key: str = "", secret_key: str = "", prefix: str = ""):
+        super().__init__(base_url)
+        parts = urllib.parse.urlsplit(endpoint)
+        self.scheme = parts.scheme or "https"
+        self.host = parts.netloc
+        self.bucket = bucket
+        self.region = region
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.access_key = access_key or os.environ.get("PUBLISH_S3_ACCESS_KEY", "")
+        self.secret_key = secret_key or os.environ.get("PUBLISH_S3_SECRET_KEY", "")
+        if not self.access_key or not self.secret_key:
+            raise ValueError("S3 存储缺少密钥（设置 PUBLISH_S3_ACCESS_KEY / PUBLISH_S3_SECRET_KEY）")
+        self._conn = None
 
-# ──────────────────────────────────────────
-#  Git 操作
-# ──────────────────────────────────────────
+    def object_url(self, key: str) -> str:
+        # base_url 指向桶（或 CDN）根目录，对象名带上前缀
+        return self.base_url + urllib.parse.quote(self.prefix + key)
 
-def run_git_command(args: list[str], error_msg: str) -> bool:
-    """执行 Git 命令，返回是否成功。"""
-    try:
-        result = subprocess.run(
-            ["git"] + args,
-            cwd=str(VALAXY_ROOT),
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-        )
-        if result.returncode != 0:
-            print(f"❌ {error_msg}")
-            print(f"   Git 输出: {result.stderr.strip() or result.stdout.strip()}")
-            return False
-        return True
-    except FileNotFoundError:
-        print("❌ 错误：未找到 Git 命令，请确保 Git 已安装并在 PATH 中")
-        return False
-    except Exception as e:
-        print(f"❌ 执行 Git 命令时出错: {e}")
-        return False
+    def _sign(self, method: str, path: str, headers: dict, payload_hash: str, now: datetime) -> dict:
+        """AWS Signature V4：返回加上 x-amz-* 与 Authorization 头后的请求头。"""
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = amz_date[:8]
+        headers = {**headers, "host": self.host,
+                   "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+        signed = ";".join(sorted(k.lower() for k in headers))
+        canonical = "\n".join([
+            method, path, "",
+            "".join(f"{k.lower()}:{str(headers[k]).strip()}\n" for k in sorted(headers, key=str.lower)),
+            signed, payload_hash,
+        ])
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                             hashlib.sha256(canonical.encode()).hexdigest()])
+        key_bytes = ("AWS4" + self.secret_key).encode()
+        for part in (datestamp, self.region, "s3", "aws4_request"):
+            key_bytes = hmac.new(key_bytes, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key_bytes, to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["Authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed}, Signature={signature}")
+        return headers
 
+    def _request(self, method: str, key: str, body=None, payload_hash: str = hashlib.sha256(b"").hexdigest(),
+                 headers: dict | None = None):
+        path = "/" + urllib.parse.quote(f"{self.bucket}/{self.prefix}{key}", safe="/-_.~")
+        headers = self._sign(method, path, headers or {}, payload_hash, datetime.now(timezone.utc))
 
-def git_publish(title: str) -> bool:
-    """执行 git add / commit / push 三步发布。"""
-    print("\n🚀 开始 Git 发布流程...")
-    print("─" * 40)
+        for attempt in range(2):
+            if self._conn is None:
+                cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+                self._conn = cls(self.host, timeout=60)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                resp = self._conn.getresponse()
+                data = resp.read()
+                return resp.status, data
+            except (OSError, http.client.HTTPException):
+                self._conn.close()
+                self._conn = None
+                # keep-alive 连接可能已被服务端关闭；无请求体（HEAD）时重试一次
+                if attempt or body is not None:
+                    raise
 
-    # git add .
-    print("  ▶ git add .")
-    if not run_git_command(["add", "."], "执行 git add 失败"):
-        return False
-    print("    ✅ 暂存完成")
+    def _exists(self, key: str) -> bool:
+        status, _ = self._request("HEAD", key)
+        return status == 200
 
-    # git commit
-    commit_msg = f"feat: publish {title}"
-    print(f"  ▶ git commit -m \"{commit_msg}\"")
-    if not run_git_command(["commit", "-m", commit_msg], "执行 git commit 失败（可能没有更改需要提交）"):
-        return False
-    print("    ✅ 提交完成")
+    def _upload(self, src: Path, key: str, progress=None):
+        size = src.stat().st_size
+        content_type = mimetypes.guess_type(src.name)[0] or "application/octet-stream"
+        # 对象名即内容哈希前缀，这里仍按 SigV4 要求计算整个文件的 SHA-256
+        payload_hash = _file_sha256(src)
+        with open(src, "rb") as fh:
+            status, data = self._request(
+                "PUT", key, body=_ProgressReader(fh, size, progress), payload_hash=payload_hash,
+                headers={"Content-Length": str(size), "Content-Type": content_type,
+                         "Cache-Control": "public, max-age=31536000, immutable"},
+            )
+        if status not in (200, 201):
+            raise OSError(f"上传 {src.name} 失败：HTTP {status} {data[:200].decode('utf-8', 'replace')}")
 
-    # git push
-    print("  ▶ git push")
-    if not run_git_command(["push"], "执行 git push 失败（请检查网络连接或远程仓库配置）"):
-        return False
-    print("    ✅ 推送完成")
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
 
-    return True
+
+def get_asset_store():
+    """按 ASSET_STORAGE 配置创建附件存储后端，配置有误时抛出 ValueError。"""
+    config = dict(ASSET_STORAGE or {"type": "git"})
+    kind = config.pop("type", "git")
+    if kind == "git":
+        return GitAssetStore()
+    if not config.get("base_url"):
+        raise ValueError(f"附件存储 {kind} 缺少 base_url")
+    if kind == "directory":
+        if not config.get("path"):
+            raise ValueError("附件存储 directory 缺少 path")
+        return DirectoryAssetStore(Path(config["path"]), config["base_url"])
+    if kind == "s3":
+        if not config.get("endpoint") or not config.get("bucket"):
+            raise ValueError("附件存储 s3 缺少 endpoint 或 bucket")
+        return S3AssetStore(**config)
+    raise ValueError(f"未知的附件存储类型：{kind}")
 
 
 # ──────────────────────────────────────────
-#  主流程
+#  动图 GIF 转码
 # ──────────────────────────────────────────
 
-def main():
-    print()
-    print("╔══════════════════════════════════════════╗")
-    print("║   📖 Obsidian → Valaxy 一键发布工具     ║")
-    print("╚══════════════════════════════════════════╝")
-    print()
+TRANSCODE_DIR = "transcode"
+TRANSCODE_VERSION = 1
 
-    # ── 1. 参数检查 ──
-    if len(sys.argv) < 2:
-        print("❌ 错误：请提供 Markdown 文件路径作为参数")
-        print("   用法: python publish.py <Markdown文件路径>")
-        print('   示例: python publish.py "D:\\Obsidian\\笔记\\我的文章.md"')
-        sys.exit(1)
 
-    source_path = Path(sys.argv[1]).resolve()
+def _skip_gif_sub_blocks(f) -> bool:
+    """跳过一串 GIF 数据子块（长度字节 + 数据，以 0 结尾），文件被截断时返回 False。"""
+    while True:
+        size = f.read(1)
+        if not size:
+            return False
+        if size[0] == 0:
+            return True
+        f.seek(size[0], os.SEEK_CUR)
 
-    # ── 2. 文件存在性检查 ──
-    if not source_path.exists():
-        print(f"❌ 错误：文件不存在 → {source_path}")
-        sys.exit(1)
 
-    if not source_path.is_file():
-        print(f"❌ 错误：路径不是文件 → {source_path}")
-        sys.exit(1)
+def is_animated_gif(path: Path) -> bool:
+    """
+    判断 GIF 是否为多帧动图：按块结构遍历文件，统计图像描述符（0x2C）的数量。
+    只跳过数据子块而不解码像素；直接搜索字节序列会误把像素数据中的同样字节当成帧。
+    """
+    with open(path, "rb") as f:
+        if f.read(6) not in (b"GIF87a", b"GIF89a"):
+            return False
+        screen = f.read(7)
+        if len(screen) < 7:
+            return False
+        if screen[4] & 0x80:  # 全局颜色表
+            f.seek(3 << ((screen[4] & 0x07) + 1), os.SEEK_CUR)
+        frames = 0
+        while True:
+            block = f.read(1)
+            if block == b"\x2c":  # 图像描述符
+                frames += 1
+                if frames > 1:
+                    return True
+                desc = f.read(9)
+                if len(desc) < 9:
+                    return False
+                if desc[8] & 0x80:  # 局部颜色表
+                    f.seek(3 << ((desc[8] & 0x07) + 1), os.SEEK_CUR)
+                f.read(1)  # LZW 最小码长
+                if not _skip_gif_sub_blocks(f):
+                    return False
+            elif block == b"\x21":  # 扩展块：标签 + 子块
+                f.read(1)
+                if not _skip_gif_sub_blocks(f):
+                    return False
+            else:  # 0x3B 结束符、文件末尾或损坏的数据
+                return False
 
-    if source_path.suffix.lower() not in (".md", ".markdown"):
-        print(f"❌ 错误：文件不是 Markdown 格式（{source_path.suffix}）")
-        sys.exit(1)
 
-    # 从文件名提取文章标题（去掉扩展名）
-    title = source_path.stem
-    print(f"📄 源文件: {source_path}")
-    print(f"📌 文章标题: {title}")
+def gif_transcode_format() -> str | None:
+    """本机可用的转码目标：ffmpeg → mp4，Pillow（含 WebP 支持）→ webp，都没有则 None。"""
+    if not GIF_TRANSCODE:
+        return None
+    if shutil.which("ffmpeg"):
+        return "mp4"
+    if Image is not None and pil_features.check("webp"):
+        return "webp"
+    return None
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _transcode_gif(src: str, out: str, fmt: str) -> bool:
+    """
+    进程池中执行的转码任务：把 src 转为 out（先写临时文件再原子替换）。
+    转码结果不比原 GIF 小时放弃，返回 False。
+    """
+    tmp = f"{out}.{os.getpid()}.tmp"
+    try:
+        if fmt == "mp4":
+            subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-i", src,
+                 "-movflags", "+faststart", "-pix_fmt", "yuv420p",
+                 "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+                 "-c:v", "libx264", "-crf", "26", "-an", "-f", "mp4", tmp],
+                check=True, capture_output=True,
+            )
+        else:
+            with Image.open(src) as im:
+                im.save(tmp, "WEBP", save_all=True, loop=0, quality=80, method=4)
+        if os.path.getsize(tmp) >= os.path.getsize(src):
+            return False
+        os.replace(tmp, out)
+        return True
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class GifTranscoder:
+    """
+    迁移前扫描出所有动图 GIF，提交到进程池并行转码，复制其它附件时转码同时进行。
+    结果按 GIF 内容哈希缓存在 .publish-cache/transcode/，同一张动图只转码一次；
+    转码后不比原图小的也记录下来（.skip），下次直接跳过。
+    """
+
+    def __init__(self, sources: list[Path], log=print):
+        self.fmt = gif_transcode_format()
+        self.cache_dir = CACHE_DIR / TRANSCODE_DIR
+        self._jobs: dict[Path, tuple[Path, object]] = {}
+        self._pool = None
+        if not self.fmt:
+            return
+
+        pending = []
+        for src in dict.fromkeys(sources):
+            try:
+                if src.stat().st_size < GIF_TRANSCODE_MIN_BYTES or not is_animated_gif(src):
+                    continue
+                digest = _file_sha256(src)
+            except OSError:
+                continue
+            out = self.cache_dir / f"{digest}-v{TRANSCODE_VERSION}.{self.fmt}"
+            if out.exists():
+                self._jobs[src] = (out, True)
+            elif out.with_suffix(".skip").exists():
+                self._jobs[src] = (out, False)
+            else:
+                pending.append((src, out))
+
+        if pending:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            log(f"  🎬 后台转码 {len(pending)} 张动图 GIF → {self.fmt.upper()}")
+            self._pool = ProcessPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1))
+            for src, out in pending:
+                self._jobs[src] = (out, self._pool.submit(_transcode_gif, str(src), str(out), self.fmt))
+
+    def result(self, src: Path, log=print) -> Path | None:
+        """等待 src 的转码结果，返回缓存中的输出文件；不需要转码或转码失败时返回 None。"""
+        job = self._jobs.get(src)
+        if job is None:
+            return None
+        out, done = job
+        if not isinstance(done, bool):
+            try:
+                done = done.result()
+            except Exception as e:
+                log(f"  ⚠️  警告：动图「{src.name}」转码失败，保留 GIF：{e}")
+                done = None
+            if done is False:
+                out.with_suffix(".skip").touch()
+            self._jobs[src] = (out, bool(done))
+        return out if done else None
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def animated_markup(fmt: str, alt_text: str, gif_url: str, url: str) -> str:
+    """转码后的动图引用：MP4 用静音循环自动播放的 <video>，WebP 用 <picture>，均回退到原 GIF。"""
+    alt_text, gif_url, url = (html.escape(v, quote=True) for v in (alt_text, gif_url, url))
+    fallback = f'<img src="{gif_url}" alt="{alt_text}">'
+    if fmt == "mp4":
+        return (f'<video autoplay loop muted playsinline title="{alt_text}">'
+                f'<source src="{url}" type="video/mp4">{fallback}</video>')
+    return f'<picture><source srcset="{url}" type="image/webp">{fallback}</picture>'
+
+
+def media_markup(kind: str, alt_text: str, url: str) -> str:
+    """按媒体类型生成 Markdown / HTML 引用；写入 HTML 属性的值做转义。"""
+    if kind in ("video", "audio"):
+        attr_url, attr_alt = html.escape(url, quote=True), html.escape(alt_text, quote=True)
+        return f'<{kind} src="{attr_url}" controls preload="metadata" title="{attr_alt}"></{kind}>'
+    if kind == "link":
+        return f"[{alt_text}]({url})"
+    return f"![{alt_text}]({url})"
+
+
+def _print_progress(name: str):
+    """生成在终端同一行刷新的文本进度条回调。"""
+    def _report(copied: int, total: int):
+        if total < CHUNK_COPY_THRESHOLD:
+            return
+        ratio = copied / total if total else 1.0
+        bar = "█" * int(ratio * 20) + "░" * (20 - int(ratio * 20))
+        end = "\n" if copied >= total else ""
+        print(f"\r  ⏳ {name} [{bar}] {ratio:6.1%}  "
+              f"{copied / 1048576:.1f}/{total / 1048576:.1f} MB", end=end, flush=True)
+    return _report
+
+
+def migrate_images(content: str, md_file_path: Path, progress=None, log=print, resolve=None,
+                   stats: dict | None = None, store=None, cancel: CancelToken | None = None,
+                   created: list | None = None, on_item=None, names: dict[str, str] | None = None) -> str:
+    """
+    识别 Markdown 中的本地图片及其它媒体附件（MEDIA_EXTENSIONS），
+    将文件复制到 Valaxy 的 assets 目录，并更新 Markdown 中的引用。支持：
+      - 标准 Markdown: ![alt](path/to/image.png)
+      - Obsidian Wiki:  ![[image.png]]  或  ![[clip.mp4|alt]]
+    视频 / 音频改写为 <video> / <audio> 标签，PDF 等改写为普通链接；
+    动图 GIF 在进程池中转码（见 GifTranscoder），引用改写为带 GIF 回退的 <video> / <picture>。
+    progress(name, copied_bytes, total_bytes) 用于报告大文件复制进度，
+    默认在终端打印进度条；log 用于输出迁移日志（GUI 传入自己的日志函数）；
+    resolve(ref, md_file_path) 用于查找附件，默认为 find_image_file；
+    stats 字典（可选）累计 attachments / missing / bytes_copied / bytes_skipped /
+    transcoded / bytes_saved；store 为附件存储后端，默认按 ASSET_STORAGE 配置创建。
+    cancel 为取消令牌：每个附件之前以及大文件复制的每个分块之后检查，取消时抛出 PublishCancelled
+    （大文件的 .part 保留，下次可续传）；created 列表记录本次新建的附件文件，供调用方回滚；
+    on_item(已完成数, 总数) 在每个附件处理完后回调；names 为「源文件路径 → 目标文件名」
+    （--apply 时来自发布计划），git 后端按其中的文件名写入，不再重新计算。
+    """
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    resolve = resolve or find_image_file
+    own_store = store is None
+    store = store or get_asset_store()
+    if stats is None:
+        stats = {}
+    migrated_count = 0
+
+    gifs = [resolve(ref, md_file_path) for ref, _ in iter_local_media_refs(content)
+            if Path(ref).suffix.lower() == ".gif"]
+    transcoder = GifTranscoder([g for g in gifs if g], log=log)
+
+    item_total = sum(1 for _ in iter_local_media_refs(content))
+    items_done = 0
+
+    def migrate_one(ref: str, alt_text: str, original: str) -> str:
+        nonlocal items_done
+        kind = MEDIA_EXTENSIONS.get(Path(ref).suffix.lower())
+        if kind is None:
+            return original  # 不是可迁移的媒体，保留原样
+        if cancel:
+            cancel.check()
+        try:
+            return migrate_media(ref, kind, alt_text, original)
+        finally:
+            items_done += 1
+            if on_item:
+                on_item(items_done, item_total)
+
+    def migrate_media(ref: str, kind: str, alt_text: str, original: str) -> str:
+        nonlocal migrated_count
+
+        src_file = resolve(ref, md_file_path)
+        if not src_file:
+            stats["missing"] = stats.get("missing", 0) + 1
+            log(f"  ⚠️  警告：未找到附件文件「{ref}」，保留原始引用")
+            return original
+
+        if progress:
+            show = lambda copied, total: progress(src_file.name, copied, total)
+        else:
+            show = _print_progress(src_file.name)
+
+        def report(copied: int, total: int):
+            show(copied, total)
+            if cancel and copied < total:
+                cancel.check()
+
+        url = store.put(src_file, name=(names or {}).get(str(src_file)), progress=report, stats=stats,
+                        created=created)
+        migrated_count += 1
+        stats["attachments"] = stats.get("attachments", 0) + 1
+        icon = "📷" if kind == "image" else "🎞️"
+        log(f"  {icon} 已迁移附件: {src_file.name} → {store.label(url)}")
+
+        encoded = transcoder.result(src_file, log=log)
+        if encoded:
+            gif_name = urllib.parse.unquote(url.rsplit("/", 1)[-1])
+            out_url = store.put(encoded, name=f"{Path(gif_name).stem}{encoded.suffix}", stats={},
+                                created=created)
+            saved = src_file.stat().st_size - encoded.stat().st_size
+            stats["transcoded"] = stats.get("transcoded", 0) + 1
+            stats["bytes_saved"] = stats.get("bytes_saved", 0) + saved
+            log(f"  🎬 动图已转码: {src_file.name} → {store.label(out_url)}（减小 {saved / 1048576:.1f} MB）")
+            return animated_markup(transcoder.fmt, alt_text, url, out_url)
+        return media_markup(kind, alt_text, url)
+
+    # ── 处理标准 Markdown 图片 ──
+    def replace_md_image(match):
+        img_path_raw = match.group(2).strip()
+
+        # 跳过已经是 /assets/ 路径的图片（已迁移过）
+        if img_path_raw.startswith("/assets/"):
+            return match.group(0)
+
+        # 跳过已经是 /images/ 路径的图片（博客原有图片）
+        if img_path_raw.startswith("/images/"):
+            return match.group(0)
+
+        # 跳过已上传到附件存储后端的图片
+        if img_path_raw.startswith(store.base_url):
+            return match.group(0)
+
+        return migrate_one(img_path_raw, match.group(1), match.group(0))
+
+    # ── 处理 Obsidian Wiki 嵌入 ──
+    def replace_wiki_image(match):
+        img_ref = match.group(1).strip()
+        alt_part = match.group(2)
+        alt_text = alt_part[1:].strip() if alt_part else Path(img_ref).stem
+        return migrate_one(img_ref, alt_text, match.group(0))
+
+    try:
+        content = MD_IMAGE_PATTERN.sub(replace_md_image, content)
+        content = WIKI_EMBED_PATTERN.sub(replace_wiki_image, content)
+    finally:
+        transcoder.close()
+        if own_store:
+            store.close()
+
+    if migrated_count == 0:
+        log("  ℹ️  未发现需要迁移的本地附件")
+    else:
+        log(f"  ✅ 共迁移 {migrated_count} 个附件")
+
+    return content
+
+
+# ──────────────────────────────────────────
+#  转换流水线
+# ──────────────────────────────────────────
+
+PIPELINE_CACHE_DIR = "pipeline"
+
+
+class TransformStage:
+    """
+    流水线中的一个具名转换阶段。
+      - inputs：读取的值（流水线中的具名值，如 body / source / meta）
+      - output：写回的值，通常是 body，后续阶段读取到的就是转换后的正文
+      - version：阶段逻辑变化时递增，使旧缓存失效
+      - memoize：是否按「输入哈希 + 版本」缓存输出
+      - fingerprint(values, ctx)：输入之外影响结果的状态（如附件文件的大小与修改时间）
+      - verify(output, ctx)：命中缓存时确认结果仍然可用（如迁移后的附件文件仍在）
+    func(ctx, **inputs) 返回 output 的新值；ctx 为不参与哈希的运行参数（log / stats / cancel 等）。
+    """
+
+    def __init__(self, name: str, func, inputs: tuple[str, ...], output: str, version: int = 1,
+                 memoize: bool = True, fingerprint=None, verify=None):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.output = output
+        self.version = version
+        self.memoize = memoize
+        self.fingerprint = fingerprint
+        self.verify = verify
+
+    def cache_key(self, values: dict, ctx: dict) -> str:
+        digest = hashlib.sha256(f"{self.name}\0{self.version}\0".encode("utf-8"))
+        extra = self.fingerprint(values, ctx) if self.fingerprint else None
+        for value in [values.get(name) for name in self.inputs] + [extra]:
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+            # 分块编码：正文很长（如含内嵌图片）时不必整份复制
+            for i in range(0, len(value), 1 << 20):
+                digest.update(value[i:i + (1 << 20)].encode("utf-8", "surrogatepass"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+
+# 按执行顺序排列的阶段注册表，CLI / GUI / 常驻进程共用
+TRANSFORM_STAGES: list[TransformStage] = []
+_plugins_loaded = False
+
+
+def transform_stage(name: str, inputs: tuple[str, ...] = ("body",), output: str = "body", version: int = 1,
+                    memoize: bool = True, fingerprint=None, verify=None, before: str | None = None):
+    """
+    注册转换阶段的装饰器。默认追加到流水线末尾，before 指定插入到某个已注册阶段之前；
+    同名阶段重复注册时替换原阶段（便于在 publish_stages.py 中覆盖内置阶段）。
+
+        @publish.transform_stage("rewrite_links", inputs=("body",), version=1)
+        def rewrite_links(ctx, body):
+            return body.replace("http://", "https://")
+    """
+    def decorator(func):
+        stage = TransformStage(name, func, tuple(inputs), output, version, memoize, fingerprint, verify)
+        existing = [i for i, s in enumerate(TRANSFORM_STAGES) if s.name == name]
+        if existing:
+            TRANSFORM_STAGES[existing[0]] = stage
+        elif before and any(s.name == before for s in TRANSFORM_STAGES):
+            index = next(i for i, s in enumerate(TRANSFORM_STAGES) if s.name == before)
+            TRANSFORM_STAGES.insert(index, stage)
+        else:
+            TRANSFORM_STAGES.append(stage)
+        return func
+    return decorator
+
+
+def load_stage_plugins(log=print):
+    """导入 STAGE_PLUGINS_FILE 中的自定义阶段（只导入一次）。"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    if not STAGE_PLUGINS_FILE.exists():
+        return
+    try:
+        spec = importlib.util.spec_from_file_location("publish_stages", STAGE_PLUGINS_FILE)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules.setdefault("publish", sys.modules[__name__])
+        spec.loader.exec_module(module)
+    except Exception as e:
+        log(f"  ⚠️  警告：加载自定义阶段 {STAGE_PLUGINS_FILE.name} 失败：{e}")
+
+
+def run_pipeline(values: dict, log=print, timings: dict | None = None, **ctx) -> dict:
+    """
+    依次执行 TRANSFORM_STAGES，返回更新后的 values。缺少输入的阶段跳过。
+    可缓存的阶段按「阶段名 + 版本 + 输入 + fingerprint」的哈希缓存输出，
+    每个（笔记, 阶段）在 .publish-cache/pipeline/ 中只保留最近一次结果：
+    重新发布同一笔记时，输入未变化的阶段直接复用结果。阶段对 ctx["stats"] 的累加（附件数、字节数等）
+    随结果一起缓存，复用时照样计入，运行记录与耗时估算不会因缓存而失真；
+    复用时没有实际复制，原来复制的字节计为 bytes_skipped。
+    timings 字典（可选）记录每个阶段的耗时，键为 transform:<阶段名>。
+    """
+    load_stage_plugins(log)
+    ctx["log"] = log
+    values = dict(values)
+    cache_dir = CACHE_DIR / PIPELINE_CACHE_DIR
+    source_id = hashlib.sha1(str(values.get("source", "")).encode("utf-8")).hexdigest()[:16]
+
+    for stage in list(TRANSFORM_STAGES):
+        if any(name not in values for name in stage.inputs):
+            continue
+        t0 = time.perf_counter()
+        key = cache_file = None
+        if stage.memoize:
+            key = stage.cache_key(values, ctx)
+            cache_file = cache_dir / f"{source_id}-{stage.name}.json"
+            try:
+                cached = json.loads(cache_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                cached = None
+            if cached and cached.get("key") == key and (
+                    stage.verify is None or stage.verify(cached["output"], ctx)):
+                values[stage.output] = cached["output"]
+                stats = ctx.get("stats")
+                if stats is not None:
+                    for name, value in cached.get("stats", {}).items():
+                        name = "bytes_skipped" if name == "bytes_copied" else name
+                        stats[name] = stats.get(name, 0) + value
+                log(f"  ♻️  {stage.name}：输入未变化，复用上次结果")
+                if timings is not None:
+                    timings[f"transform:{stage.name}"] = round(time.perf_counter() - t0, 3)
+                continue
+
+        stats = ctx.get("stats")
+        before = dict(stats) if stats is not None else {}
+        values[stage.output] = stage.func(ctx, **{name: values[name] for name in stage.inputs})
+
+        if cache_file is not None:
+            delta = {name: value - before.get(name, 0) for name, value in (stats or {}).items()
+                     if isinstance(value, (int, float)) and value != before.get(name, 0)}
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(cache_file, json.dumps({"key": key, "output": values[stage.output], "stats": delta},
+                                                     ensure_ascii=False, default=str))
+        if timings is not None:
+            timings[f"transform:{stage.name}"] = round(time.perf_counter() - t0, 3)
+    return values
+
+
+def transform_body(body: str, source: Path, meta: dict | None = None, log=print,
+                   timings: dict | None = None, **ctx) -> str:
+    """对笔记正文执行整条转换流水线，返回转换后的正文。ctx 传给各阶段（见 migrate_images 的参数）。"""
+    values = {"body": body, "source": str(source), "meta": meta or {}}
+    return run_pipeline(values, log=log, timings=timings, **ctx)["body"]
+
+
+def transform_content(content: str, source: Path, log=print, timings: dict | None = None, **ctx) -> str:
+    """对完整笔记内容执行流水线：只转换正文，Front Matter 原样保留在前面。"""
+    meta, body = parse_front_matter(content)
+    header = content[:len(content) - len(body)]
+    return header + transform_body(body, source, meta=meta, log=log, timings=timings, **ctx)
+
+
+# ── 内置阶段：附件迁移 ──
+
+def _media_fingerprint(values: dict, ctx: dict):
+    """附件迁移的额外缓存键：各附件的解析结果与大小 / 修改时间，以及存储后端与转码配置。"""
+    resolve = ctx.get("resolve") or find_image_file
+    source = Path(values["source"])
+    files = []
+    for ref, _ in iter_local_media_refs(values["body"]):
+        found = resolve(ref, source)
+        if found:
+            st = found.stat()
+            files.append([ref, str(found), st.st_size, st.st_mtime_ns])
+        else:
+            files.append([ref, None])
+    return {"files": files, "storage": ASSET_STORAGE, "gif": gif_transcode_format(), "names": ctx.get("names")}
+
+
+def _media_outputs_exist(output: str, ctx: dict) -> bool:
+    """git 后端：迁移结果引用的 public/assets/ 文件都还在，缓存才可用。"""
+    store = ctx.get("store")
+    if store is None and (ASSET_STORAGE or {}).get("type", "git") == "git" or isinstance(store, GitAssetStore):
+        return all((ASSETS_DIR / name).is_file() for name in iter_asset_refs(output))
+    return True
+
+
+@transform_stage("migrate_media", inputs=("body", "source"), version=1,
+                 fingerprint=_media_fingerprint, verify=_media_outputs_exist)
+def _stage_migrate_media(ctx: dict, body: str, source: str) -> str:
+    return migrate_images(
+        body, Path(source),
+        progress=ctx.get("progress"), log=ctx.get("log", print), resolve=ctx.get("resolve"),
+        stats=ctx.get("stats"), store=ctx.get("store"), cancel=ctx.get("cancel"),
+        created=ctx.get("created"), on_item=ctx.get("on_item"), names=ctx.get("names"),
+    )
+
+
+# ── 内置阶段：提取内嵌的 base64 图片 ──
+
+# Markdown 图片 / HTML src 中的 data URI 开头（前面是左括号或引号）；base64 正文单独匹配，避免回溯整段数据
+DATA_URI_PATTERN = re.compile(r"""(?<=[("'])data:(image/[\w.+-]+);base64,""", re.IGNORECASE)
+BASE64_RUN_PATTERN = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+# 每次解码的 base64 字符数（须为 4 的倍数），决定提取大图时的内存峰值
+DATA_URI_CHUNK = 1024 * 1024
+
+
+def _decode_data_uri(text: str, start: int, end: int, suffix: str) -> tuple[Path, int]:
+    """
+    把 text[start:end] 中的 base64 分块解码到 .publish-cache/data-uri/，边写边算哈希，
+    返回 (按内容哈希命名的文件, 字节数)。数据不合法时抛出 binascii.Error。
+    """
+    out_dir = CACHE_DIR / "data-uri"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir / f"{os.getpid()}-{threading.get_ident()}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            for i in range(start, end, DATA_URI_CHUNK):
+                chunk = base64.b64decode(text[i:min(i + DATA_URI_CHUNK, end)], validate=True)
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        dest = out_dir / f"{digest.hexdigest()[:16]}{suffix}"
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return dest, size
+
+
+def extract_data_uris(content: str, log=print, store=None, stats: dict | None = None,
+                      created: list | None = None, cancel: CancelToken | None = None) -> str:
+    """
+    把正文中 ![](data:image/...;base64,...) 与 <img src="data:image/..."> 的内嵌图片解码为文件，
+    交给附件存储后端保存（同一张图按内容哈希命名，只存一份），引用改写为普通 URL。
+    逐个定位 data URI，只对非图片部分切片拼接，base64 按 DATA_URI_CHUNK 分块解码写盘，
+    几 MB 的内嵌图片也不会在内存中再复制出整份数据。代码块中的 data URI 保持原样。
+    stats 字典（可选）累计 data_uris / data_uri_chars（从正文中移除的字符数）。
+    """
+    if "data:" not in content:
+        return content
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    own_store = store is None
+    store = store or get_asset_store()
+    if stats is None:
+        stats = {}
+    code_spans = [m.span() for m in CODE_PATTERN.finditer(content)]
+    code_starts = [start for start, _ in code_spans]
+
+    pieces = []
+    pos = 0
+    try:
+        m = DATA_URI_PATTERN.search(content)
+        while m:
+            end = BASE64_RUN_PATTERN.match(content, m.end()).end()
+            i = bisect.bisect_right(code_starts, m.start()) - 1
+            if end == m.end() or (i >= 0 and code_spans[i][1] > m.start()):
+                m = DATA_URI_PATTERN.search(content, end)
+                continue
+            if cancel:
+                cancel.check()
+
+            mime = m.group(1).lower()
+            suffix = mimetypes.guess_extension(mime) or "." + mime.split("/", 1)[1].split("+")[0]
+            try:
+                file, size = _decode_data_uri(content, m.end(), end, suffix)
+            except (binascii.Error, ValueError):
+                log(f"  ⚠️  警告：第 {content.count(chr(10), 0, m.start()) + 1} 行的内嵌图片数据无法解码，保留原样")
+                m = DATA_URI_PATTERN.search(content, end)
+                continue
+            try:
+                url = store.put(file, name=f"inline-{file.name}", stats=stats, created=created)
+            finally:
+                file.unlink(missing_ok=True)
+
+            pieces.append(content[pos:m.start()])
+            pieces.append(url)
+            pos = end
+            stats["data_uris"] = stats.get("data_uris", 0) + 1
+            stats["data_uri_chars"] = stats.get("data_uri_chars", 0) + end - m.start()
+            log(f"  🧩 已提取内嵌图片: {size / 1024:.0f} KB → {store.label(url)}")
+            m = DATA_URI_PATTERN.search(content, end)
+    finally:
+        if own_store:
+            store.close()
+
+    if not pieces:
+        return content
+    pieces.append(content[pos:])
+    return "".join(pieces)
+
+
+@transform_stage("extract_data_uris", inputs=("body",), version=1, before="migrate_media",
+                 fingerprint=lambda values, ctx: {"storage": ASSET_STORAGE}, verify=_media_outputs_exist)
+def _stage_extract_data_uris(ctx: dict, body: str) -> str:
+    return extract_data_uris(body, log=ctx.get("log", print), store=ctx.get("store"), stats=ctx.get("stats"),
+                             created=ctx.get("created"), cancel=ctx.get("cancel"))
+
+
+# ── 内置阶段：展开笔记嵌入与双链 ──
+
+# Obsidian 双链 [[笔记]] / [[笔记#标题]] / [[笔记#^块|别名]]；带 ! 前缀的是嵌入
+WIKI_LINK_PATTERN = re.compile(r"(!?)\[\[([^\]|#]*)(#[^\]|]*)?(\|[^\]]*)?\]\]")
+HEADING_PATTERN = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$", re.MULTILINE)
+
+
+def _sub_outside_code(pattern: re.Pattern, repl, text: str) -> str:
+    """只替换代码块 / 行内代码之外的匹配。"""
+    parts = []
+    pos = 0
+    for m in CODE_PATTERN.finditer(text):
+        parts.append(pattern.sub(repl, text[pos:m.start()]))
+        parts.append(m.group(0))
+        pos = m.end()
+    parts.append(pattern.sub(repl, text[pos:]))
+    return "".join(parts)
+
+
+def _heading_anchor(heading: str) -> str:
+    """标题锚点：与站点 Markdown 渲染的规则一致（小写、空白转为短横线）。"""
+    return urllib.parse.quote(re.sub(r"\s+", "-", heading.strip().lower()))
+
+
+def _shared_prefix_len(path: Path, directory: Path) -> int:
+    n = 0
+    for a, b in zip(path.parent.parts, directory.parts):
+        if a != b:
+            break
+        n += 1
+    return n
+
+
+VAULT_INDEX_CACHE = "vault-notes.json"
+VAULT_INDEX_VERSION = 1
+
+
+class VaultNoteIndex:
+    """
+    Obsidian 库内笔记的「笔记名 → 路径」索引（忽略大小写），用于解析 [[笔记]] 与 ![[笔记]]。
+    按目录记录 [修改时间, 子目录, 笔记文件]：目录的修改时间只在其中增删 / 重命名条目时变化，
+    refresh() 只 stat 目录，重新列出修改时间变化的目录。load() 在进程内复用同一个库的索引
+    （常驻进程每次发布不再遍历整个库），目录表持久化到 .publish-cache/，新进程同样只列出变化的目录。
+    """
+
+    _memo: dict[str, "VaultNoteIndex"] = {}
+    _load_lock = threading.Lock()
+
+    def __init__(self, vault_root: Path, dirs: dict | None = None):
+        self.vault_root = vault_root
+        self.dirs: dict[str, list] = dirs or {}  # 相对目录（/ 分隔，根目录为 ""）-> [修改时间, 子目录, 笔记文件]
+        self.by_name: dict[str, list[Path]] = {}
+        self.refresh()
+
+    @classmethod
+    def load(cls, vault_root: Path) -> "VaultNoteIndex":
+        with cls._load_lock:
+            key = str(vault_root)
+            index = cls._memo.get(key)
+            if index is not None:
+                if index.refresh():
+                    index.save()
+                return index
+            cache_file = CACHE_DIR / VAULT_INDEX_CACHE
+            dirs = None
+            try:
+                data = json.loads(cache_file.read_text(encoding="utf-8"))
+                if data.get("version") == VAULT_INDEX_VERSION and data.get("root") == key:
+                    dirs = data["dirs"]
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+            index = cls(vault_root, dirs)
+            if index.dirs != dirs:
+                index.save()
+            cls._memo[key] = index
+            return index
+
+    def save(self):
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(CACHE_DIR / VAULT_INDEX_CACHE, json.dumps(
+                {"version": VAULT_INDEX_VERSION, "root": str(self.vault_root), "dirs": self.dirs},
+                ensure_ascii=False))
+        except OSError:
+            pass  # 缓存写不进去只影响下次启动的速度
+
+    @staticmethod
+    def _scan_dir(path: Path, mtime: int) -> list | None:
+        subdirs, notes = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # 跳过 .obsidian / .git / .trash 等隐藏目录
+                        if not entry.name.startswith("."):
+                            subdirs.append(entry.name)
+                    elif entry.name.lower().endswith((".md", ".markdown")):
+                        notes.append(entry.name)
+        except OSError:
+            return None
+        return [mtime, sorted(subdirs), sorted(notes)]
+
+    def refresh(self) -> bool:
+        """从库根目录逐层 stat，修改时间变化（或新出现）的目录重新列出。返回目录表是否变化。"""
+        dirs: dict[str, list] = {}
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            path = self.vault_root.joinpath(*rel.split("/")) if rel else self.vault_root
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            entry = self.dirs.get(rel)
+            if entry is None or entry[0] != mtime:
+                entry = self._scan_dir(path, mtime)
+                if entry is None:
+                    continue
+            dirs[rel] = entry
+            pending.extend(f"{rel}/{name}" if rel else name for name in entry[1])
+        changed = dirs != self.dirs
+        self.dirs = dirs
+        if changed or not self.by_name:
+            by_name: dict[str, list[Path]] = {}
+            for rel in sorted(dirs):
+                directory = self.vault_root.joinpath(*rel.split("/")) if rel else self.vault_root
+                for name in dirs[rel][2]:
+                    by_name.setdefault(Path(name).stem.lower(), []).append(directory / name)
+            self.by_name = by_name
+        return changed
+
+    def resolve(self, target: str, md_file_path: Path) -> Path | None:
+        """
+        按笔记名查找；[[文件夹/笔记]] 形式只匹配路径以此结尾的笔记。
+        多个同名笔记时与 Obsidian 一致，优先选择离当前笔记最近的那个。
+        """
+        target = target.strip().replace("\\", "/")
+        if target.lower().endswith((".md", ".markdown")):
+            target = target.rsplit(".", 1)[0]
+        candidates = self.by_name.get(target.rsplit("/", 1)[-1].lower(), [])
+        if "/" in target:
+            suffix = "/" + target.lower().lstrip("/")
+            candidates = [c for c in candidates if c.with_suffix("").as_posix().lower().endswith(suffix)]
+        if not candidates:
+            return None
+        directory = md_file_path.parent
+        return max(candidates, key=lambda c: (_shared_prefix_len(c, directory), -len(c.parts)))
+
+
+class NoteExpander:
+    """
+    展开笔记中的 Obsidian 嵌入与双链：
+      - ![[笔记]] / ![[笔记#标题]] / ![[笔记#^块]]：内联被嵌入笔记（或其中的一节 / 一段）的正文并递归展开；
+        循环嵌入或超过 TRANSCLUDE_MAX_DEPTH 层时改为指向该笔记的链接
+      - [[笔记]] / [[笔记|别名]]：笔记已发布时改写为文章链接，未发布时改为纯文本
+    被嵌入笔记中的附件引用改写为绝对路径，随后的附件迁移阶段照常处理。
+    笔记按名称在 VaultNoteIndex 中查找（进程内复用、按目录修改时间增量刷新），发布状态查 POSTS_DIR 的 slug 集合；
+    展开结果按「笔记路径 + 内容哈希 + 片段」缓存，大量互相引用的笔记库中每篇笔记只展开一次。
+    notes 记录读取过的笔记（路径 → [大小, 修改时间]），发布计划据此判断是否过期。
+    """
+
+    def __init__(self, vault_root: Path | None = None, log=print, max_depth: int = TRANSCLUDE_MAX_DEPTH):
+        self.vault_root = vault_root or OBSIDIAN_VAULT
+        self.log = log
+        self.max_depth = max_depth
+        self.notes: dict[str, list[int]] = {}
+        self._index: VaultNoteIndex | None = None
+        self._published: set[str] | None = None
+        self._bodies: dict[Path, tuple[int, int, str, str]] = {}  # 路径 -> (大小, 修改时间, 哈希, 正文)
+        # (路径, 内容哈希, 片段, 剩余层数 | None) -> (展开结果, 嵌入层数)
+        self._memo: dict[tuple[str, str, str, int | None], tuple[str, int]] = {}
+        self._warned: set[str] = set()
+        self._counts = {"embeds": 0, "links": 0}
+
+    def index(self, source: Path) -> VaultNoteIndex:
+        if self._index is None:
+            # 源笔记不在配置的库内时（如从其它目录发布），以其所在目录为库根目录
+            root = self.vault_root if self.vault_root in source.parents else source.parent
+            self._index = VaultNoteIndex.load(root)
+        return self._index
+
+    def published(self) -> set[str]:
+        if self._published is None:
+            self._published = set()
+            if POSTS_DIR.exists():
+                self._published = {e.name[:-3] for e in os.scandir(POSTS_DIR) if e.name.endswith(".md")}
+        return self._published
+
+    def expand(self, body: str, source: Path) -> str:
+        """展开正文中的嵌入与双链，返回新正文。"""
+        if "[[" not in body:
+            return body
+        self._counts = {"embeds": 0, "links": 0}
+        source = Path(source)
+        body = self._expand(body, source, (source.resolve(),))[0]
+        if any(self._counts.values()):
+            self.log(f"  ✅ 展开 {self._counts['embeds']} 处笔记嵌入，改写 {self._counts['links']} 个双链")
+        return body
+
+    def _warn(self, key: str, message: str):
+        if key not in self._warned:
+            self._warned.add(key)
+            self.log(f"  ⚠️  警告：{message}")
+
+    def _read(self, path: Path) -> tuple[str, str]:
+        """返回笔记的 (内容哈希, 正文)，按大小与修改时间缓存。"""
+        st = path.stat()
+        cached = self._bodies.get(path)
+        if cached is None or cached[:2] != (st.st_size, st.st_mtime_ns):
+            raw = path.read_bytes()
+            _, body = parse_front_matter(decode_note_bytes(raw))
+            cached = (st.st_size, st.st_mtime_ns, hashlib.sha1(raw).hexdigest(), body)
+            self._bodies[path] = cached
+        self.notes[str(path)] = [st.st_size, st.st_mtime_ns]
+        return cached[2], cached[3]
+
+    def _expand(self, text: str, note: Path, stack: tuple[Path, ...]) -> tuple[str, int, str | None]:
+        """
+        返回 (展开结果, 嵌入层数, 截断原因)。截断原因为 None（完整展开）、
+        "depth"（受层数限制，结果只对相同的剩余层数有效）或 "cycle"（取决于嵌入路径，不缓存）。
+        """
+        height = 0
+        cut = None
+
+        def replace(m: re.Match) -> str:
+            nonlocal height, cut
+            embed, target, fragment, alias = m.group(1), m.group(2).strip(), m.group(3) or "", m.group(4)
+            if Path(target).suffix.lower() in MEDIA_EXTENSIONS:
+                return m.group(0)  # 附件，交给附件迁移阶段
+            heading = fragment[1:].strip()
+            name = target.replace("\\", "/").rsplit("/", 1)[-1]
+            label = alias[1:].strip() if alias else " > ".join(x for x in (name, heading.lstrip("^")) if x)
+            if not target:
+                # [[#标题]]：当前文章内的锚点
+                return f"[{label}](#{_heading_anchor(heading)})" if heading and not heading.startswith("^") else label
+
+            path = self.index(note).resolve(target, note)
+            if path is None:
+                # 库中没有该笔记，但已有同名文章（如直接写在 pages/posts 中的文章）时仍改写为文章链接
+                slug = self._published_slug(name)
+                if slug is None:
+                    self._warn(target, f"库中找不到笔记「{target}」，保留原始引用")
+                    return m.group(0)
+                return self._link(target, slug, heading, label)
+            if not embed:
+                return self._link(target, post_filename(path)[:-3], heading, label)
+
+            key = path.resolve()
+            if key in stack:
+                self._warn(f"cycle:{key}", f"笔记「{target}」存在循环嵌入，不再展开")
+                cut = "cycle"
+                return self._link(target, post_filename(path)[:-3], heading, label)
+            if len(stack) > self.max_depth:
+                self._warn(f"depth:{key}", f"嵌入「{target}」超过 {self.max_depth} 层，不再展开")
+                cut = cut or "depth"
+                return self._link(target, post_filename(path)[:-3], heading, label)
+            inlined = self._embed(path, heading, stack + (key,))
+            if inlined is None:
+                self._warn(f"{target}#{heading}", f"笔记「{target}」中找不到「{heading}」，保留原始引用")
+                return m.group(0)
+            text_, sub_height, sub_cut = inlined
+            height = max(height, sub_height + 1)
+            if sub_cut and cut != "cycle":
+                cut = sub_cut
+            self._counts["embeds"] += 1
+            return text_
+
+        if "[[" not in text:
+            return text, 0, None
+        return _sub_outside_code(WIKI_LINK_PATTERN, replace, text), height, cut
+
+    def _embed(self, path: Path, heading: str, stack: tuple[Path, ...]) -> tuple[str, int, str | None] | None:
+        digest, body = self._read(path)
+        remaining = self.max_depth - len(stack) + 1
+        # 完整展开的结果在剩余层数足够时可复用；受层数限制的结果只在剩余层数相同时复用
+        cached = self._memo.get((str(path), digest, heading, None))
+        if cached and cached[1] <= remaining:
+            return cached[0], cached[1], None
+        cached = self._memo.get((str(path), digest, heading, remaining))
+        if cached:
+            return cached[0], cached[1], "depth"
+        section = self._section(body, heading) if heading else body
+        if section is None:
+            return None
+        text, height, cut = self._expand(self._absolute_media(section, path), path, stack)
+        text = text.strip("\n")
+        if cut != "cycle":
+            self._memo[(str(path), digest, heading, remaining if cut else None)] = (text, height)
+        return text, height, cut
+
+    @staticmethod
+    def _section(body: str, heading: str) -> str | None:
+        """取出笔记中的一节（#标题，到下一个同级或更高级标题为止）或一段（#^块标识）。"""
+        if heading.startswith("^"):
+            m = re.search(rf"[ \t]+\^{re.escape(heading[1:])}[ \t]*$", body, re.MULTILINE)
+            if not m:
+                return None
+            start = body.rfind("\n\n", 0, m.start())
+            return body[start + 2 if start >= 0 else 0:m.start()]
+        wanted = heading.rsplit("#", 1)[-1].strip().lower()  # [[笔记#一级#二级]] 取最后一级
+        headings = list(HEADING_PATTERN.finditer(body))
+        for i, h in enumerate(headings):
+            if h.group(2).strip().lower() != wanted:
+                continue
+            level = len(h.group(1))
+            end = next((x.start() for x in headings[i + 1:] if len(x.group(1)) <= level), len(body))
+            return body[h.start():end]
+        return None
+
+    @staticmethod
+    def _absolute_media(text: str, note: Path) -> str:
+        """被嵌入笔记中的附件相对于它自己解析，改写为绝对路径的 ![[路径|alt]]。"""
+        def rewrite(ref: str, alt: str | None, original: str) -> str:
+            if Path(ref).suffix.lower() not in MEDIA_EXTENSIONS or ref.startswith(("/assets/", "/images/")):
+                return original
+            found = find_image_file(ref, note)
+            if found is None or any(c in str(found) for c in "[]|"):
+                return original
+            return f"![[{found.resolve().as_posix()}{'' if alt is None else '|' + alt}]]"
+
+        text = MD_IMAGE_PATTERN.sub(lambda m: rewrite(m.group(2).strip(), m.group(1), m.group(0)), text)
+        return WIKI_EMBED_PATTERN.sub(
+            lambda m: rewrite(m.group(1).strip(), m.group(2)[1:] if m.group(2) else None, m.group(0)), text)
+
+    def _published_slug(self, name: str) -> str | None:
+        """按笔记名在已发布文章的 slug 集合中查找（忽略大小写与 .md 后缀）。"""
+        if name.lower().endswith(".md"):
+            name = name[:-3]
+        wanted = post_filename(Path(name + ".md"))[:-3].lower()
+        return next((slug for slug in self.published() if slug.lower() == wanted), None)
+
+    def _link(self, target: str, slug: str, heading: str, label: str) -> str:
+        if slug not in self.published():
+            self._warn(f"link:{slug}", f"双链「{target}」指向的笔记尚未发布，改为纯文本")
+            return label
+        self._counts["links"] += 1
+        url = POST_URL_PREFIX + urllib.parse.quote(slug)
+        if heading and not heading.startswith("^"):
+            url += "#" + _heading_anchor(heading.rsplit("#", 1)[-1])
+        return f"[{label}]({url})"
+
+
+@transform_stage("expand_notes", inputs=("body", "source"), memoize=False, before="extract_data_uris")
+def _stage_expand_notes(ctx: dict, body: str, source: str) -> str:
+    # 结果取决于其它笔记与发布状态，不缓存输出；展开本身按笔记哈希缓存，开销很小
+    expander = ctx.get("expander") or NoteExpander(log=ctx.get("log", print))
+    return expander.expand(body, Path(source))
+
+
+# ──────────────────────────────────────────
+#  标签处理
+# ──────────────────────────────────────────
+
+def collect_existing_tags() -> list[str]:
+    """扫描 pages/posts/ 目录下所有文章，收集已有标签并按出现频率排序。"""
+    tag_count: dict[str, int] = {}
+    if not POSTS_DIR.exists():
+        return []
+
+    for md_file in POSTS_DIR.glob("*.md"):
+        try:
+            text = md_file.read_text(encoding="utf-8")
+        except Exception:
+            continue
+        meta, _ = parse_front_matter(text)
+        for tag in meta_labels(meta or {}, "tags"):
+            tag_count[tag] = tag_count.get(tag, 0) + 1
+
+    # 按频率降序排列
+    sorted_tags = sorted(tag_count.items(), key=lambda x: x[1], reverse=True)
+    return [t[0] for t in sorted_tags]
+
+
+def interactive_tags(text: str = "", existing_tags=None) -> list[str]:
+    """
+    交互式标签选择：
+      - 列出博客已有标签供用户选择（输入序号，逗号分隔）
+      - 传入正文 text 时，与正文内容最相似的标签排在最前并以 ★ 标记
+      - 也可直接输入新标签
+    existing_tags 为空时扫描 pages/posts 收集（常驻进程运行时由其直接提供）；
+    也可以传入返回标签列表的函数，例如后台扫描任务的 future.result，到需要时才等待。
+    """
+    if existing_tags is None:
+        existing_tags = collect_existing_tags()
+    elif callable(existing_tags):
+        existing_tags = existing_tags()
+    suggested = []
+    if text and existing_tags:
+        suggested = [t for t, _ in LabelSuggester.load().suggest(text, "tags")]
+        existing_tags = suggested + [t for t in existing_tags if t not in suggested]
+
+    print("\n🏷️  标签设置")
+    print("─" * 40)
+
+    if existing_tags:
+        print("根据正文推荐（★）及博客已有标签：" if suggested else "博客已有标签：")
+        for i, tag in enumerate(existing_tags, 1):
+            mark = "★ " if tag in suggested else ""
+            print(f"  [{i:2d}] {mark}{tag}")
+        print()
+        print("请输入标签序号（逗号分隔）或直接输入新标签名称（逗号分隔）")
+        print("也可混合使用，例如: 1,3,新标签名")
+        print("直接回车跳过标签设置")
+    else:
+        print("博客暂无已有标签，请输入新标签（逗号分隔）：")
+        print("直接回车跳过标签设置")
+
+    print("─" * 40)
+    user_input = input("👉 标签: ").strip()
+
+    if not user_input:
+        return []
+
+    selected_tags = []
+    parts = [p.strip() for p in user_input.split(",") if p.strip()]
+
+    for part in parts:
+        # 尝试解析为数字序号
+        try:
+            idx = int(part)
+            if 1 <= idx <= len(existing_tags):
+                tag = existing_tags[idx - 1]
+                if tag not in selected_tags:
+                    selected_tags.append(tag)
+            else:
+                print(f"  ⚠️  序号 {idx} 超出范围，已忽略")
+        except ValueError:
+            # 不是数字，视为新标签
+            if part not in selected_tags:
+                selected_tags.append(part)
+
+    if selected_tags:
+        print(f"  ✅ 已选择标签: {', '.join(selected_tags)}")
+
+    return selected_tags
+
+
+def interactive_category(text: str = "") -> str:
+    """交互式分类输入：列出与正文最相似的已有分类，可输入序号选择或直接输入新分类。"""
+    suggested = []
+    if text:
+        suggested = [c for c, _ in LabelSuggester.load().suggest(text, "categories", limit=5)]
+
+    print("\n📂 请输入文章分类（直接回车跳过）：")
+    if suggested:
+        print("根据正文推荐：" + "  ".join(f"[{i}] {c}" for i, c in enumerate(suggested, 1)))
+        print("输入序号选择推荐分类，或直接输入分类名称")
+    category = input("👉 分类: ").strip()
+
+    if category.isdigit() and 1 <= int(category) <= len(suggested):
+        category = suggested[int(category) - 1]
+    return category
+
+
+# ──────────────────────────────────────────
+#  Front Matter 补全
+# ──────────────────────────────────────────
+
+def ensure_front_matter(content: str, title: str, existing_tags=None) -> str:
+    """
+    检查并补全 Front Matter：
+      - 没有 Front Matter → 自动生成（title, date, tags 交互选择）
+      - 有 Front Matter 但缺少 tags → 交互补全
+      - 有 Front Matter 且完整 → 保持不变
+    """
+    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    meta, body = parse_front_matter(content)
+
+    if meta is None:
+        # ── 完全没有 Front Matter，生成一个 ──
+        print("\n📝 未检测到 Front Matter，正在自动生成...")
+        tags = interactive_tags(body, existing_tags)
+        meta = {
+            "title": title,
+            "date": now_str,
+            "updated": now_str,
+        }
+        if tags:
+            meta["tags"] = tags
+
+        # 询问分类
+        category = interactive_category(body)
+        if category:
+            meta["categories"] = [category]
+
+        # 询问摘要
+        print("\n📋 请输入文章摘要（直接回车跳过）：")
+        excerpt = input("👉 摘要: ").strip()
+        if excerpt:
+            meta["excerpt"] = excerpt
+
+        return dump_front_matter(normalize_front_matter(meta), body)
+
+    else:
+        # ── 已有 Front Matter，检查缺失字段（只改动缺失的字段，其余逐字节保留） ──
+        changes = {}
+
+        if "title" not in meta or not meta["title"]:
+            changes["title"] = title
+
+        if "date" not in meta or not meta["date"]:
+            changes["date"] = now_str
+
+        if "updated" not in meta:
+            changes["updated"] = now_str
+
+        # 检查 tags
+        if "tags" not in meta or not meta["tags"]:
+            print(f"\n📝 文章已有 Front Matter，但缺少标签（tags）")
+            tags = interactive_tags(body, existing_tags)
+            if tags:
+                changes["tags"] = tags
+
+        if changes:
+            return update_front_matter(content, changes)
+        else:
+            print("  ✅ Front Matter 已完整，无需修改")
+            return content
+
+
+def fill_front_matter(content: str, title: str, tags: list[str] | None = None,
+                      category: str = "", excerpt: str = "") -> str:
+    """
+    ensure_front_matter 的非交互版本（供常驻进程 API 使用）：
+    只补全缺失的字段，tags / category / excerpt 由调用方直接给出。
+    """
+    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    meta, _ = parse_front_matter(content)
+    meta = meta or {}
+    changes = {}
+
+    if not meta.get("title"):
+        changes["title"] = title
+    if not meta.get("date"):
+        changes["date"] = now_str
+    if "updated" not in meta:
+        changes["updated"] = now_str
+    if tags and not meta.get("tags"):
+        changes["tags"] = list(tags)
+    if category and not meta.get("categories"):
+        changes["categories"] = [category]
+    if excerpt and not meta.get("excerpt"):
+        changes["excerpt"] = excerpt
+
+    return update_front_matter(content, changes)
+
+
+def decode_note_bytes(raw: bytes) -> str:
+    """解码笔记内容：优先 UTF-8（兼容 BOM），失败时回退 GBK。"""
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return raw.decode("gbk")
+
+
+def read_note(path: Path) -> str:
+    """读取笔记内容：只读取一次字节，再按 decode_note_bytes 的规则解码。"""
+    return decode_note_bytes(path.read_bytes())
+
+
+def post_filename(source_path: Path) -> str:
+    """文章文件名：保留原名，但替换空格为短横线。"""
+    return source_path.stem.replace(" ", "-") + ".md"
+
+
+# ──────────────────────────────────────────
+#  相关文章预计算
+# ──────────────────────────────────────────
+
+# 中日韩文字连续片段 / 拉丁字母与数字组成的单词
+_CJK_RUN = r"[\u3400-\u4dbf\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]+"
+_TOKEN_PATTERN = re.compile(rf"{_CJK_RUN}|[a-z0-9][a-z0-9_\-]+")
+_CJK_PATTERN = re.compile(_CJK_RUN)
+# 分词前剔除的 Markdown 噪声：代码块、行内代码、图片、链接地址、HTML 标签
+_MARKDOWN_NOISE = re.compile(
+    r"```.*?```|`[^`\n]*`|!\[[^\]]*\]\([^)]*\)|!\[\[[^\]]*\]\]|\]\([^)]*\)|https?://\S+|<[^>]+>",
+    re.DOTALL,
+)
+# 缓存格式版本，分词规则或缓存结构变化时递增以强制全量重建
+RELATED_CACHE_VERSION = 2
+RELATED_CACHE_FILE = "related-terms.json"
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    中日韩文字按相邻二元组（bigram）切分，拉丁文字按单词切分，全部小写。
+    单个汉字的片段保留为一元词。
+    """
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(_MARKDOWN_NOISE.sub(" ", text).lower()):
+        if _CJK_PATTERN.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _term_counts(text: str) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for token in tokenize(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def _load_related_cache(cache_dir: Path) -> dict:
+    """
+    读取 related-terms.json：{"version", "top_k", "full_size", "posts": {slug: {"hash", "terms"}},
+    "neighbours": {slug: [[slug, 相似度], ...]}}。不存在、损坏或版本不符时视为未命中，返回空字典。
+    """
+    try:
+        cache = json.loads((cache_dir / RELATED_CACHE_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != RELATED_CACHE_VERSION:
+        return {}
+    if not isinstance(cache.get("posts"), dict):
+        return {}
+    return cache
+
+
+def _term_cache(cache: dict) -> dict:
+    """related-terms.json 中按文章内容哈希缓存的词频表 {slug: {"hash", "terms"}}，格式不对的条目丢弃。"""
+    return {
+        slug: entry for slug, entry in cache.get("posts", {}).items()
+        if isinstance(entry, dict) and isinstance(entry.get("terms"), dict)
+    }
+
+
+def scan_post_terms(cached_posts: dict, posts_dir: Path | None = None):
+    """
+    扫描 pages/posts 下所有文章，返回 (posts, metas, changed)：
+      - posts:   {slug: {"hash": 内容哈希, "terms": 词频}}，哈希未变的文章直接复用缓存
+      - metas:   {slug: Front Matter 字典}
+      - changed: 需要重新分词的 slug 集合
+    """
+    posts: dict[str, dict] = {}
+    metas: dict[str, dict] = {}
+    changed: set[str] = set()
+    posts_dir = posts_dir or POSTS_DIR
+    if not posts_dir.exists():
+        return posts, metas, changed
+
+    for md_file in sorted(posts_dir.glob("*.md")):
+        try:
+            raw = md_file.read_bytes()
+            text = raw.decode("utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        slug = md_file.stem
+        digest = hashlib.sha1(raw).hexdigest()
+        meta, body = parse_front_matter(text)
+        metas[slug] = meta or {}
+
+        entry = cached_posts.get(slug)
+        if entry and entry.get("hash") == digest:
+            posts[slug] = entry
+        else:
+            changed.add(slug)
+            title = metas[slug].get("title") or slug
+            posts[slug] = {"hash": digest, "terms": _term_counts(f"{title}\n{body}")}
+    return posts, metas, changed
+
+
+def _save_related_cache(cache_dir: Path, posts: dict, neighbours: dict, top_k: int, full_size: int):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(
+        cache_dir / RELATED_CACHE_FILE,
+        json.dumps({"version": RELATED_CACHE_VERSION, "top_k": top_k, "full_size": full_size,
+                    "posts": posts, "neighbours": neighbours}, ensure_ascii=False),
+    )
+    (cache_dir / "related-matrix.npz").unlink(missing_ok=True)  # 旧版本缓存的稠密相似度矩阵
+
+
+def _build_tfidf(term_counts: list[dict[str, int]]):
+    """
+    构建 L2 归一化的 TF-IDF 稀疏矩阵。
+    返回 CSR 形式 (indptr, indices, data) 以及按词组织的倒排（CSC）形式
+    (col_ptr, col_rows, col_data)，后者用于快速计算某几行与全体的点积。
+    """
+    vocab: dict[str, int] = {}
+    indptr = [0]
+    indices = []
+    counts = []
+    for doc in term_counts:
+        for term, count in doc.items():
+            indices.append(vocab.setdefault(term, len(vocab)))
+            counts.append(count)
+        indptr.append(len(indices))
+
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    n_docs = len(term_counts)
+    rows = np.repeat(np.arange(n_docs), np.diff(indptr))
+
+    df = np.bincount(indices, minlength=len(vocab))
+    idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+    data = (1.0 + np.log(np.asarray(counts, dtype=np.float64))) * idf[indices]
+
+    # 行归一化
+    norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=n_docs))
+    norms[norms == 0] = 1.0
+    data = data / norms[rows]
+
+    order = np.argsort(indices, kind="stable")
+    col_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(df, out=col_ptr[1:])
+    return (indptr, indices, data), (col_ptr, rows[order], data[order])
+
+
+def _similarity_row(row: int, csr, csc, n_docs: int):
+    """计算第 row 篇文章与全体文章的余弦相似度（只遍历共享词的倒排表）。"""
+    indptr, indices, data = csr
+    col_ptr, col_rows, col_data = csc
+    terms = indices[indptr[row]:indptr[row + 1]]
+    weights = data[indptr[row]:indptr[row + 1]]
+    starts = col_ptr[terms]
+    lengths = col_ptr[terms + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(n_docs, dtype=np.float32)
+    # 把多个倒排表切片拼接为一次索引
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+    products = col_data[offsets] * np.repeat(weights, lengths)
+    return np.bincount(col_rows[offsets], weights=products, minlength=n_docs).astype(np.float32)
+
+
+def _top_neighbours(values, row: int, k: int) -> list[tuple[int, float]]:
+    """相似度行向量中除自身外相似度大于 0 的前 k 篇，按相似度降序（相同时按序号）。"""
+    values[row] = 0.0
+    candidates = np.flatnonzero(values > 0)
+    if len(candidates) > k:
+        # 保留与第 k 名并列的全部候选，排序后再截断，并列时的取舍与增量合并一致
+        kth = np.partition(values[candidates], len(candidates) - k)[len(candidates) - k]
+        candidates = candidates[values[candidates] >= kth]
+    return sorted(((int(j), float(values[j])) for j in candidates), key=lambda p: (-p[1], p[0]))[:k]
+
+
+def _cached_neighbours(cache: dict, top_k: int, index: dict[str, int]) -> dict[str, list] | None:
+    """取出缓存中各文章的邻居列表，top_k 不同或格式不对时返回 None（全量重建）。"""
+    neighbours = cache.get("neighbours")
+    if cache.get("top_k") != top_k or not isinstance(neighbours, dict):
+        return None
+    try:
+        return {
+            slug: [(str(other), float(score)) for other, score in entries]
+            for slug, entries in neighbours.items() if slug in index
+        }
+    except (TypeError, ValueError):
+        return None
+
+
+def update_related_posts(top_k: int = RELATED_TOP_K, log=print, root: Path | None = None) -> bool:
+    """
+    为 pages/posts 下所有文章计算 TF-IDF 相似度，写出每篇文章的 top-k 相关文章。
+
+    相似度按行从倒排表（CSR / CSC）计算，每篇文章只保留 top-k 个邻居，不构建 n×n 矩阵。
+    词频按文章内容哈希缓存，邻居列表一并缓存：只重算内容变化（或新增）的文章，
+    其余文章把变化文章的新相似度合并进原邻居列表；原邻居被删除或相似度下降时该文章整行重算。
+    文章数量相对上次全量计算变化超过 1/4 时，IDF 偏移过大，改为全量重建。
+    root 为其它发布目标的站点根目录时，读写该目标下的文章、缓存与 related-posts.json。
+    返回 related-posts.json 是否发生了变化。
+    """
+    if np is None:
+        log("  ⚠️  缺少 numpy，跳过相关文章计算（pip install numpy）")
+        return False
+    posts_dir, cache_dir, related_file = POSTS_DIR, CACHE_DIR, RELATED_POSTS_FILE
+    if root is not None:
+        posts_dir = root / "pages" / "posts"
+        cache_dir = root / CACHE_DIR.name
+        related_file = root / "public" / RELATED_POSTS_FILE.name
+    if not posts_dir.exists():
+        return False
+
+    cache = _load_related_cache(cache_dir)
+    posts, metas, changed = scan_post_terms(_term_cache(cache), posts_dir)
+    titles = {slug: str(meta.get("title") or slug) for slug, meta in metas.items()}
+
+    slugs = list(posts)
+    n_docs = len(slugs)
+    if n_docs < 2:
+        return False
+    index = {s: i for i, s in enumerate(slugs)}
+
+    csr, csc = _build_tfidf([posts[s]["terms"] for s in slugs])
+    k = min(top_k, n_docs - 1)
+
+    full_size = n_docs
+    neighbours: dict[int, list[tuple[int, float]]] = {}
+    dirty: list[int] = []                    # 内容变化或新增的文章
+    recompute = list(range(n_docs))          # 需要整行计算相似度的其它文章
+    cached = _cached_neighbours(cache, top_k, index)
+    cached_size = cache.get("full_size")
+    if cached is not None and isinstance(cached_size, int) and cached_size > 0 \
+            and abs(n_docs - cached_size) / cached_size <= 0.25:
+        full_size = cached_size
+        dirty = [i for i, s in enumerate(slugs) if s not in cached or s in changed]
+        removed = set(cache["neighbours"]) - set(index)
+        if not dirty and not removed:
+            log("  ℹ️  文章内容无变化，相关文章无需更新")
+            return False
+
+        # 变化文章与其它文章的新相似度（对称），按被影响的文章归集，只保留非零项
+        incoming: dict[int, dict[int, float]] = {}
+        for row in dirty:
+            values = _similarity_row(row, csr, csc, n_docs)
+            for j in np.flatnonzero(values):
+                incoming.setdefault(int(j), {})[row] = float(values[j])
+            neighbours[row] = _top_neighbours(values, row, k)
+
+        dirty_set = set(dirty)
+        recompute = []
+        for row, slug in enumerate(slugs):
+            if row in dirty_set:
+                continue
+            updates = incoming.get(row, {})
+            merged: dict[int, float] = {}
+            stale = False
+            for other, score in cached[slug]:
+                j = index.get(other)
+                if j is None or (j in dirty_set and updates.get(j, 0.0) < score):
+                    stale = True  # 原邻居被删除或相似度下降，排在其后的候选未知
+                    break
+                if j not in dirty_set:
+                    merged[j] = score
+            if stale:
+                recompute.append(row)
+                continue
+            merged.update(updates)
+            neighbours[row] = sorted(merged.items(), key=lambda p: (-p[1], p[0]))[:k]
+
+    for row in recompute:
+        neighbours[row] = _top_neighbours(_similarity_row(row, csr, csc, n_docs), row, k)
+    computed = len(dirty) + len(recompute)
+
+    related = {
+        slug: [
+            {"slug": slugs[j], "title": titles[slugs[j]], "score": round(score, 4)}
+            for j, score in neighbours[row]
+        ]
+        for row, slug in enumerate(slugs)
+    }
+
+    _save_related_cache(
+        cache_dir, posts,
+        {slug: [[slugs[j], score] for j, score in neighbours[row]] for row, slug in enumerate(slugs)},
+        top_k, full_size,
+    )
+
+    output = json.dumps(related, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+    try:
+        if related_file.read_text(encoding="utf-8") == output:
+            log(f"  ℹ️  相关文章无变化（重算 {computed}/{n_docs} 篇）")
+            return False
+    except OSError:
+        pass
+    related_file.parent.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(related_file, output)
+    log(f"  ✅ 已更新相关文章：重算 {computed}/{n_docs} 篇 → {related_file.name}")
+    return True
+
+
+# ──────────────────────────────────────────
+#  文章清单（posts.json）
+# ──────────────────────────────────────────
+
+POST_INDEX_CACHE = "post-index.json"
+POST_INDEX_VERSION = 1
+CJK_CHAR_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]")
+LATIN_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:['’.-][A-Za-z0-9]+)*")
+# 计算字数前去掉的标记：图片、链接地址、HTML 标签、注释
+MARKUP_PATTERN = re.compile(r"!?\[([^\]]*)\]\([^)]*\)|<!--.*?-->|<[^>]+>", re.DOTALL)
+MORE_MARKER = "<!-- more -->"
+COVER_IMAGE_PATTERN = re.compile(r"""!\[[^\]]*\]\((/(?:assets|images)/[^\s)]+)|<img[^>]+src=["'](/(?:assets|images)/[^"']+)""")
+
+
+def _strip_markup(text: str) -> str:
+    """去掉图片、HTML 标签与注释，链接只保留文字。"""
+    return MARKUP_PATTERN.sub(lambda m: " " if m.group(0).startswith("!") else (m.group(1) or " "), text)
+
+
+def count_words(text: str) -> tuple[int, int]:
+    """CJK 按字、其它语言按词计数，返回 (CJK 字数, 词数)。"""
+    text = _strip_markup(text)
+    return len(CJK_CHAR_PATTERN.findall(text)), len(LATIN_WORD_PATTERN.findall(text))
+
+
+def _plain_excerpt(body: str, limit: int = 120) -> str:
+    """没有 excerpt 字段时的摘要：<!-- more --> 之前的内容，或正文开头 limit 个字符（去掉 Markdown 标记）。"""
+    head = body.split(MORE_MARKER, 1)[0] if MORE_MARKER in body else body[:limit * 8]
+    head = CODE_PATTERN.sub(" ", head)
+    head = _strip_markup(head)
+    head = re.sub(r"^\s*(?:#+|>|[-*+]|\d+\.)\s*", "", head, flags=re.MULTILINE)
+    head = re.sub(r"[*_~`]+", "", head)
+    head = re.sub(r"\s+", " ", head).strip()
+    return head if len(head) <= limit else head[:limit].rstrip() + "…"
+
+
+def summarize_post(slug: str, meta: dict, body: str) -> dict | None:
+    """
+    生成 posts.json 中的一条记录；草稿（draft: true）与隐藏文章（hide: true）返回 None。
+    字数 CJK 按字、其它语言按词计；阅读时间按 READING_SPEED_CJK / READING_SPEED_WORDS 估算（分钟）。
+    封面取 cover 字段，没有时取正文中第一张站内图片。
+    """
+    if meta.get("draft") is True or meta.get("hide") is True:
+        return None
+    cjk, words = count_words(CODE_PATTERN.sub(" ", body))
+    date_value = _canonical_datetime(meta.get("date"))
+    cover = meta.get("cover")
+    if not cover:
+        m = COVER_IMAGE_PATTERN.search(body)
+        cover = (m.group(1) or m.group(2)) if m else None
+    entry = {
+        "slug": slug,
+        "title": str(meta.get("title") or slug),
+        "date": date_value.isoformat() if isinstance(date_value, datetime) else date_value,
+        "tags": meta_labels(meta, "tags"),
+        "categories": meta_labels(meta, "categories"),
+        "excerpt": str(meta.get("excerpt") or "").strip() or _plain_excerpt(body),
+        "words": cjk + words,
+        "reading_time": max(1, math.ceil(cjk / READING_SPEED_CJK + words / READING_SPEED_WORDS)),
+        "cover": cover,
+    }
+    return {k: v for k, v in entry.items() if v not in (None, "", [])}
+
+
+def update_posts_manifest(log=print, root: Path | None = None, index: "PostIndex | None" = None) -> bool:
+    """
+    更新 public/posts.json：所有已发布文章的 slug / 标题 / 日期 / 标签 / 分类 / 摘要 / 字数 / 阅读时间 / 封面，
+    按日期倒序排列，供归档、随机文章等前端功能一次加载。
+    条目来自持久化的 PostIndex，只有大小或修改时间变化的文章会重新解析。
+    index 为调用方常驻内存的 PostIndex（常驻进程），省去读取缓存。
+    root 为其它发布目标的站点根目录时，读写该目标下的文章、缓存与 posts.json。
+    返回 posts.json 是否发生了变化。
+    """
+    root = root or VALAXY_ROOT
+    posts_dir = POSTS_DIR if root == VALAXY_ROOT else root / "pages" / "posts"
+    cache_file = (CACHE_DIR if root == VALAXY_ROOT else root / CACHE_DIR.name) / POST_INDEX_CACHE
+    manifest_file = (POSTS_MANIFEST_FILE if root == VALAXY_ROOT
+                     else root / "public" / POSTS_MANIFEST_FILE.name)
+
+    if index is None:
+        index = PostIndex.load(cache_file, posts_dir)
+    changed = index.refresh()
+    if changed:
+        index.save(cache_file)
+
+    entries = [e["summary"] for e in index.entries.values() if e.get("summary")]
+    entries.sort(key=lambda e: (str(e.get("date", "")), e["slug"]), reverse=True)
+    output = json.dumps(entries, ensure_ascii=False, separators=(",", ":")) + "\n"
+    try:
+        if manifest_file.read_text(encoding="utf-8") == output:
+            log("  ℹ️  文章清单无变化")
+            return False
+    except OSError:
+        pass
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(manifest_file, output)
+    log(f"  ✅ 已更新文章清单：重新解析 {len(changed)}/{len(index.entries)} 篇 → {manifest_file.name}")
+    return True
+
+
+# ──────────────────────────────────────────
+#  标签 / 分类推荐
+# ──────────────────────────────────────────
+
+# 每个标签（分类）质心向量保留的最大词数
+LABEL_CENTROID_TERMS = 300
+LABEL_CENTROIDS_FILE = "label-centroids.json"
+
+
+def _posts_signature() -> str:
+    """用文件名 / 大小 / 修改时间生成文章目录指纹，只 stat 不读内容。"""
+    h = hashlib.sha1()
+    if POSTS_DIR.exists():
+        for entry in sorted(os.scandir(POSTS_DIR), key=lambda e: e.name):
+            if entry.name.endswith(".md") and entry.is_file():
+                st = entry.stat()
+                h.update(f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _build_label_centroids() -> dict:
+    """为每个标签和分类计算其下所有文章 TF-IDF 向量的归一化质心。"""
+    posts, metas, _ = scan_post_terms(_term_cache(_load_related_cache(CACHE_DIR)))
+    n_docs = len(posts)
+    df: dict[str, int] = {}
+    for entry in posts.values():
+        for term in entry["terms"]:
+            df[term] = df.get(term, 0) + 1
+    idf = {term: math.log((1 + n_docs) / (1 + n)) + 1.0 for term, n in df.items()}
+
+    sums = {"tags": {}, "categories": {}}
+    for slug, entry in posts.items():
+        vec = {t: (1.0 + math.log(c)) * idf[t] for t, c in entry["terms"].items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        for field, field_sums in sums.items():
+            for label in meta_labels(metas[slug], field):
+                acc = field_sums.setdefault(label, {})
+                for t, w in vec.items():
+                    acc[t] = acc.get(t, 0.0) + w / norm
+
+    centroids = {}
+    used_terms: set[str] = set()
+    for field, field_sums in sums.items():
+        centroids[field] = {}
+        for label, acc in field_sums.items():
+            top = sorted(acc.items(), key=lambda x: x[1], reverse=True)[:LABEL_CENTROID_TERMS]
+            norm = math.sqrt(sum(w * w for _, w in top)) or 1.0
+            centroids[field][label] = {t: round(w / norm, 5) for t, w in top}
+            used_terms.update(t for t, _ in top)
+
+    # 只需保留质心中出现过的词的 IDF：其余词对点积没有贡献
+    return {
+        "idf": {t: round(idf[t], 5) for t in used_terms},
+        "tags": centroids["tags"],
+        "categories": centroids["categories"],
+    }
+
+
+class LabelSuggester:
+    """
+    基于内容相似度的标签 / 分类推荐器。
+
+    质心向量按文章目录指纹缓存在 .publish-cache 中，文章无变化时直接加载；
+    推荐时通过「词 → 质心」倒排表只遍历笔记中出现过的词，数千篇文章下也只需几毫秒。
+    """
+
+    def __init__(self, data: dict):
+        self.idf: dict[str, float] = data.get("idf", {})
+        self._postings: dict[str, dict[str, list[tuple[str, float]]]] = {}
+        for field in ("tags", "categories"):
+            postings: dict[str, list[tuple[str, float]]] = {}
+            for label, vec in data.get(field, {}).items():
+                for term, weight in vec.items():
+                    postings.setdefault(term, []).append((label, weight))
+            self._postings[field] = postings
+
+    # 进程内按目录指纹记住最近一次加载结果；锁保证后台预热与前台调用不会重复构建
+    _memo: tuple[str, "LabelSuggester"] | None = None
+    _load_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, log=print) -> "LabelSuggester":
+        with cls._load_lock:
+            signature = _posts_signature()
+            if cls._memo and cls._memo[0] == signature:
+                return cls._memo[1]
+            suggester = cls._load_or_build(signature, log)
+            cls._memo = (signature, suggester)
+            return suggester
+
+    @classmethod
+    def _load_or_build(cls, signature: str, log) -> "LabelSuggester":
+        cache_file = CACHE_DIR / LABEL_CENTROIDS_FILE
+        try:
+            data = json.loads(cache_file.read_text(encoding="utf-8"))
+            if data.get("signature") == signature and data.get("version") == RELATED_CACHE_VERSION:
+                return cls(data)
+        except (OSError, ValueError):
+            pass
+
+        data = _build_label_centroids()
+        data["signature"] = signature
+        data["version"] = RELATED_CACHE_VERSION
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        except OSError as e:
+            log(f"  ⚠️  写入标签推荐缓存失败: {e}")
+        return cls(data)
+
+    def suggest(self, text: str, field: str = "tags", limit: int = 8) -> list[tuple[str, float]]:
+        """返回与 text 最相似的已有标签（或分类），形如 [(名称, 得分), ...]，按得分降序。"""
+        postings = self._postings.get(field, {})
+        scores: dict[str, float] = {}
+        for term, count in _term_counts(text).items():
+            labels = postings.get(term)
+            if not labels:
+                continue
+            weight = (1.0 + math.log(count)) * self.idf.get(term, 1.0)
+            for label, w in labels:
+                scores[label] = scores.get(label, 0.0) + weight * w
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:limit]
+
+
+# ──────────────────────────────────────────
+#  常驻进程支持：文章索引 / 附件索引 / 客户端
+# ──────────────────────────────────────────
+
+class PostIndex:
+    """
+    pages/posts 的 Front Matter 索引，同时保存每篇文章在 posts.json 中的条目（summarize_post）。
+    refresh() 只 stat 文件，按 (大小, 修改时间) 增量重新解析变化的文章。
+    load() / save() 把索引持久化到 .publish-cache/，进程重启后同样只解析变化的文章。
+    """
+
+    def __init__(self, posts_dir: Path | None = None):
+        self.posts_dir = posts_dir
+        self.entries: dict[str, dict] = {}  # slug -> {"size", "mtime_ns", "meta", "summary"}
+
+    @classmethod
+    def load(cls, cache_file: Path, posts_dir: Path | None = None) -> "PostIndex":
+        index = cls(posts_dir)
+        try:
+            data = json.loads(cache_file.read_text(encoding="utf-8"))
+            if data.get("version") == POST_INDEX_VERSION:
+                index.entries = data["entries"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        return index
+
+    def save(self, cache_file: Path):
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(cache_file, json.dumps({"version": POST_INDEX_VERSION, "entries": self.entries},
+                                                 ensure_ascii=False, default=str))
+
+    def refresh(self) -> set[str]:
+        """刷新索引，返回新增或变化的 slug 集合。"""
+        changed = set()
+        seen = set()
+        posts_dir = self.posts_dir or POSTS_DIR
+        if posts_dir.exists():
+            for entry in os.scandir(posts_dir):
+                if not entry.name.endswith(".md") or not entry.is_file():
+                    continue
+                slug = entry.name[:-3]
+                seen.add(slug)
+                st = entry.stat()
+                cached = self.entries.get(slug)
+                if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+                    continue
+                try:
+                    meta, body = parse_front_matter(Path(entry.path).read_text(encoding="utf-8"))
+                except (OSError, UnicodeDecodeError):
+                    continue
+                self.entries[slug] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "meta": meta or {},
+                                      "summary": summarize_post(slug, meta or {}, body)}
+                changed.add(slug)
+        for slug in set(self.entries) - seen:
+            del self.entries[slug]
+            changed.add(slug)
+        return changed
+
+    def labels(self, field: str) -> list[str]:
+        """按出现频率降序返回所有标签（field="tags"）或分类（field="categories"）。"""
+        count: dict[str, int] = {}
+        for entry in self.entries.values():
+            for label in meta_labels(entry["meta"], field):
+                count[label] = count.get(label, 0) + 1
+        return [k for k, _ in sorted(count.items(), key=lambda x: x[1], reverse=True)]
+
+
+class AttachmentIndex:
+    """
+    Obsidian 库内附件的「文件名 → 路径」索引，避免每次发布都逐个目录探测。
+    多个同名文件时优先选择与笔记目录共享路径最长的那个；
+    索引未命中时退回 find_image_file，并把结果补进索引。
+    """
+
+    def __init__(self, vault_root: Path):
+        self.vault_root = vault_root
+        self.by_name: dict[str, list[Path]] = {}
+        self.rebuild()
+
+    def rebuild(self):
+        self.by_name.clear()
+        for dirpath, dirnames, filenames in os.walk(self.vault_root):
+            # 跳过 .obsidian / .git / .trash 等隐藏目录
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                if Path(name).suffix.lower() in MEDIA_EXTENSIONS:
+                    self.by_name.setdefault(name, []).append(Path(dirpath) / name)
+
+    def resolve(self, ref: str, md_file_path: Path) -> Path | None:
+        direct = md_file_path.parent / ref
+        if direct.is_file():
+            return direct
+
+        name = Path(ref).name
+        candidates = [c for c in self.by_name.get(name, []) if c.is_file()]
+        if candidates:
+            directory = md_file_path.parent
+            return max(candidates, key=lambda c: _shared_prefix_len(c, directory))
+
+        found = find_image_file(ref, md_file_path)
+        if found:
+            self.by_name.setdefault(name, []).append(found)
+        return found
+
+
+class DaemonClient:
+    """
+    publish_daemon.py 的 HTTP 客户端。常驻进程启动时会把端口和访问令牌写入
+    .publish-cache/daemon.json，客户端据此连接；文件不存在即视为未运行。
+    """
+
+    def __init__(self, port: int, token: str):
+        self.base_url = f"http://{DAEMON_HOST}:{port}"
+        self.token = token
+
+    @classmethod
+    def connect(cls, timeout: float = 0.3) -> "DaemonClient | None":
+        """常驻进程正在运行时返回客户端，否则返回 None。"""
+        try:
+            info = json.loads((CACHE_DIR / "daemon.json").read_text(encoding="utf-8"))
+            client = cls(int(info["port"]), str(info["token"]))
+            client.request("GET", "/status", timeout=timeout)
+            return client
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def request(self, method: str, path: str, payload: dict | None = None, timeout: float | None = None) -> dict:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json", "X-Publish-Token": self.token},
+        )
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def status(self) -> dict:
+        return self.request("GET", "/status", timeout=5)
+
+    def labels(self) -> dict:
+        """返回 {"tags": [...], "categories": [...]}，均按频率降序。"""
+        return self.request("GET", "/tags", timeout=5)
+
+    def publish(self, **payload) -> dict:
+        """发布单篇笔记，参数见 publish_daemon.py 的 /publish 接口。"""
+        return self.request("POST", "/publish", payload)
+
+    def publish_batch(self, items: list[dict], push: bool = True) -> dict:
+        return self.request("POST", "/batch", {"items": items, "push": push})
+
+
+# ──────────────────────────────────────────
+#  笔记索引与模糊搜索（GUI 笔记选择器）
+# ──────────────────────────────────────────
+
+NOTE_TITLE_PEEK_BYTES = 4096
+
+
+def _note_title(path: Path) -> str:
+    """笔记标题：Front Matter 的 title，其次第一个一级标题，都没有则用文件名。只读文件开头。"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(NOTE_TITLE_PEEK_BYTES)
+        text = decode_note_bytes(head)
+    except (OSError, UnicodeDecodeError):
+        return path.stem
+    m = re.match(r"^---\s*\n(.*?)\n---", text, re.DOTALL)
+    if m:
+        t = re.search(r"^title:[ \t]*[\"']?(.+?)[\"']?[ \t]*$", m.group(1), re.MULTILINE)
+        if t:
+            return t.group(1)
+        text = text[m.end():]
+    h = re.search(r"^#[ \t]+(.+?)[ \t]*$", text, re.MULTILINE)
+    return h.group(1) if h else path.stem
+
+
+def fuzzy_score(query: str, text: str) -> float | None:
+    """
+    子序列模糊匹配：query 的字符须按顺序出现在 text 中（忽略大小写与空格），否则返回 None。
+    连续命中、命中词首 / 路径分隔符之后的字符加分，跨度越大扣分越多。
+    """
+    query = query.lower().replace(" ", "")
+    if not query:
+        return 0.0
+    text = text.lower()
+    score = 0.0
+    pos = -1
+    first = None
+    for ch in query:
+        nxt = text.find(ch, pos + 1)
+        if nxt < 0:
+            return None
+        if first is None:
+            first = nxt
+        if nxt == pos + 1:
+            score += 3
+        if nxt == 0 or text[nxt - 1] in " /\\-_.":
+            score += 2
+        score += 1
+        pos = nxt
+    return score - (pos - first) * 0.05 - first * 0.01
+
+
+class NoteIndex:
+    """
+    Obsidian 库内 Markdown 笔记的内存索引：路径、标题、修改时间、发布状态。
+    refresh() 不重新遍历整个库：只重新列出修改时间变化的目录（增删改名都会改变目录的修改时间），
+    其余目录只 stat 已知的笔记；标题只在笔记变化时重新读取文件开头。
+    发布状态来自 PostIndex：未发布 / 已发布 / 有更新（笔记比已发布的文章新）。
+    """
+
+    def __init__(self, vault_root: Path):
+        self.vault_root = vault_root
+        self.notes: dict[Path, dict] = {}      # 路径 -> {"title", "mtime_ns", "size", "rel"}
+        self._dirs: dict[Path, int] = {}       # 目录 -> 修改时间
+        self._dir_notes: dict[Path, set[Path]] = {}
+        self._lock = threading.Lock()
+        self.posts = PostIndex()
+
+    def _scan_dir(self, directory: Path, notes: dict, dirs: dict, dir_notes: dict):
+        """列出单个目录：登记笔记与子目录，新出现的子目录递归扫描。"""
+        try:
+            dirs[directory] = directory.stat().st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            dirs.pop(directory, None)
+            return
+        found = set()
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue  # .obsidian / .git / .trash
+            path = Path(entry.path)
+            if entry.is_dir(follow_symlinks=False):
+                if path not in dirs:
+                    self._scan_dir(path, notes, dirs, dir_notes)
+            elif entry.name.lower().endswith((".md", ".markdown")):
+                found.add(path)
+                self._update_note(path, entry.stat(), notes)
+        for gone in dir_notes.get(directory, set()) - found:
+            notes.pop(gone, None)
+        dir_notes[directory] = found
+
+    def _update_note(self, path: Path, st, notes: dict):
+        cached = notes.get(path)
+        if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+            return
+        notes[path] = {
+            "title": _note_title(path),
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "rel": path.relative_to(self.vault_root).as_posix(),
+        }
+
+    def refresh(self) -> int:
+        """增量刷新索引，返回当前笔记数量。"""
+        with self._lock:
+            notes = dict(self.notes)
+            dirs = dict(self._dirs)
+            dir_notes = dict(self._dir_notes)
+            if not dirs:
+                self._scan_dir(self.vault_root, notes, dirs, dir_notes)
+            else:
+                for directory, mtime_ns in list(dirs.items()):
+                    if directory not in dirs:
+                        continue  # 已随父目录一起移除
+                    try:
+                        changed = directory.stat().st_mtime_ns != mtime_ns
+                    except OSError:
+                        changed = True
+                    if changed:
+                        self._scan_dir(directory, notes, dirs, dir_notes)
+                        if directory not in dirs:
+                            # 目录已删除：连同其下的子目录与笔记一起移除
+                            for d in [d for d in dirs if directory in d.parents]:
+                                del dirs[d]
+                            for d in [d for d in dir_notes if d == directory or directory in d.parents]:
+                                for note in dir_notes.pop(d):
+                                    notes.pop(note, None)
+                        continue
+                    for note in dir_notes.get(directory, ()):
+                        try:
+                            self._update_note(note, note.stat(), notes)
+                        except OSError:
+                            notes.pop(note, None)
+            self.posts.refresh()
+            self.notes, self._dirs, self._dir_notes = notes, dirs, dir_notes
+            return len(notes)
+
+    def status(self, path: Path) -> str:
+        """published / modified / unpublished。"""
+        entry = self.posts.entries.get(post_filename(path)[:-3])
+        if entry is None:
+            return "unpublished"
+        note = self.notes.get(path)
+        return "modified" if note and note["mtime_ns"] > entry["mtime_ns"] else "published"
+
+    def search(self, query: str, limit: int = 50, within: list[Path] | None = None) -> list[Path]:
+        """
+        按标题与相对路径模糊搜索；空查询按修改时间倒序列出最近的笔记。
+        within 为上一次（更短查询）的结果时只在其中筛选，输入时逐字缩小范围。
+        """
+        notes = self.notes
+        candidates = within if within is not None else notes.keys()
+        scored = []
+        for path in candidates:
+            note = notes.get(path)
+            if note is None:
+                continue
+            score = fuzzy_score(query, f"{note['title']} {note['rel']}")
+            if score is not None:
+                scored.append((score, note["mtime_ns"], path))
+        scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        paths = [p for _, _, p in scored]
+        return paths if limit is None else paths[:limit]
+
+
+# ──────────────────────────────────────────
+#  站内引用与 Front Matter 检查
+# ──────────────────────────────────────────
+
+PUBLIC_FILES_CACHE = "public-files.json"
+# 站内资源引用 /assets/... 与 /images/...；前面紧跟域名或路径字符的（https://cdn/assets/...）不算
+SITE_ASSET_PATTERN = re.compile(r"""(?<![\w.:/%-])/(?:assets|images)/[^\s)"'<>?#|\]]+""")
+FRONT_MATTER_BLOCK_PATTERN = re.compile(r"^---\s*\n(.*?)\n---\s*(?:\n|$)", re.DOTALL)
+# Front Matter 字段约定：字段 → (允许的类型, 说明)；未列出的字段不检查
+FRONT_MATTER_SCHEMA = {
+    "title": ((str, int, float), "字符串"),
+    "date": ((str, datetime, date), "日期"),
+    "updated": ((str, datetime, date), "日期"),
+    "tags": ((list, str), "列表"),
+    "categories": ((list, str), "列表或字符串"),
+    "excerpt": ((str,), "字符串"),
+    "cover": ((str,), "字符串"),
+    "layout": ((str,), "字符串"),
+    "top": ((int,), "整数"),
+}
+# pages/posts/ 下的文章必须具备的字段
+POST_REQUIRED_FIELDS = ("title", "date")
+
+
+class PublicFiles:
+    """
+    public/ 下所有文件的相对路径集合（如 assets/a.png），用于检查站内引用。
+    按目录 mtime 增量刷新：目录未变化时沿用缓存的文件列表，只需 stat 一次，
+    缓存保存在 .publish-cache/public-files.json。
+    """
+
+    def __init__(self, root: Path | None = None):
+        self.public_dir = (root or VALAXY_ROOT) / "public"
+        cache_dir = CACHE_DIR if root is None else root / CACHE_DIR.name
+        self.cache_file = cache_dir / PUBLIC_FILES_CACHE
+        try:
+            self._dirs = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._dirs = {}
+        self.files: set[str] = set()
+        self._lower: dict[str, str] | None = None
+
+    def refresh(self) -> "PublicFiles":
+        dirs: dict[str, dict] = {}
+        files: set[str] = set()
+        changed = False
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            path = self.public_dir / rel if rel else self.public_dir
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            entry = self._dirs.get(rel)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                names, subdirs = [], []
+                try:
+                    with os.scandir(path) as it:
+                        for e in it:
+                            (subdirs if e.is_dir() else names).append(e.name)
+                except OSError:
+                    continue
+                entry = {"mtime_ns": mtime_ns, "files": names, "dirs": subdirs}
+                changed = True
+            dirs[rel] = entry
+            prefix = f"{rel}/" if rel else ""
+            files.update(prefix + name for name in entry["files"])
+            stack.extend(prefix + name for name in entry["dirs"])
+
+        if changed or dirs.keys() != self._dirs.keys():
+            try:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                write_text_atomic(self.cache_file, json.dumps(dirs, ensure_ascii=False))
+            except OSError:
+                pass
+        self._dirs = dirs
+        self.files = files
+        self._lower = None
+        return self
+
+    def case_mismatch(self, rel: str) -> str | None:
+        """大小写不同但存在的文件（Windows 上能打开，部署到区分大小写的服务器后 404）。"""
+        if self._lower is None:
+            self._lower = {name.lower(): name for name in self.files}
+        return self._lower.get(rel.lower())
+
+
+def _line_of(content: str, offset: int) -> int:
+    return content.count("\n", 0, offset) + 1
+
+
+def _is_valid_date(value) -> bool:
+    return parse_post_date(value) is not None
+
+
+def check_front_matter_schema(meta: dict, is_post: bool = True) -> list[tuple[str, str]]:
+    """按 FRONT_MATTER_SCHEMA 检查字段类型与取值，返回 [(字段, 问题)]。"""
+    problems = []
+    if is_post:
+        for key in POST_REQUIRED_FIELDS:
+            if meta.get(key) in (None, ""):
+                problems.append((key, f"缺少必需字段 {key}"))
+    for key, (types, expected) in FRONT_MATTER_SCHEMA.items():
+        value = meta.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            problems.append((key, f"{key} 应为{expected}，实际为 {type(value).__name__}"))
+        elif key in ("date", "updated") and not _is_valid_date(value):
+            problems.append((key, f"{key} 不是可识别的日期：{value!r}"))
+        elif isinstance(value, list):
+            bad = [item for item in value if not isinstance(item, (str, int, float)) or isinstance(item, bool)]
+            if bad:
+                problems.append((key, f"{key} 的元素应为字符串：{bad[0]!r}"))
+    return problems
+
+
+def check_post(content: str, files: PublicFiles, is_post: bool = True) -> list[tuple[int, str]]:
+    """
+    检查单篇文章，返回 [(行号, 问题)]：
+      - Front Matter 是否为合法 YAML、是否符合 FRONT_MATTER_SCHEMA
+      - 每个 /assets/、/images/ 引用在 public/ 下是否存在（大小写也须一致）
+      - 是否残留未迁移的本地附件引用（相对路径 / ![[附件]]）
+    代码块与行内代码中的内容不检查。
+    """
+    problems: list[tuple[int, str]] = []
+    fm = FRONT_MATTER_BLOCK_PATTERN.match(content)
+    if fm is None:
+        if is_post:
+            problems.append((1, "缺少 Front Matter"))
+    else:
+        raw = fm.group(1)
+        try:
+            meta = yaml.safe_load(raw)
+        except yaml.YAMLError as e:
+            mark = getattr(e, "problem_mark", None)
+            problems.append((mark.line + 2 if mark else 1,
+                             f"Front Matter 不是合法的 YAML：{getattr(e, 'problem', None) or e}"))
+        else:
+            if not isinstance(meta, dict):
+                problems.append((1, "Front Matter 应为键值对"))
+            else:
+                for key, message in check_front_matter_schema(meta, is_post):
+                    m = re.search(rf"^{re.escape(key)}\s*:", raw, re.MULTILINE)
+                    problems.append((_line_of(raw, m.start()) + 1 if m else 1, message))
+
+    masked = CODE_PATTERN.sub(lambda m: re.sub(r"[^\n]", " ", m.group(0)), content)
+    for m in SITE_ASSET_PATTERN.finditer(masked):
+        rel = urllib.parse.unquote(m.group(0)).lstrip("/")
+        if rel in files.files:
+            continue
+        actual = files.case_mismatch(rel)
+        hint = f"（大小写不一致，实际文件为 public/{actual}）" if actual else ""
+        problems.append((_line_of(masked, m.start()), f"引用的文件不存在：{m.group(0)}{hint}"))
+
+    body_start = fm.end() if fm else 0
+    for m in MD_IMAGE_PATTERN.finditer(masked, body_start):
+        ref = m.group(2).strip().strip("<>").split(" ")[0]
+        if ref and not ref.startswith(("/", "data:", "#")):
+            problems.append((_line_of(masked, m.start()), f"未迁移的本地附件引用：{ref}"))
+    for m in WIKI_EMBED_PATTERN.finditer(masked, body_start):
+        ref = m.group(1).strip()
+        if Path(ref).suffix.lower() in MEDIA_EXTENSIONS:
+            problems.append((_line_of(masked, m.start()), f"未迁移的本地附件引用：![[{ref}]]"))
+    return sorted(problems)
+
+
+def check_site(paths: list[Path] | None = None, root: Path | None = None, log=print) -> int:
+    """
+    检查 paths（默认 root/pages 下全部 .md）中的站内引用与 Front Matter，
+    按文章列出问题，返回问题总数。
+    """
+    root = root or VALAXY_ROOT
+    pages_dir = root / "pages"
+    posts_dir = pages_dir / "posts"
+    files = PublicFiles(None if root == VALAXY_ROOT else root).refresh()
+    if paths is None:
+        paths = sorted(pages_dir.rglob("*.md"))
+
+    total = 0
+    for md in paths:
+        try:
+            content = read_note(md)
+        except OSError as e:
+            log(f"  ⚠️  警告：无法读取 {md.name}：{e}")
+            continue
+        problems = check_post(content, files, is_post=posts_dir in md.parents)
+        if problems:
+            total += len(problems)
+            try:
+                name = md.relative_to(pages_dir).as_posix()
+            except ValueError:
+                name = md.name
+            log(f"\n📄 {name}")
+            for line, message in problems:
+                log(f"   ❌ L{line:<4} {message}")
+    return total
+
+
+def verify_staged_posts(root: Path | None = None, log=print) -> bool:
+    """
+    推送前检查：暂存区中新增 / 修改的 pages/ 文章逐篇检查；
+    若暂存区删除了 public/ 下的文件，则检查全部文章。有问题时返回 False。
+    """
+    root = root or VALAXY_ROOT
+    ok, out = _git_output(["diff", "--cached", "--name-only", "--diff-filter=ACMRD", "-z",
+                           "--", "pages", "public"], root)
+    if not ok:
+        return True
+    staged = [name for name in out.split("\0") if name]
+    deleted_public = False
+    if any(name.startswith("public/") for name in staged):
+        ok, out = _git_output(["diff", "--cached", "--name-only", "--diff-filter=D", "-z", "--", "public"], root)
+        deleted_public = ok and bool(out.strip("\0"))
+    if deleted_public:
+        paths = None
+    else:
+        paths = [root / name for name in staged if name.startswith("pages/") and name.endswith(".md")]
+        paths = [p for p in paths if p.is_file()]
+        if not paths:
+            return True
+
+    t0 = time.perf_counter()
+    problems = check_site(paths, root, log)
+    elapsed = (time.perf_counter() - t0) * 1000
+    if problems:
+        log(f"\n❌ 推送前检查发现 {problems} 个问题，已阻止提交与推送；修正后重新发布即可")
+        return False
+    checked = "全部文章" if paths is None else f"{len(paths)} 篇文章"
+    log(f"    ✅ 引用与 Front Matter 检查通过（{checked}，{elapsed:.0f} ms）")
+    return True
+
+
+def cmd_check_site(argv: list[str]) -> int:
+    """check-site 子命令：检查全站文章的站内资源引用与 Front Matter，有问题时返回 1。"""
+    parser = argparse.ArgumentParser(prog="publish.py check-site",
+                                     description="检查文章引用的 /assets、/images 文件是否存在以及 Front Matter 是否规范")
+    parser.add_argument("files", nargs="*", type=Path, help="只检查指定的文章（默认检查 pages/ 下全部）")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paths = [f.resolve() for f in args.files] or None
+    problems = check_site(paths)
+    elapsed = (time.perf_counter() - t0) * 1000
+    print()
+    if problems:
+        print(f"❌ 发现 {problems} 个问题（{elapsed:.0f} ms）")
+        return 1
+    print(f"✅ 站内引用与 Front Matter 均正常（{elapsed:.0f} ms）")
+    return 0
+
+
+# ──────────────────────────────────────────
+#  批量规范化 Front Matter
+# ──────────────────────────────────────────
+
+
+def _normalize_file(path: str, partial_dir: str | None) -> tuple[str, str | None, str | None]:
+    """
+    进程池任务：按 normalize_front_matter 重写单篇文章的 Front Matter，正文保持不变。
+    返回 (路径, Front Matter 的统一 diff | None（无需修改）, 错误 | None)。
+    partial_dir 为 None 时只计算 diff（dry run），否则经该目录原子写回。
+    """
+    md = Path(path)
+    try:
+        text = decode_note_bytes(md.read_bytes())
+    except OSError as e:
+        return path, None, f"无法读取：{e}"
+    fm = FRONT_MATTER_RAW_PATTERN.match(text)
+    if fm is None:
+        return path, None, "缺少 Front Matter，已跳过"
+    try:
+        meta = yaml.safe_load(fm.group(1))
+    except yaml.YAMLError as e:
+        return path, None, f"Front Matter 不是合法的 YAML，已跳过：{getattr(e, 'problem', None) or e}"
+    if not isinstance(meta, dict):
+        return path, None, "Front Matter 应为键值对，已跳过"
+
+    old_header = text[:fm.end()]
+    eol = "\r\n" if "\r\n" in old_header else "\n"
+    new_header = dump_front_matter(normalize_front_matter(meta), "").replace("\n", eol)
+    if not fm.group(2):
+        # 文件以 Front Matter 结尾且没有末尾换行
+        new_header = new_header[:-len(eol)]
+    if new_header == old_header:
+        return path, None, None
+
+    diff = "".join(difflib.unified_diff(old_header.splitlines(keepends=True), new_header.splitlines(keepends=True),
+                                        f"a/{md.name}", f"b/{md.name}"))
+    if partial_dir is not None:
+        # 以字节写回，正文（包括换行符）原样保留
+        tmp = Path(partial_dir) / f"{md.name}.{os.getpid()}.tmp"
+        tmp.write_bytes((new_header + text[fm.end():]).encode("utf-8"))
+        os.replace(tmp, md)
+    return path, diff, None
+
+
+def normalize_posts(paths: list[Path], dry_run: bool = False, workers: int | None = None,
+                    log=print) -> tuple[int, int]:
+    """
+    用进程池并行规范化多篇文章的 Front Matter，按文章顺序输出 diff（dry run）或改动的文件名。
+    返回 (需要 / 已经修改的篇数, 跳过的篇数)。
+    """
+    partial_dir = None
+    if not dry_run:
+        partial_dir = CACHE_DIR / "partial"
+        partial_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [(str(p), None if partial_dir is None else str(partial_dir)) for p in paths]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_normalize_file, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [_normalize_file(*job) for job in jobs]
+
+    changed = skipped = 0
+    for path, diff, error in results:
+        name = Path(path).name
+        if error:
+            skipped += 1
+            log(f"  ⚠️  {name}：{error}")
+        elif diff:
+            changed += 1
+            log(diff.rstrip("\n") if dry_run else f"  ✅ 已规范化：{name}")
+    return changed, skipped
+
+
+def cmd_normalize(argv: list[str]) -> int:
+    """normalize 子命令：把 pages/posts 下所有文章的 Front Matter 统一为规范格式。"""
+    parser = argparse.ArgumentParser(prog="publish.py normalize",
+                                     description="统一文章 Front Matter 的格式（日期、分类 / 标签列表、字段顺序等）")
+    parser.add_argument("files", nargs="*", type=Path, help="只处理指定的文章（默认 pages/posts 下全部）")
+    parser.add_argument("--dry-run", action="store_true", help="只输出将要进行的修改（diff），不写入文件")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    args = parser.parse_args(argv)
+
+    paths = [f.resolve() for f in args.files] or sorted(POSTS_DIR.glob("*.md"))
+    if not paths:
+        print("ℹ️  没有找到文章")
+        return 0
+
+    t0 = time.perf_counter()
+    changed, skipped = normalize_posts(paths, dry_run=args.dry_run, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print()
+    if not changed:
+        print(f"✅ {len(paths) - skipped} 篇文章的 Front Matter 已是规范格式（{elapsed:.2f}s）")
+    elif args.dry_run:
+        print(f"ℹ️  {changed} 篇文章需要规范化（dry run，未写入；{elapsed:.2f}s）")
+    else:
+        print(f"✅ 已规范化 {changed} 篇文章（{elapsed:.2f}s），请检查后提交")
+    if skipped:
+        print(f"⚠️  {skipped} 篇文章被跳过")
+    return 0
+
+
+# ──────────────────────────────────────────
+#  Git 操作
+# ──────────────────────────────────────────
+
+def run_git_command(args: list[str], error_msg: str, log=print, root: Path | None = None) -> bool:
+    """在 root（默认 VALAXY_ROOT）中执行 Git 命令，返回是否成功。"""
+    try:
+        result = subprocess.run(
+            ["git"] + args,
+            cwd=str(root or VALAXY_ROOT),
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+        )
+        if result.returncode != 0:
+            log(f"❌ {error_msg}")
+            log(f"   Git 输出: {result.stderr.strip() or result.stdout.strip()}")
+            return False
+        return True
+    except FileNotFoundError:
+        log("❌ 错误：未找到 Git 命令，请确保 Git 已安装并在 PATH 中")
+        return False
+    except Exception as e:
+        log(f"❌ 执行 Git 命令时出错: {e}")
+        return False
+
+
+def _git_has_staged_changes(root: Path | None = None) -> bool:
+    """暂存区是否有待提交的改动（git diff --cached --quiet 返回 1 表示有）。"""
+    try:
+        result = subprocess.run(
+            ["git", "diff", "--cached", "--quiet"],
+            cwd=str(root or VALAXY_ROOT),
+            capture_output=True,
+        )
+    except OSError:
+        return True
+    return result.returncode != 0
+
+
+def git_publish(title: str, log=print, timings: dict | None = None, root: Path | None = None,
+                push_args: list[str] | None = None) -> bool:
+    """
+    执行 git add / commit / push 三步发布。timings 字典（可选）记录每一步的耗时（秒）。
+    root 为仓库目录（默认 VALAXY_ROOT），push_args 为 push 的附加参数（如 ["origin", "HEAD:mirror"]）。
+    """
+    if timings is None:
+        timings = {}
+    log("\n🚀 开始 Git 发布流程...")
+    log("─" * 40)
+
+    # git add .
+    log("  ▶ git add .")
+    t0 = time.perf_counter()
+    ok = run_git_command(["add", "."], "执行 git add 失败", log, root)
+    timings["git_add"] = round(time.perf_counter() - t0, 3)
+    if not ok:
+        return False
+    log("    ✅ 暂存完成")
+
+    # 推送前检查站内引用与 Front Matter，有问题就不提交，省掉一次注定失败的部署
+    if not verify_staged_posts(root, log):
+        return False
+
+    # git commit（并发发布时改动可能已被排在前面的提交一并带走）
+    commit_msg = f"feat: publish {title}"
+    log(f"  ▶ git commit -m \"{commit_msg}\"")
+    t0 = time.perf_counter()
+    if not _git_has_staged_changes(root):
+        log("    ℹ️  没有新的更改需要提交")
+    elif not run_git_command(["commit", "-m", commit_msg], "执行 git commit 失败", log, root):
+        return False
+    else:
+        log("    ✅ 提交完成")
+    timings["git_commit"] = round(time.perf_counter() - t0, 3)
+
+    # git push
+    push = ["push"] + (push_args or [])
+    log(f"  ▶ git {' '.join(push)}")
+    t0 = time.perf_counter()
+    ok = run_git_command(push, "执行 git push 失败（请检查网络连接或远程仓库配置）", log, root)
+    timings["git_push"] = round(time.perf_counter() - t0, 3)
+    if not ok:
+        return False
+    log("    ✅ 推送完成")
+
+    return True
+
+
+# ──────────────────────────────────────────
+#  发布队列（跨进程锁）
+# ──────────────────────────────────────────
+
+PUBLISH_QUEUE_DIR = "publish-queue"
+
+
+def write_text_atomic(path: Path, text: str):
+    """
+    先写入 .publish-cache/partial/ 下的临时文件再原子替换，
+    保证并发的 git add 不会暂存到写了一半的文件。
+    """
+    partial_dir = CACHE_DIR / "partial"
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    tmp = partial_dir / f"{path.name}.{os.getpid()}.tmp"
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class FileLock:
+    """基于操作系统文件锁的跨进程互斥锁；进程退出时由系统自动释放。"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = None
+
+    def try_acquire(self) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, "a+b")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍在运行（用于清理崩溃进程遗留的队列文件）。"""
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _queue_file_pid(path: Path) -> int | None:
+    """队列文件名为 <时间戳>-<PID>.job.json / .done.json，取出 PID。"""
+    try:
+        return int(path.name.split(".", 1)[0].rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def queued_git_publish(title: str, log=print, runner=None, poll_interval: float = 0.5,
+                       timings: dict | None = None, root: Path | None = None) -> bool:
+    """
+    通过 .publish-cache/ 下的文件锁串行执行 Git 阶段，避免 CLI / GUI / 常驻进程
+    同时发布时争抢 .git/index.lock。
+
+    调用前文章与附件应已写入完毕。本次发布先登记到队列，再等待锁：
+      - 拿到锁的进程把队列中所有已登记的任务合并为一次提交，并为其它任务写入结果
+      - 等待中的进程若发现自己的任务已被合并提交，直接读取结果返回
+    等待中的进程退出（出错或 Ctrl-C）时删除自己的任务文件；拿到锁的进程跳过登记进程已退出的任务，
+    并清理无人读取的结果文件。
+    等待期间报告队列位置和已等待时间。runner(title, log) 执行实际的 Git 操作，
+    默认为 git_publish。timings 字典（可选）记录排队等待时间 git_wait（秒）。
+    root 为其它发布目标的站点根目录时，使用该目标自己的队列与锁（各仓库互不阻塞）。
+    返回本次发布的 Git 阶段是否成功。
+    """
+    runner = runner or git_publish
+    if timings is None:
+        timings = {}
+    cache_dir = CACHE_DIR if root is None else root / CACHE_DIR.name
+    queue_dir = cache_dir / PUBLISH_QUEUE_DIR
+    queue_dir.mkdir(parents=True, exist_ok=True)
+    job_id = f"{time.time_ns()}-{os.getpid()}"
+    job_file = queue_dir / f"{job_id}.job.json"
+    done_file = queue_dir / f"{job_id}.done.json"
+    job_file.write_text(
+        json.dumps({"title": title, "pid": os.getpid()}, ensure_ascii=False), encoding="utf-8"
+    )
+
+    try:
+        lock = FileLock(cache_dir / "publish.lock")
+        started = time.monotonic()
+        last_position = None
+        last_report = 0.0
+        while not lock.try_acquire():
+            if done_file.exists():
+                result = json.loads(done_file.read_text(encoding="utf-8"))
+                done_file.unlink(missing_ok=True)
+                waited = time.monotonic() - started
+                timings["git_wait"] = round(waited, 3)
+                log(f"  ℹ️  已合并到其它进程的提交中（等待 {waited:.1f} 秒）")
+                return bool(result.get("ok"))
+
+            position = sum(1 for f in queue_dir.glob("*.job.json") if f.name < job_file.name)
+            waited = time.monotonic() - started
+            if position != last_position or waited - last_report >= 5:
+                log(f"  ⏳ 另一个发布正在进行，排队中：前面还有 {position} 个任务，已等待 {waited:.0f} 秒")
+                last_position, last_report = position, waited
+            time.sleep(poll_interval)
+
+        try:
+            if done_file.exists():
+                # 在等待的最后一刻被别的进程合并提交了
+                result = json.loads(done_file.read_text(encoding="utf-8"))
+                done_file.unlink(missing_ok=True)
+                log("  ℹ️  已合并到其它进程的提交中")
+                return bool(result.get("ok"))
+
+            # 登记进程已退出的任务不再合并，无人读取的结果文件一并清理
+            for f in queue_dir.glob("*.done.json"):
+                pid = _queue_file_pid(f)
+                if pid is not None and not _pid_alive(pid):
+                    f.unlink(missing_ok=True)
+            jobs = []
+            for f in sorted(queue_dir.glob("*.job.json")):
+                pid = _queue_file_pid(f)
+                if f != job_file and pid is not None and not _pid_alive(pid):
+                    log(f"  🧹 跳过已退出进程（PID {pid}）遗留的发布任务")
+                    f.unlink(missing_ok=True)
+                    continue
+                jobs.append(f)
+            titles = []
+            for f in jobs:
+                try:
+                    titles.append(json.loads(f.read_text(encoding="utf-8"))["title"])
+                except (OSError, ValueError, KeyError):
+                    titles.append(f.name.split(".")[0])
+            if len(jobs) > 1:
+                log(f"  🔀 合并队列中的 {len(jobs)} 个发布任务为一次提交")
+            waited = time.monotonic() - started
+            timings["git_wait"] = round(waited, 3)
+            if waited >= poll_interval:
+                log(f"  ✅ 已获得发布锁（等待 {waited:.1f} 秒）")
+
+            ok = False
+            try:
+                ok = runner("、".join(dict.fromkeys(titles)), log)
+            finally:
+                for f in jobs:
+                    if f != job_file:
+                        other_done = f.with_name(f.name.replace(".job.json", ".done.json"))
+                        other_done.write_text(json.dumps({"ok": ok, "by": job_id}), encoding="utf-8")
+                    f.unlink(missing_ok=True)
+            return ok
+        finally:
+            lock.release()
+    finally:
+        # 正常结束时两者都已删除；出错或被中断时避免遗留任务被合并进别人的提交
+        job_file.unlink(missing_ok=True)
+        done_file.unlink(missing_ok=True)
+
+
+# ──────────────────────────────────────────
+#  多目标发布
+# ──────────────────────────────────────────
+
+ASSET_REF_PATTERN = re.compile(r"""/assets/([^\s)"'<>?#]+)""")
+
+
+def iter_asset_refs(content: str):
+    """列出文章中引用的 /assets/ 文件名（去重，按出现顺序）。"""
+    yield from dict.fromkeys(urllib.parse.unquote(m.group(1)) for m in ASSET_REF_PATTERN.finditer(content))
+
+
+def load_publish_targets() -> list[dict]:
+    """
+    读取发布目标。主目标 main 始终是 VALAXY_ROOT，PUBLISH_TARGETS_FILE 中列出的为镜像目标：
+
+        targets:
+          mirror:
+            root: D:\\myWeb-mirror   # 另一个 Valaxy 站点（独立的 Git 仓库）
+            remote: origin           # 可选，push 的远程
+            branch: mirror           # 可选，推送到远程的该分支（HEAD:<branch>）
+
+    返回 [{"name", "root", "push_args"}]，配置有误时抛出 ValueError。
+    """
+    targets = [{"name": "main", "root": VALAXY_ROOT, "push_args": []}]
+    if not PUBLISH_TARGETS_FILE.exists():
+        return targets
+    try:
+        config = yaml.safe_load(PUBLISH_TARGETS_FILE.read_text(encoding="utf-8")) or {}
+    except (OSError, yaml.YAMLError) as e:
+        raise ValueError(f"无法读取 {PUBLISH_TARGETS_FILE.name}：{e}")
+    for name, spec in (config.get("targets") or {}).items():
+        if name == "main" or not isinstance(spec, dict) or not spec.get("root"):
+            raise ValueError(f"{PUBLISH_TARGETS_FILE.name}：目标「{name}」缺少 root 或名称与 main 冲突")
+        root = Path(spec["root"])
+        if not root.is_dir():
+            raise ValueError(f"{PUBLISH_TARGETS_FILE.name}：目标「{name}」的目录不存在 → {root}")
+        push_args = []
+        if spec.get("branch"):
+            push_args = [str(spec.get("remote") or "origin"), f"HEAD:{spec['branch']}"]
+        elif spec.get("remote"):
+            push_args = [str(spec["remote"])]
+        targets.append({"name": str(name), "root": root, "push_args": push_args})
+    return targets
+
+
+def mirror_post(target: dict, posts: list[tuple[str, str]], log=print):
+    """
+    把主目标中已写好的文章同步到镜像目标：posts 为 [(文件名, 内容)]。复制文章引用的附件
+    （主目标 public/assets/ 中已迁移好的文件，大小与修改时间一致时跳过），写入文章，
+    全部写完后再更新一次该目标的相关文章。
+    """
+    root = target["root"]
+    assets_dir = root / "public" / "assets"
+    partial_dir = root / CACHE_DIR.name / "partial"
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    copied = skipped = 0
+    names = {name for _, content in posts for name in iter_asset_refs(content)}
+    for name in sorted(names):
+        src = ASSETS_DIR / name
+        dest = assets_dir / name
+        if not src.is_file():
+            continue
+        st = src.stat()
+        if dest.exists() and dest.stat().st_size == st.st_size and int(dest.stat().st_mtime) == int(st.st_mtime):
+            skipped += 1
+            continue
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        tmp = partial_dir / f"{name}.{os.getpid()}.tmp"
+        shutil.copy2(str(src), str(tmp))
+        os.replace(tmp, dest)
+        copied += 1
+    log(f"  📦 附件：复制 {copied} 个，跳过 {skipped} 个")
+
+    posts_dir = root / "pages" / "posts"
+    posts_dir.mkdir(parents=True, exist_ok=True)
+    for post_name, content in posts:
+        write_text_atomic(posts_dir / post_name, content)
+        log(f"  ✅ 文章已写入: {posts_dir / post_name}")
+    update_related_posts(log=log, root=root)
+    update_posts_manifest(log=log, root=root)
+
+
+def publish_to_targets(targets: list[dict], posts: list[tuple[str, str]], title: str, log=print,
+                       primary_runner=None, timings: dict | None = None) -> dict[str, bool]:
+    """
+    Git 发布阶段：posts 为本次发布的 [(文件名, 内容)]（批量发布时有多篇）。
+    主目标（文章已写入）直接提交推送，镜像目标先 mirror_post 再提交推送，
+    所有目标并发执行，各自经过自己仓库的发布队列。返回 {目标名: 是否成功}。
+    只有主目标时与 queued_git_publish 完全相同；多个目标时每个目标的日志缓冲后整段输出，
+    不会互相穿插。primary_runner / timings 传给主目标的 queued_git_publish。
+    """
+    if len(targets) == 1:
+        return {"main": queued_git_publish(title, log=log, runner=primary_runner, timings=timings)}
+
+    def run(target: dict) -> tuple[bool, list[str], float]:
+        lines: list[str] = []
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            if target["name"] == "main":
+                ok = queued_git_publish(title, log=lines.append, runner=primary_runner, timings=timings)
+            else:
+                mirror_post(target, posts, log=lines.append)
+                runner = functools.partial(git_publish, root=target["root"], push_args=target["push_args"])
+                ok = queued_git_publish(title, log=lines.append, runner=runner, root=target["root"])
+        except PublishCancelled:
+            raise
+        except Exception as e:
+            lines.append(f"❌ 发布到目标「{target['name']}」时出错: {e}")
+        return ok, lines, time.perf_counter() - t0
+
+    log(f"\n🎯 同时发布到 {len(targets)} 个目标：{'、'.join(t['name'] for t in targets)}")
+    results: dict[str, bool] = {}
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        futures = {pool.submit(run, t): t for t in targets}
+        for future in futures:
+            target = futures[future]
+            try:
+                ok, lines, elapsed = future.result()
+            except PublishCancelled:
+                # 取消时不再启动尚未开始的目标，已在执行的目标在自己的下一个检查点退出
+                for pending in futures:
+                    pending.cancel()
+                raise
+            results[target["name"]] = ok
+            log(f"\n── 目标 {target['name']}（{target['root']}）──")
+            for line in lines:
+                log(line)
+
+    log("\n📋 各目标发布结果：")
+    for target in targets:
+        mark = "✅" if results[target["name"]] else "❌"
+        log(f"  {mark} {target['name']:<12} {target['root']}")
+    return results
+
+
+# ──────────────────────────────────────────
+#  仓库维护
+# ──────────────────────────────────────────
+
+def _git_output(args: list[str], root: Path) -> tuple[bool, str]:
+    try:
+        result = subprocess.run(["git"] + args, cwd=str(root), capture_output=True,
+                                text=True, encoding="utf-8")
+    except OSError as e:
+        return False, str(e)
+    return result.returncode == 0, (result.stdout + result.stderr).strip()
+
+
+def _git_version() -> tuple[int, ...]:
+    ok, out = _git_output(["--version"], Path.cwd())
+    m = re.search(r"(\d+)\.(\d+)", out) if ok else None
+    return (int(m.group(1)), int(m.group(2))) if m else (0, 0)
+
+
+def measure_git_latency(root: Path, runs: int = 3) -> dict[str, float]:
+    """git status 与 git add（--dry-run，不改动暂存区）各执行 runs 次，取中位数耗时（秒）。"""
+    result = {}
+    for name, args in (("git status", ["status", "--porcelain"]),
+                       ("git add", ["add", "--dry-run", "--ignore-missing", "."])):
+        samples = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            _git_output(args, root)
+            samples.append(time.perf_counter() - t0)
+        result[name] = _percentile(samples, 50)
+    return result
+
+
+def maintain_repo(root: Path | None = None, log=print, measure: bool = True, runs: int = 3) -> bool:
+    """
+    为站点仓库启用并执行 Git 的性能特性（按本机 Git 版本能力逐项启用）：
+      - commit-graph（含 changed-paths 布隆过滤器），加速历史遍历
+      - 松散对象打包 + 增量 repack + multi-pack-index，大量图片提交后不必全量 repack
+      - untracked cache，加速 git status / git add 扫描未跟踪文件
+      - 内置 fsmonitor（Windows / macOS 上的 Git ≥ 2.37），免去逐个 stat 工作区文件
+    执行前后分别测量 git status / git add 的耗时。与发布共用发布锁，不会和正在进行的提交冲突。
+    返回所有步骤是否成功。
+    """
+    root = root or VALAXY_ROOT
+    ok, _ = _git_output(["rev-parse", "--git-dir"], root)
+    if not ok:
+        log(f"❌ 不是 Git 仓库：{root}")
+        return False
+    version = _git_version()
+    _, build_options = _git_output(["version", "--build-options"], root)
+
+    lock = FileLock((CACHE_DIR if root == VALAXY_ROOT else root / CACHE_DIR.name) / "publish.lock")
+    waited = False
+    while not lock.try_acquire():
+        if not waited:
+            log("  ⏳ 正在等待进行中的发布完成...")
+            waited = True
+        time.sleep(0.5)
+
+    try:
+        before = measure_git_latency(root, runs) if measure else {}
+
+        config = {
+            "core.commitGraph": "true",
+            "fetch.writeCommitGraph": "true",
+            "gc.writeCommitGraph": "true",
+            "core.multiPackIndex": "true",
+            "core.untrackedCache": "true",
+        }
+        steps = [
+            ("commit-graph", ["commit-graph", "write", "--reachable", "--changed-paths"]),
+        ]
+        if version >= (2, 29):
+            steps += [
+                ("打包松散对象", ["maintenance", "run", "--task=loose-objects"]),
+                ("增量 repack", ["maintenance", "run", "--task=incremental-repack"]),
+            ]
+        else:
+            steps.append(("打包松散对象", ["repack", "-d"]))
+        steps += [
+            ("multi-pack-index", ["multi-pack-index", "write"]),
+            ("untracked cache", ["update-index", "--untracked-cache"]),
+        ]
+        if "fsmonitor--daemon" in build_options:
+            config["core.fsmonitor"] = "true"
+        else:
+            log("  ℹ️  当前 Git 不支持内置 fsmonitor（需要 Windows / macOS 上的 Git 2.37+），已跳过")
+
+        all_ok = True
+        for key, value in config.items():
+            if not run_git_command(["config", key, value], f"设置 {key} 失败", log, root):
+                all_ok = False
+        log(f"  ✅ 已启用：{', '.join(config)}")
+
+        for name, args in steps:
+            t0 = time.perf_counter()
+            ok, out = _git_output(args, root)
+            if ok:
+                log(f"  ✅ {name}（{time.perf_counter() - t0:.2f} 秒）")
+            else:
+                all_ok = False
+                log(f"  ⚠️  警告：{name} 失败：{out.splitlines()[-1] if out else '未知错误'}")
+
+        if measure:
+            after = measure_git_latency(root, runs)
+            log(f"\n  {'命令':<14}{'维护前':>8}{'维护后':>8}")
+            for name in before:
+                log(f"  {name:<16}{before[name] * 1000:>8.0f} ms{after[name] * 1000:>8.0f} ms")
+        return all_ok
+    finally:
+        lock.release()
+
+
+def cmd_maintain(argv: list[str]) -> int:
+    """maintain 子命令：为所有发布目标的仓库启用并执行 Git 性能维护。"""
+    parser = argparse.ArgumentParser(prog="publish.py maintain", description="维护站点 Git 仓库，保持发布速度")
+    parser.add_argument("--target", action="append", help="只维护指定名称的发布目标（可重复）")
+    parser.add_argument("--runs", type=int, default=3, help="耗时测量的重复次数（默认 3）")
+    parser.add_argument("--no-measure", action="store_true", help="不测量维护前后的耗时")
+    args = parser.parse_args(argv)
+
+    try:
+        targets = load_publish_targets()
+    except ValueError as e:
+        print(f"❌ 错误：{e}")
+        return 1
+    if args.target:
+        targets = [t for t in targets if t["name"] in args.target]
+        if not targets:
+            print(f"❌ 错误：没有名为 {'、'.join(args.target)} 的发布目标")
+            return 1
+
+    all_ok = True
+    for target in targets:
+        print(f"\n🔧 维护 {target['name']}（{target['root']}）")
+        print("─" * 40)
+        all_ok &= maintain_repo(target["root"], measure=not args.no_measure, runs=max(args.runs, 1))
+    return 0 if all_ok else 1
+
+
+# ──────────────────────────────────────────
+#  历史体积分析
+# ──────────────────────────────────────────
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.2f} GB"
+
+
+def iter_history_blobs(root: Path):
+    """
+    列出仓库全部历史中的文件对象，产出 (oid, 大小, 压缩后占用, 路径)。
+    rev-list --objects --all 的输出直接用管道接到一个 cat-file --batch-check 进程，
+    %(rest) 原样带回路径，逐行流式处理，对象再多也不会一次性读入内存。
+    """
+    rev = subprocess.Popen(["git", "rev-list", "--objects", "--all"], cwd=str(root),
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    cat = subprocess.Popen(
+        ["git", "cat-file",
+         "--batch-check=%(objecttype) %(objectname) %(objectsize) %(objectsize:disk) %(rest)"],
+        cwd=str(root), stdin=rev.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, encoding="utf-8", errors="replace",
+    )
+    rev.stdout.close()  # 只由 cat-file 读取，rev-list 才能在 cat-file 退出时收到 SIGPIPE
+    try:
+        for line in cat.stdout:
+            if not line.startswith("blob "):
+                continue
+            _, oid, size, disk, path = (line.rstrip("\n").split(" ", 4) + [""])[:5]
+            yield oid, int(size), int(disk), path
+    finally:
+        cat.stdout.close()
+        cat.wait()
+        rev.wait()
+    if rev.returncode or cat.returncode:
+        raise RuntimeError("git rev-list / cat-file 执行失败")
+
+
+def _head_blobs(root: Path) -> dict[str, str]:
+    """HEAD 中的文件：路径 → blob oid。"""
+    ok, out = _git_output(["ls-tree", "-r", "-z", "--full-tree", "HEAD"], root)
+    files = {}
+    if ok:
+        for record in out.split("\0"):
+            meta, _, path = record.partition("\t")
+            parts = meta.split()
+            if len(parts) == 3 and parts[1] == "blob":
+                files[path] = parts[2]
+    return files
+
+
+# 统计附件引用时读取的站点源文件（public/ 之外）
+ASSET_REF_SOURCE_SUFFIXES = {".md", ".vue", ".ts", ".js", ".css", ".scss", ".html", ".yaml", ".yml"}
+
+
+def audit_history(root: Path | None = None, top: int = 15, log=print) -> dict:
+    """
+    统计站点仓库全部历史的体积构成，回答「clone 为什么越来越慢」：
+      - 占用最大的路径（所有历史版本合计）与最大的单个文件对象
+      - 每篇文章的占用：文章自身的各版本 + 它引用的附件的各版本（多篇共用的附件平分）
+      - 可节省的体积估算：没有被任何页面 / 配置引用的附件、已删除或被覆盖的附件旧版本，
+        以及内容相同的重复附件（不占对象库，但每次检出都多写一份）
+    占用按对象在 pack 中压缩后的大小（objectsize:disk）计算，与 clone 的下载量接近。
+    返回汇总数据（字节）。
+    """
+    root = root or VALAXY_ROOT
+    t0 = time.perf_counter()
+    by_path: dict[str, list[int]] = {}   # 路径 -> [版本数, 原始大小, 压缩后占用]
+    blobs: list[tuple[int, int, str, str]] = []
+    total_disk = 0
+    for oid, size, disk, path in iter_history_blobs(root):
+        total_disk += disk
+        entry = by_path.setdefault(path, [0, 0, 0])
+        entry[0] += 1
+        entry[1] += size
+        entry[2] += disk
+        blobs.append((disk, size, path, oid))
+    head = _head_blobs(root)
+    log(f"  📦 历史中共 {len(blobs)} 个文件对象，压缩后 {_format_bytes(total_disk)}"
+        f"（扫描 {time.perf_counter() - t0:.2f} 秒）")
+
+    log("\n  占用最大的路径（全部历史版本合计）")
+    for path, (versions, _, disk) in heapq.nlargest(top, by_path.items(), key=lambda x: x[1][2]):
+        log(f"  {_format_bytes(disk):>10}  {versions:>3} 个版本  {path}{'' if path in head else '  [已删除]'}")
+
+    log("\n  最大的文件对象")
+    for disk, size, path, oid in heapq.nlargest(top, blobs):
+        log(f"  {_format_bytes(disk):>10}  {oid[:10]}  {path}（原始 {_format_bytes(size)}）")
+
+    # ── 附件被哪些文件引用（工作区中的页面与配置） ──
+    referenced: dict[str, list[str]] = {}  # public/... -> 引用它的文件
+    for rel in head:
+        if rel.startswith("public/") or Path(rel).suffix.lower() not in ASSET_REF_SOURCE_SUFFIXES:
+            continue
+        try:
+            content = read_note(root / rel)
+        except OSError:
+            continue
+        for asset in dict.fromkeys(SITE_ASSET_PATTERN.findall(content)):
+            referenced.setdefault("public" + urllib.parse.unquote(asset), []).append(rel)
+
+    post_sizes = {rel: float(by_path.get(rel, [0, 0, 0])[2]) for rel in head
+                  if rel.startswith("pages/posts/") and rel.endswith(".md")}
+    for asset, sources in referenced.items():
+        share = by_path.get(asset, [0, 0, 0])[2] / len(sources)
+        for rel in sources:
+            if rel in post_sizes:
+                post_sizes[rel] += share
+    if post_sizes:
+        log("\n  文章占用（文章 + 引用的附件，含历史版本）")
+        for rel, disk in heapq.nlargest(top, post_sizes.items(), key=lambda x: x[1]):
+            log(f"  {_format_bytes(disk):>10}  {rel[len('pages/posts/'):]}")
+
+    # ── 可节省的体积 ──
+    asset_prefixes = ("public/assets/", "public/images/")
+    head_assets = {path: oid for path, oid in head.items() if path.startswith(asset_prefixes)}
+    current_oids = set(head_assets.values())
+    disk_of = {oid: disk for disk, _, _, oid in blobs}
+    size_of = {oid: size for _, size, _, oid in blobs}
+
+    # 与被引用的附件内容相同的文件删除后对象仍在，不计入可节省的体积
+    referenced_oids = {oid for path, oid in head_assets.items() if path in referenced}
+    orphaned = {path: 0 if oid in referenced_oids else disk_of.get(oid, 0) for path, oid in head_assets.items()
+                if path not in referenced and not Path(path).name.startswith(".")}
+    history_only = sum(disk for disk, _, path, oid in blobs
+                       if path.startswith(asset_prefixes) and oid not in current_oids)
+    by_oid: dict[str, list[str]] = {}
+    for path, oid in head_assets.items():
+        by_oid.setdefault(oid, []).append(path)
+    duplicates = {oid: paths for oid, paths in by_oid.items() if len(paths) > 1}
+    duplicate_checkout = sum(size_of.get(oid, 0) * (len(paths) - 1) for oid, paths in duplicates.items())
+
+    log("\n  可节省的体积（估算）")
+    log(f"  {_format_bytes(sum(orphaned.values())):>10}  {len(orphaned)} 个附件没有被任何页面或配置引用")
+    for path, disk in heapq.nlargest(min(top, 5), orphaned.items(), key=lambda x: x[1]):
+        log(f"  {'':>10}    {_format_bytes(disk):>10}  {path}")
+    log(f"  {_format_bytes(history_only):>10}  已删除或被覆盖的附件旧版本（仅存在于历史中）")
+    if duplicates:
+        log(f"  {_format_bytes(duplicate_checkout):>10}  {sum(len(p) - 1 for p in duplicates.values())} 个重复附件"
+            f"（内容相同、文件名不同，只影响检出大小）")
+        for oid, paths in list(duplicates.items())[:min(top, 5)]:
+            log(f"  {'':>10}    {'、'.join(paths)}")
+    prunable = sum(orphaned.values()) + history_only
+    if total_disk:
+        log(f"\n  删除未引用的附件并清理历史（如 git filter-repo）后，clone 体积约可减少 "
+            f"{_format_bytes(prunable)}（{prunable / total_disk:.0%}）")
+    return {
+        "objects": len(blobs),
+        "total_disk": total_disk,
+        "orphaned": sum(orphaned.values()),
+        "history_only": history_only,
+        "duplicate_checkout": duplicate_checkout,
+        "prunable": prunable,
+    }
+
+
+def cmd_audit_history(argv: list[str]) -> int:
+    """audit-history 子命令：分析站点仓库历史的体积构成，估算可节省的 clone 体积。"""
+    parser = argparse.ArgumentParser(prog="publish.py audit-history", description="分析 Git 历史中占用体积的文件与文章")
+    parser.add_argument("--target", default="main", help="要分析的发布目标名称（默认 main）")
+    parser.add_argument("--top", type=int, default=15, help="每个排行列出的条数（默认 15）")
+    args = parser.parse_args(argv)
+
+    try:
+        targets = {t["name"]: t for t in load_publish_targets()}
+    except ValueError as e:
+        print(f"❌ 错误：{e}")
+        return 1
+    target = targets.get(args.target)
+    if target is None:
+        print(f"❌ 错误：没有名为 {args.target} 的发布目标")
+        return 1
+
+    root = target["root"]
+    ok, _ = _git_output(["rev-parse", "--git-dir"], root)
+    if not ok:
+        print(f"❌ 不是 Git 仓库：{root}")
+        return 1
+    print(f"\n🔍 分析 {target['name']}（{root}）的历史体积")
+    print("─" * 40)
+    try:
+        audit_history(root, top=max(args.top, 1))
+    except (OSError, RuntimeError) as e:
+        print(f"❌ 错误：{e}")
+        return 1
+    return 0
+
+
+# ──────────────────────────────────────────
+#  运行记录与统计
+# ──────────────────────────────────────────
+
+HISTORY_FILE = "history.jsonl"
+
+
+class RunRecorder:
+    """
+    记录一次发布的各阶段耗时、附件数量、复制 / 跳过的字节数、Git 各步骤耗时与结果，
+    finish() 时追加一行到 .publish-cache/history.jsonl。
+    """
+
+    def __init__(self, frontend: str, source: str = ""):
+        self.record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "frontend": frontend,
+            "source": source,
+            "stages": {},
+            "git": {},
+            "outcome": "unknown",
+        }
+        self.stats: dict = {}        # 传给 migrate_images 累计附件数据
+        self.git_timings: dict = self.record["git"]
+        self._started = time.perf_counter()
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record["stages"][name] = round(time.perf_counter() - t0, 3)
+
+    def finish(self, outcome: str):
+        """写入记录（重复调用只生效一次）。outcome: ok / failed / cancelled。"""
+        if self._finished:
+            return
+        self._finished = True
+        self.record["outcome"] = outcome
+        self.record["total"] = round(time.perf_counter() - self._started, 3)
+        for key in ("attachments", "missing", "bytes_copied", "bytes_skipped", "transcoded", "bytes_saved"):
+            self.record[key] = self.stats.get(key, 0)
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(CACHE_DIR / HISTORY_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def load_history(last: int | None = None) -> list[dict]:
+    """读取发布记录（按时间先后），last 指定时只取最近 last 条。"""
+    records = []
+    try:
+        with open(CACHE_DIR / HISTORY_FILE, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    return records[-last:] if last else records
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """线性插值百分位数，q 取 0~100。"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def _trend(values: list[float]) -> str:
+    """比较较早一半与较新一半的中位数，给出变化百分比。"""
+    if len(values) < 4:
+        return "—"
+    half = len(values) // 2
+    old, new = _percentile(values[:half], 50), _percentile(values[half:], 50)
+    if old <= 0:
+        return "—"
+    change = (new - old) / old * 100
+    arrow = "↑" if change > 5 else "↓" if change < -5 else "→"
+    return f"{arrow} {change:+.0f}%"
+
+
+def _history_metrics(records: list[dict]) -> dict[str, list[float]]:
+    """把记录展开为「指标名 → 按时间排列的取值列表」。"""
+    metrics: dict[str, list[float]] = {"total": []}
+    for r in records:
+        if "total" in r:
+            metrics["total"].append(r["total"])
+        for name, value in r.get("stages", {}).items():
+            metrics.setdefault(f"stage:{name}", []).append(value)
+        for name, value in r.get("git", {}).items():
+            metrics.setdefault(name, []).append(value)
+    return {k: v for k, v in metrics.items() if v}
+
+
+def _history_csv_row(r: dict) -> dict:
+    row = {k: r.get(k, "") for k in (
+        "time", "frontend", "source", "outcome", "total",
+        "attachments", "missing", "bytes_copied", "bytes_skipped",
+    )}
+    for name, value in r.get("stages", {}).items():
+        row[f"stage:{name}"] = value
+    row.update(r.get("git", {}))
+    return row
+
+
+def cmd_stats(argv: list[str]) -> int:
+    """stats 子命令：最近 N 次发布的耗时百分位、趋势与复制量，可导出 CSV。"""
+    parser = argparse.ArgumentParser(prog="publish.py stats", description="统计最近若干次发布的耗时与复制量")
+    parser.add_argument("-n", "--last", type=int, default=50, help="统计最近多少次发布（默认 50）")
+    parser.add_argument("--csv", type=Path, help="把这些记录导出为 CSV 文件")
+    args = parser.parse_args(argv)
+
+    records = load_history(args.last)
+    if not records:
+        print("ℹ️  暂无发布记录")
+        return 0
+
+    print(f"\n📊 最近 {len(records)} 次发布（{records[0]['time']} ~ {records[-1]['time']}）")
+    metrics = _history_metrics(records)
+    # 指标名列宽按最长的名称计算（如 stage:transform:extract_data_uris），表头与各行共用
+    width = max([len(name) for name in metrics] + [22]) + 2
+    rule = "─" * (width + 48)
+    print(rule)
+    # 「指标」「次数」「最大」各占两个字符宽度，格式化宽度相应减去
+    print(f"  {'指标':<{width - 2}}{'次数':>4}{'P50':>9}{'P90':>9}{'P95':>9}{'最大':>7}   趋势")
+    for name, values in metrics.items():
+        print(
+            f"  {name:<{width}}{len(values):>6}"
+            f"{_percentile(values, 50):>9.2f}{_percentile(values, 90):>9.2f}"
+            f"{_percentile(values, 95):>9.2f}{max(values):>9.2f}   {_trend(values)}"
+        )
+    print(rule)
+
+    outcomes: dict[str, int] = {}
+    for r in records:
+        outcomes[r.get("outcome", "unknown")] = outcomes.get(r.get("outcome", "unknown"), 0) + 1
+    print("  结果: " + "，".join(f"{k} {v} 次" for k, v in outcomes.items()))
+    attachments = sum(r.get("attachments", 0) for r in records)
+    copied = sum(r.get("bytes_copied", 0) for r in records)
+    skipped = sum(r.get("bytes_skipped", 0) for r in records)
+    print(f"  附件: 共 {attachments} 个，复制 {copied / 1048576:.1f} MB，跳过 {skipped / 1048576:.1f} MB")
+    print("  （耗时单位：秒；趋势为较新一半与较早一半的中位数对比）")
+
+    if args.csv:
+        rows = [_history_csv_row(r) for r in records]
+        fields = list(dict.fromkeys(k for row in rows for k in row))
+        with open(args.csv, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\n✅ 已导出 {len(rows)} 条记录到 {args.csv}")
+    return 0
+
+
+# ──────────────────────────────────────────
+#  外部链接检查
+# ──────────────────────────────────────────
+
+LINK_CACHE_FILE = "link-check.json"
+LINK_CHECK_USER_AGENT = "Mozilla/5.0 (compatible; valaxy-publish-link-check)"
+
+
+class _HostChecker:
+    """
+    检查同一域名下的一组链接：复用 keep-alive 连接（连接池），
+    同域名的所有连接共用一个节流器，两次请求之间至少间隔 interval 秒。
+    """
+
+    def __init__(self, scheme: str, netloc: str, interval: float, timeout: float):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def _throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+    def check_all(self, urls: list[str]) -> dict[str, dict]:
+        """用一条连接依次检查 urls，连接出错后自动重连。"""
+        results = {}
+        conn = None
+        for url in urls:
+            parts = urllib.parse.urlsplit(url)
+            path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+            result = None
+            for method in ("HEAD", "GET"):
+                self._throttle()
+                try:
+                    conn = conn or self._connect()
+                    conn.request(method, path, headers={"User-Agent": LINK_CHECK_USER_AGENT,
+                                                        "Accept": "*/*"})
+                    resp = conn.getresponse()
+                    if method == "GET":
+                        resp.read(65536)
+                        conn.close()  # 不读完整个响应体，这条连接不能再复用
+                        conn = None
+                    else:
+                        resp.read()
+                    result = {"status": resp.status}
+                    if 300 <= resp.status < 400 and resp.getheader("Location"):
+                        result["location"] = urllib.parse.urljoin(url, resp.getheader("Location"))
+                except (OSError, http.client.HTTPException) as e:
+                    if conn:
+                        conn.close()
+                    conn = None
+                    result = {"status": 0, "error": str(e) or type(e).__name__}
+                    break
+                # 部分站点不支持 HEAD（405 / 501）或对 HEAD 返回 403 / 404，再用 GET 确认
+                if method == "HEAD" and result["status"] in (403, 404, 405, 501):
+                    continue
+                break
+            result["checked"] = time.time()
+            results[url] = result
+        if conn:
+            conn.close()
+        return results
+
+
+def _link_state(result: dict) -> str:
+    """ok / redirect / broken / unknown（429 限流等，不写入缓存）。"""
+    status = result.get("status", 0)
+    if 200 <= status < 300:
+        return "ok"
+    if 300 <= status < 400:
+        return "redirect"
+    if status == 429:
+        return "unknown"
+    return "broken"
+
+
+def check_links(urls: list[str], ttl_hours: float = LINK_CHECK_TTL_HOURS, force: bool = False,
+                timeout: float = 10.0, log=print) -> dict[str, dict]:
+    """
+    并发检查一组外部链接，返回 {url: 结果}。结果缓存在 .publish-cache/link-check.json，
+    未过期（ttl_hours）的直接复用；按域名分组，不同域名并行，同域名限流。
+    """
+    cache_path = CACHE_DIR / LINK_CACHE_FILE
+    try:
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cache = {}
+
+    now = time.time()
+    results = {}
+    stale: dict[tuple[str, str], list[str]] = {}
+    for url in dict.fromkeys(urls):
+        cached = cache.get(url)
+        if not force and cached and now - cached.get("checked", 0) < ttl_hours * 3600:
+            results[url] = cached
+            continue
+        parts = urllib.parse.urlsplit(url)
+        stale.setdefault((parts.scheme, parts.netloc.lower()), []).append(url)
+
+    pending = sum(len(v) for v in stale.values())
+    log(f"🔗 共 {len(results) + pending} 个链接，缓存命中 {len(results)} 个，需检查 {pending} 个"
+        f"（{len(stale)} 个域名）")
+
+    jobs = []
+    for (scheme, netloc), host_urls in stale.items():
+        checker = _HostChecker(scheme, netloc, LINK_CHECK_HOST_INTERVAL, timeout)
+        lanes = min(LINK_CHECK_PER_HOST, len(host_urls))
+        jobs += [(checker, host_urls[i::lanes]) for i in range(lanes)]
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=LINK_CHECK_WORKERS) as pool:
+            for checked in pool.map(lambda job: job[0].check_all(job[1]), jobs):
+                results.update(checked)
+                for url, result in checked.items():
+                    # 连接失败（status 0）可能只是本机网络问题，不缓存，下次重新检查
+                    if result["status"] and _link_state(result) != "unknown":
+                        cache[url] = result
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(cache_path, json.dumps(cache, ensure_ascii=False))
+    return results
+
+
+def cmd_check_links(argv: list[str]) -> int:
+    """check-links 子命令：检查 pages/ 下所有文章的外部链接，按文章列出失效与跳转的链接。"""
+    parser = argparse.ArgumentParser(prog="publish.py check-links", description="检查文章中的外部链接是否失效")
+    parser.add_argument("--ttl", type=float, default=LINK_CHECK_TTL_HOURS,
+                        help=f"缓存有效期（小时，默认 {LINK_CHECK_TTL_HOURS}）")
+    parser.add_argument("--force", action="store_true", help="忽略缓存，全部重新检查")
+    parser.add_argument("--timeout", type=float, default=10.0, help="单个请求超时（秒，默认 10）")
+    parser.add_argument("--hide-redirects", action="store_true", help="只列出失效链接")
+    args = parser.parse_args(argv)
+
+    pages_dir = VALAXY_ROOT / "pages"
+    links: dict[Path, list[tuple[str, int]]] = {}
+    for md in sorted(pages_dir.rglob("*.md")):
+        try:
+            found = list(iter_external_links(read_note(md)))
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"  ⚠️  警告：无法读取 {md.name}：{e}")
+            continue
+        if found:
+            links[md] = found
+    if not links:
+        print("ℹ️  没有找到外部链接")
+        return 0
+
+    results = check_links([url for found in links.values() for url, _ in found],
+                          ttl_hours=args.ttl, force=args.force, timeout=args.timeout)
+
+    broken = redirected = 0
+    for md, found in links.items():
+        lines = []
+        for url, line in found:
+            result = results[url]
+            state = _link_state(result)
+            if state == "broken":
+                broken += 1
+                reason = result.get("error") or result["status"]
+                lines.append(f"   ❌ L{line:<4} {reason}  {url}")
+            elif state == "redirect" and not args.hide_redirects:
+                redirected += 1
+                lines.append(f"   ↪️  L{line:<4} {result['status']}  {url}\n"
+                             f"{'':14}→ {result.get('location', '?')}")
+            elif state == "unknown":
+                lines.append(f"   ⚠️  L{line:<4} {result['status']}  {url}（被限流，下次重试）")
+        if lines:
+            print(f"\n📄 {md.relative_to(pages_dir).as_posix()}")
+            print("\n".join(lines))
+
+    print()
+    if broken:
+        print(f"❌ 发现 {broken} 个失效链接" + (f"，{redirected} 个跳转链接" if redirected else ""))
+        return 1
+    print("✅ 没有失效链接" + (f"（{redirected} 个跳转链接建议更新）" if redirected else ""))
+    return 0
+
+
+# ──────────────────────────────────────────
+#  发布计划（--plan / --apply）
+# ──────────────────────────────────────────
+
+PLAN_VERSION = 1
+PLANS_DIR = "plans"
+
+
+def estimate_stage_times(bytes_to_copy: int, records: list[dict] | None = None) -> dict[str, float]:
+    """
+    按最近的成功发布估算各阶段耗时（秒）。迁移 = 几乎无需复制时的中位耗时 + 待复制字节数 / 历史复制速度，
+    其余阶段取中位数；没有记录的阶段不出现在结果中。
+    """
+    if records is None:
+        records = load_history(last=50)
+    records = [r for r in records if r.get("outcome") == "ok"]
+    estimates: dict[str, float] = {}
+
+    light = [r["stages"]["migrate"] for r in records
+             if "migrate" in r.get("stages", {}) and r.get("bytes_copied", 0) < 1024 * 1024]
+    heavy = [(r["bytes_copied"], r["stages"]["migrate"]) for r in records
+             if "migrate" in r.get("stages", {}) and r.get("bytes_copied", 0) >= 1024 * 1024]
+    if light or heavy:
+        base = _percentile(light, 50) if light else 0.0
+        estimate = base
+        if heavy and bytes_to_copy:
+            rate = sum(b for b, _ in heavy) / max(sum(max(t - base, 0.001) for _, t in heavy), 0.001)
+            estimate += bytes_to_copy / rate
+        estimates["migrate"] = estimate
+
+    for stage in ("write", "related", "git"):
+        values = [r["stages"][stage] for r in records if stage in r.get("stages", {})]
+        if values:
+            estimates[stage] = _percentile(values, 50)
+    return estimates
+
+
+def build_publish_plan(source_path: Path, content: str, targets: list[dict] | None = None,
+                       resolve=None) -> dict:
+    """
+    在内存中演算一次发布，不写 POSTS_DIR / ASSETS_DIR，也不执行 Git。返回可直接存为 JSON 的计划：
+      - content：补全 Front Matter 后的完整内容（--apply 直接使用，不再提问）
+      - attachments：每个附件引用的解析结果与动作（copy / skip / upload / missing），动图标注转码格式
+      - notes：展开 ![[笔记]] 时读取的被嵌入笔记及其大小 / 修改时间
+      - data_uris：正文中内嵌的 base64 图片数量与解码后的大致字节数
+      - writes：将写入的文件；bytes：待传输的字节数；estimates：按发布记录估算的各阶段耗时
+      - source_sha256：源文件哈希，--apply 时与附件的大小 / 修改时间一起判断计划是否过期
+    """
+    resolve = resolve or find_image_file
+    if targets is None:
+        targets = load_publish_targets()
+    storage = (ASSET_STORAGE or {}).get("type", "git")
+    gif_format = gif_transcode_format()
+    _, body = parse_front_matter(content)
+    # 附件与内嵌图片按展开笔记嵌入之后的正文统计，与实际发布时一致
+    expander = NoteExpander(log=lambda *_: None)
+    body = expander.expand(body, source_path)
+
+    attachments = []
+    planned_dests: set[str] = set()
+    for ref, kind in iter_local_media_refs(body):
+        item = {"ref": ref, "kind": kind}
+        src = resolve(ref, source_path)
+        if src is None:
+            item["action"] = "missing"
+            attachments.append(item)
+            continue
+        st = src.stat()
+        item.update(src=str(src), size=st.st_size, mtime_ns=st.st_mtime_ns)
+        if storage == "git":
+            dest = _unique_asset_dest(src)
+            same = (dest.exists() and dest.stat().st_size == st.st_size
+                    and int(dest.stat().st_mtime) == int(st.st_mtime))
+            item["dest"] = str(dest)
+            # 目标文件当前的大小（不存在为 None），--apply 时据此确认目标未被改动
+            item["dest_size"] = dest.stat().st_size if dest.exists() else None
+            item["action"] = "skip" if same or str(dest) in planned_dests else "copy"
+            planned_dests.add(str(dest))
+        else:
+            item["action"] = "upload"
+        if (gif_format and src.suffix.lower() == ".gif" and st.st_size >= GIF_TRANSCODE_MIN_BYTES
+                and is_animated_gif(src)):
+            item["transcode"] = gif_format
+        attachments.append(item)
+
+    data_uris = data_bytes = 0
+    if "data:" in body:
+        for m in DATA_URI_PATTERN.finditer(body):
+            end = BASE64_RUN_PATTERN.match(body, m.end()).end()
+            if end > m.end():
+                data_uris += 1
+                data_bytes += (end - m.end()) * 3 // 4
+
+    post = POSTS_DIR / post_filename(source_path)
+    writes = [{"path": str(post), "action": "overwrite" if post.exists() else "create"}]
+    writes += [{"path": a["dest"], "action": "overwrite" if Path(a["dest"]).exists() else "create"}
+               for a in attachments if a["action"] == "copy"]
+    writes += [{"path": str(f), "action": "update"} for f in (RELATED_POSTS_FILE, POSTS_MANIFEST_FILE)]
+    for target in targets[1:]:
+        mirror = target["root"] / "pages" / "posts" / post.name
+        writes.append({"path": str(mirror), "action": "overwrite" if mirror.exists() else "create"})
+
+    transfer = sum(a["size"] for a in attachments if a["action"] in ("copy", "upload")) + data_bytes
+    return {
+        "version": PLAN_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": str(source_path),
+        "source_sha256": _file_sha256(source_path),
+        "storage": storage,
+        "targets": [t["name"] for t in targets],
+        "content": content,
+        "attachments": attachments,
+        "notes": [{"path": path, "size": size, "mtime_ns": mtime_ns}
+                  for path, (size, mtime_ns) in expander.notes.items()],
+        "data_uris": {"count": data_uris, "bytes": data_bytes},
+        "writes": writes,
+        "bytes": transfer,
+        "estimates": estimate_stage_times(transfer),
+    }
+
+
+def check_plan(plan: dict) -> list[str]:
+    """检查计划是否仍然有效（源文件与附件未变化、配置一致），返回问题列表。"""
+    if plan.get("version") != PLAN_VERSION:
+        return [f"计划版本不兼容（{plan.get('version')}）"]
+    problems = []
+    source = Path(plan["source"])
+    if not source.is_file():
+        return [f"源文件不存在：{source}"]
+    if _file_sha256(source) != plan["source_sha256"]:
+        problems.append(f"源文件在生成计划后被修改：{source.name}")
+    for item in plan["attachments"]:
+        if "src" not in item:
+            continue
+        try:
+            st = Path(item["src"]).stat()
+        except OSError:
+            problems.append(f"附件已不存在：{item['src']}")
+            continue
+        if st.st_size != item["size"] or st.st_mtime_ns != item["mtime_ns"]:
+            problems.append(f"附件在生成计划后被修改：{Path(item['src']).name}")
+        if "dest" in item:
+            dest = Path(item["dest"])
+            if (dest.stat().st_size if dest.exists() else None) != item.get("dest_size"):
+                problems.append(f"目标文件在生成计划后发生变化：{dest.name}")
+    for note in plan.get("notes", []):
+        try:
+            st = Path(note["path"]).stat()
+        except OSError:
+            problems.append(f"嵌入的笔记已不存在：{note['path']}")
+            continue
+        if st.st_size != note["size"] or st.st_mtime_ns != note["mtime_ns"]:
+            problems.append(f"嵌入的笔记在生成计划后被修改：{Path(note['path']).name}")
+    storage = (ASSET_STORAGE or {}).get("type", "git")
+    if storage != plan["storage"]:
+        problems.append(f"附件存储后端已从 {plan['storage']} 改为 {storage}")
+    return problems
+
+
+def plan_resolver(plan: dict):
+    """按计划中的解析结果查找附件，--apply 时不再搜索 Obsidian 目录。"""
+    resolved = {item["ref"]: Path(item["src"]) for item in plan["attachments"] if "src" in item}
+    return lambda ref, md_file_path: resolved.get(ref)
+
+
+def plan_destinations(plan: dict) -> dict[str, str]:
+    """计划中每个附件的目标文件名（源文件路径 → 文件名），--apply 时按此写入，与计划显示的一致。"""
+    return {item["src"]: Path(item["dest"]).name for item in plan["attachments"] if "dest" in item}
+
+
+def format_plan(plan: dict, log=print):
+    """输出计划摘要：写入的文件、附件动作、待传输字节数、缺失引用与预计耗时。"""
+    counts: dict[str, int] = {}
+    for item in plan["attachments"]:
+        counts[item["action"]] = counts.get(item["action"], 0) + 1
+
+    log(f"📋 发布计划：{Path(plan['source']).name} → {'、'.join(plan['targets'])}")
+    log("\n  将写入的文件")
+    for w in plan["writes"]:
+        log(f"    {'＋' if w['action'] == 'create' else '～'} {w['path']}")
+
+    log(f"\n  附件：复制 {counts.get('copy', 0)} 个，跳过 {counts.get('skip', 0)} 个（已存在）"
+        + (f"，上传 {counts.get('upload', 0)} 个（{plan['storage']}，已存在的对象会跳过）" if counts.get("upload") else ""))
+    for item in plan["attachments"]:
+        if item.get("transcode"):
+            log(f"    🎬 {Path(item['src']).name} 将转码为 {item['transcode'].upper()}")
+    if plan.get("notes"):
+        log(f"    📎 嵌入了 {len(plan['notes'])} 篇笔记，其中的附件已计入")
+    if plan["data_uris"]["count"]:
+        log(f"    🧩 {plan['data_uris']['count']} 张内嵌 base64 图片将提取为文件"
+            f"（约 {plan['data_uris']['bytes'] / 1048576:.1f} MB）")
+    log(f"  待传输：{plan['bytes'] / 1048576:.1f} MB")
+
+    missing = [item["ref"] for item in plan["attachments"] if item["action"] == "missing"]
+    if missing:
+        log(f"\n  ⚠️  找不到 {len(missing)} 个附件，发布时将保留原始引用（推送前检查会因此阻止推送）：")
+        for ref in missing:
+            log(f"    - {ref}")
+
+    estimates = plan["estimates"]
+    if estimates:
+        names = {"migrate": "迁移附件", "write": "写入文章", "related": "相关文章", "git": "Git 提交推送"}
+        parts = [f"{names[k]} {v:.1f}s" for k, v in estimates.items()]
+        log(f"\n  预计耗时：约 {sum(estimates.values()):.1f} 秒（{'，'.join(parts)}）")
+    else:
+        log("\n  ℹ️  还没有发布记录，无法估算耗时")
+
+
+def save_plan(plan: dict, path: Path | None = None) -> Path:
+    """保存计划，默认位置为 .publish-cache/plans/<笔记名>.json。"""
+    path = path or CACHE_DIR / PLANS_DIR / f"{Path(plan['source']).stem}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(plan, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+# 子命令：python publish.py <子命令> [参数]
+COMMANDS = {
+    "stats": cmd_stats,
+    "check-links": cmd_check_links,
+    "check-site": cmd_check_site,
+    "normalize": cmd_normalize,
+    "maintain": cmd_maintain,
+    "audit-history": cmd_audit_history,
+}
+
+
+# ──────────────────────────────────────────
+#  主流程
+# ──────────────────────────────────────────
+
+def publish_via_daemon(client: DaemonClient, source_path: Path, content: str, title: str):
+    """常驻进程运行时：本地只做交互补全 Front Matter，其余步骤交给常驻进程。"""
+    print("⚡ 检测到发布常驻进程，附件迁移与 Git 操作将由其完成")
+    try:
+        labels = client.labels()
+        content = ensure_front_matter(content, title, existing_tags=labels["tags"])
+        print("\n🚀 正在提交给常驻进程...")
+        print("─" * 40)
+        result = client.publish(path=str(source_path), content=content)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ 错误：与常驻进程通信失败: {e}")
+        sys.exit(1)
+
+    for line in result.get("log", []):
+        print(line)
+    if result.get("ok"):
+        publish_title = (result.get("titles") or [title])[0]
+        print("\n" + "═" * 42)
+        print(f"🎉 发布成功！文章「{publish_title}」已推送到远程仓库")
+        print("═" * 42)
+    else:
+        print("\n⚠️  发布未完全成功，请查看上方日志并手动检查")
+        sys.exit(1)
+
+
+def main():
+    # ── 子命令 ──
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(prog="publish.py", description="Obsidian 笔记一键发布到 Valaxy 博客")
+    parser.add_argument("file", nargs="?", help="Obsidian 笔记的 Markdown 文件路径")
+    parser.add_argument("--plan", action="store_true", help="只生成发布计划：不写入文章 / 附件，不执行 Git")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="--plan 生成的计划保存位置（默认 .publish-cache/plans/<笔记名>.json）")
+    parser.add_argument("--apply", type=Path, metavar="PLAN", help="按 --plan 保存的计划发布：使用计划中的 Front Matter、附件来源与目标文件名，不再提问")
+    args = parser.parse_args()
+
+    print()
+    print("╔══════════════════════════════════════════╗")
+    print("║   📖 Obsidian → Valaxy 一键发布工具     ║")
+    print("╚══════════════════════════════════════════╝")
+    print()
+
+    plan = None
+    if args.apply:
+        # ── 按计划发布：源文件与附件须与生成计划时一致 ──
+        try:
+            plan = json.loads(args.apply.read_text(encoding="utf-8"))
+            problems = check_plan(plan)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"❌ 错误：无法读取计划 {args.apply}：{e}")
+            sys.exit(1)
+        if problems:
+            print("❌ 计划已过期，请重新运行 --plan：")
+            for problem in problems:
+                print(f"   - {problem}")
+            sys.exit(1)
+        source_path = Path(plan["source"])
+    else:
+        # ── 1. 参数检查 ──
+        if not args.file:
+            print("❌ 错误：请提供 Markdown 文件路径作为参数")
+            print("   用法: python publish.py <Markdown文件路径> [--plan]")
+            print('   示例: python publish.py "D:\\Obsidian\\笔记\\我的文章.md"')
+            sys.exit(1)
+
+        source_path = Path(args.file).resolve()
+
+        # ── 2. 文件存在性检查 ──
+        if not source_path.exists():
+            print(f"❌ 错误：文件不存在 → {source_path}")
+            sys.exit(1)
+
+        if not source_path.is_file():
+            print(f"❌ 错误：路径不是文件 → {source_path}")
+            sys.exit(1)
+
+        if source_path.suffix.lower() not in (".md", ".markdown"):
+            print(f"❌ 错误：文件不是 Markdown 格式（{source_path.suffix}）")
+            sys.exit(1)
+
+    if args.plan:
+        plan_source(source_path, args.output)
+        return
+
+    # 每次发布的阶段耗时与结果都记录到 .publish-cache/history.jsonl
+    recorder = RunRecorder("cli", str(source_path))
+    try:
+        publish_source(source_path, recorder, plan)
+    except SystemExit as e:
+        recorder.finish("ok" if not e.code else "failed")
+        raise
+    except KeyboardInterrupt:
+        recorder.finish("cancelled")
+        raise
+    except Exception:
+        recorder.finish("failed")
+        raise
+    recorder.finish("ok")
+
+
+def plan_source(source_path: Path, output: Path | None = None):
+    """--plan：读取笔记并交互补全 Front Matter，演算发布计划并保存，不写入文章 / 附件，不执行 Git。"""
+    print(f"📄 源文件: {source_path}")
+    try:
+        targets = load_publish_targets()
+    except ValueError as e:
+        print(f"❌ 错误：{e}")
+        sys.exit(1)
+    try:
+        content = decode_note_bytes(source_path.read_bytes())
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"❌ 错误：读取文件失败: {e}")
+        sys.exit(1)
+
+    content = ensure_front_matter(content, source_path.stem, existing_tags=collect_existing_tags)
+    plan = build_publish_plan(source_path, content, targets)
+    print()
+    format_plan(plan)
+    path = save_plan(plan, output)
+    print(f"\n💾 计划已保存：{path}")
+    print(f'   确认无误后执行：python publish.py --apply "{path}"')
+
+
+def publish_source(source_path: Path, recorder: RunRecorder, plan: dict | None = None):
+    """
+    发布单个笔记文件的完整流程（main 已完成参数检查）。
+    plan 为 --apply 读入的发布计划：直接使用其中补全好的 Front Matter、附件解析结果与目标文件名；
+    转换流水线（含笔记嵌入展开）照常重新执行，计划中记录的源文件与嵌入笔记未变化，结果与计划一致。
+    """
+    # 从文件名提取文章标题（去掉扩展名）
+    title = source_path.stem
+    print(f"📄 源文件: {source_path}")
+    print(f"📌 文章标题: {title}")
+
+    try:
+        targets = load_publish_targets()
+        store = get_asset_store()
+    except ValueError as e:
+        print(f"❌ 错误：{e}")
+        sys.exit(1)
 
     # ── 3. 确保目标目录存在 ──
     POSTS_DIR.mkdir(parents=True, exist_ok=True)
     ASSETS_DIR.mkdir(parents=True, exist_ok=True)
 
     # ── 4. 读取源文件 ──
-    try:
-        content = source_path.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
+    with recorder.stage("read"):
         try:
-            content = source_path.read_text(encoding="gbk")
+            raw = source_path.read_bytes()
         except Exception as e:
+            print(f"❌ 错误：读取文件失败: {e}")
+            sys.exit(1)
+        try:
+            content = decode_note_bytes(raw)
+        except UnicodeDecodeError as e:
             print(f"❌ 错误：无法读取文件（编码问题）: {e}")
             sys.exit(1)
-    except Exception as e:
-        print(f"❌ 错误：读取文件失败: {e}")
-        sys.exit(1)
 
-    # ── 5. 迁移图片 ──
-    print("\n🖼️  正在处理图片...")
-    print("─" * 40)
-    content = migrate_images(content, source_path)
+    # ── 常驻进程运行时改为瘦客户端 ──
+    client = None if plan else DaemonClient.connect()
+    if client:
+        recorder.record["frontend"] = "cli+daemon"
+        with recorder.stage("daemon"):
+            publish_via_daemon(client, source_path, content, title)
+        return
+
+    # ── 5 / 6. 正文转换流水线与补全 Front Matter 并行 ──
+    # 转换流水线（附件迁移等，见 TRANSFORM_STAGES）与标签扫描在后台进行，用户同时回答
+    # 标签 / 分类 / 摘要提问；流水线只作用于正文，写入前再把结果拼回补全后的 Front Matter。
+    original_meta, body = parse_front_matter(content)
+    migration_log: list[str] = []
+    copy_state: dict = {}
+
+    def run_migration() -> str:
+        with recorder.stage("migrate"):
+            return transform_body(
+                body, source_path, meta=original_meta,
+                log=migration_log.append,
+                timings=recorder.record["stages"],
+                progress=lambda name, copied, total: copy_state.update(name=name, copied=copied, total=total),
+                stats=recorder.stats,
+                store=store,
+                resolve=plan_resolver(plan) if plan else None,
+                names=plan_destinations(plan) if plan else None,
+            )
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        migrated = pool.submit(run_migration)
+        existing_tags = pool.submit(collect_existing_tags)
+        pool.submit(LabelSuggester.load, lambda _msg: None)  # 预热标签推荐缓存
 
-    # ── 6. 处理 Front Matter ──
-    content = ensure_front_matter(content, title)
+        with recorder.stage("front_matter"):
+            if plan:
+                content = plan["content"]
+                print("📋 使用计划中的 Front Matter")
+            else:
+                content = ensure_front_matter(content, title, existing_tags=existing_tags.result)
+
+        print("\n🖼️  正在处理图片与附件...")
+        print("─" * 40)
+        with recorder.stage("join"):
+            # 提问结束时迁移仍未完成，则显示大文件的复制进度
+            last = None
+            while not migrated.done():
+                state = (copy_state.get("name"), copy_state.get("copied", 0), copy_state.get("total", 0))
+                if state != last and state[2] >= CHUNK_COPY_THRESHOLD:
+                    _print_progress(state[0])(state[1], state[2])
+                    last = state
+                time.sleep(0.2)
+            if last and last[1] < last[2]:
+                print()
+            migrated_body = migrated.result()
+        for line in migration_log:
+            print(line)
+    store.close()
+
+    # Front Matter 补全不会改动正文，正文总是内容的后缀
+    content = content[:len(content) - len(body)] + migrated_body
 
     # ── 7. 写入目标文件 ──
-    # 文件名做简单处理：保留原名，但替换空格为短横线
-    safe_filename = source_path.stem.replace(" ", "-") + ".md"
-    dest_path = POSTS_DIR / safe_filename
+    dest_path = POSTS_DIR / post_filename(source_path)
 
-    try:
-        dest_path.write_text(content, encoding="utf-8")
-        print(f"\n✅ 文章已写入: {dest_path}")
-    except Exception as e:
-        print(f"❌ 错误：写入目标文件失败: {e}")
-        sys.exit(1)
+    with recorder.stage("write"):
+        try:
+            write_text_atomic(dest_path, content)
+            print(f"\n✅ 文章已写入: {dest_path}")
+        except Exception as e:
+            print(f"❌ 错误：写入目标文件失败: {e}")
+            sys.exit(1)
+
+    # ── 8. 更新相关文章与文章清单 ──
+    print("\n🔗 正在更新相关文章与文章清单...")
+    print("─" * 40)
+    with recorder.stage("related"):
+        update_related_posts()
+        update_posts_manifest()
 
-    # ── 8. Git 发布 ──
+    # ── 9. Git 发布 ──
     # 从最终的 front matter 中读取标题
     final_meta, _ = parse_front_matter(content)
     publish_title = title
     if final_meta and "title" in final_meta:
         publish_title = final_meta["title"]
 
-    if git_publish(publish_title):
+    with recorder.stage("git"):
+        results = publish_to_targets(
+            targets, [(dest_path.name, content)], publish_title,
+            primary_runner=functools.partial(git_publish, timings=recorder.git_timings),
+            timings=recorder.git_timings,
+        )
+    if all(results.values()):
         print("\n" + "═" * 42)
         print(f"🎉 发布成功！文章「{publish_title}」已推送到远程仓库")
         print("═" * 42)
     else:
-        print("\n⚠️  Git 操作未完全成功，请手动检查并完成发布")
+        failed = "、".join(name for name, ok in results.items() if not ok)
+        print(f"\n⚠️  Git 操作未完全成功（{failed}），请手动检查并完成发布")
         sys.exit(1)
 
 
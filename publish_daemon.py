@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+publish_daemon.py — Obsidian → Valaxy 发布工具（常驻进程）
+
+用法:
+    python publish_daemon.py [--vault <Obsidian库目录>] [--port 4860] [--maintain-every 小时]
+
+常驻内存保存文章索引、附件索引和 Git 状态，通过本机 HTTP 接口提供服务：
+    GET  /status    运行状态
+    GET  /tags      已有标签与分类（按使用频率降序）
+    POST /publish   发布单篇笔记
+    POST /batch     批量发布多篇笔记，合并为一次提交
+publish.py 与 publish_gui.py 检测到常驻进程时会自动改为调用这些接口。
+每个请求都需要携带 X-Publish-Token 头，令牌保存在 .publish-cache/daemon.json，
+防止浏览器中的网页跨站调用本机接口。
+指定 --maintain-every 时按间隔在后台执行仓库维护（同 publish.py maintain）。
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import secrets
+import signal
+import argparse
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import publish
+
+
+# ──────────────────────────────────────────
+#  常驻状态
+# ──────────────────────────────────────────
+
+class GitHelper:
+    """
+    启动时确认一次 Git 可用与仓库位置。Git 操作在进程内串行，
+    并通过发布队列与同时运行的 CLI / GUI 互斥。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        try:
+            result = subprocess.run(
+                ["git", "rev-parse", "--show-toplevel"],
+                cwd=str(publish.VALAXY_ROOT),
+                capture_output=True, text=True, encoding="utf-8",
+            )
+            self.available = result.returncode == 0
+            self.toplevel = result.stdout.strip()
+        except (FileNotFoundError, OSError):
+            self.available = False
+            self.toplevel = ""
+
+    def publish(self, targets: list[dict], posts: list[tuple[str, str]], title: str, log) -> bool:
+        """提交并推送到全部发布目标（镜像目标先同步文章与附件），全部成功才返回 True。"""
+        if not self.available:
+            log("❌ 错误：Valaxy 目录不是可用的 Git 仓库（或未安装 Git）")
+            return False
+        with self.lock:
+            results = publish.publish_to_targets(targets, posts, title, log=log)
+        return all(results.values())
+
+
+class PublishService:
+    """常驻进程的全部状态：文章索引、附件索引、Git 助手。发布操作串行执行。"""
+
+    def __init__(self, vault: Path | None):
+        self.started = time.time()
+        self.posts = publish.PostIndex()
+        self.posts.refresh()
+        self.attachments = publish.AttachmentIndex(vault) if vault else None
+        self.git = GitHelper()
+        self.publish_lock = threading.Lock()
+        self.index_lock = threading.Lock()  # PostIndex 不是线程安全的，/tags 与发布都会刷新它
+        self.last_maintenance: float | None = None
+
+    def status(self) -> dict:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 1),
+            "root": str(publish.VALAXY_ROOT),
+            "posts": len(self.posts.entries),
+            "attachments": sum(len(v) for v in self.attachments.by_name.values()) if self.attachments else None,
+            "git": self.git.available,
+            "last_maintenance": self.last_maintenance,
+        }
+
+    def maintain_forever(self, interval_hours: float):
+        """后台线程：每隔 interval_hours 小时维护一次所有发布目标的仓库。"""
+        while True:
+            time.sleep(interval_hours * 3600)
+            try:
+                targets = publish.load_publish_targets()
+            except ValueError as e:
+                print(f"⚠️  警告：跳过定期维护：{e}")
+                continue
+            for target in targets:
+                print(f"🔧 定期维护 {target['name']}（{target['root']}）")
+                publish.maintain_repo(target["root"], log=print, measure=False)
+            self.last_maintenance = time.time()
+
+    def labels(self) -> dict:
+        with self.index_lock:
+            self.posts.refresh()
+            return {"tags": self.posts.labels("tags"), "categories": self.posts.labels("categories")}
+
+    @staticmethod
+    def _check_source(item: dict) -> Path:
+        source = Path(item["path"]).resolve()
+        if not source.is_file():
+            raise FileNotFoundError(f"文件不存在 → {source}")
+        if source.suffix.lower() not in (".md", ".markdown"):
+            raise ValueError(f"文件不是 Markdown 格式（{source.suffix}）")
+        return source
+
+    def _write_post(self, item: dict, log) -> tuple[Path, str, str]:
+        """迁移附件、补全 Front Matter 并写入文章，返回 (目标路径, 标题, 最终内容)。"""
+        source = self._check_source(item)
+
+        content = item.get("content")
+        if content is None:
+            content = publish.fill_front_matter(
+                publish.read_note(source),
+                item.get("title") or source.stem,
+                tags=item.get("tags"),
+                category=item.get("category", ""),
+                excerpt=item.get("excerpt", ""),
+            )
+
+        resolve = self.attachments.resolve if self.attachments else None
+        content = publish.transform_content(content, source, log=log, resolve=resolve)
+
+        publish.POSTS_DIR.mkdir(parents=True, exist_ok=True)
+        dest = publish.POSTS_DIR / publish.post_filename(source)
+        publish.write_text_atomic(dest, content)
+        log(f"✅ 文章已写入: {dest}")
+
+        meta, _ = publish.parse_front_matter(content)
+        return dest, str((meta or {}).get("title") or source.stem), content
+
+    def publish_items(self, items: list[dict], push: bool = True) -> dict:
+        lines: list[str] = []
+        log = lines.append
+        written = []
+        with self.publish_lock:
+            try:
+                # 先检查发布目标配置与全部源文件，避免批量发布写到一半才失败
+                targets = publish.load_publish_targets()
+                for item in items:
+                    self._check_source(item)
+                for item in items:
+                    written.append(self._write_post(item, log))
+            except (OSError, ValueError, KeyError) as e:
+                log(f"❌ 错误：{e}")
+                return {"ok": False, "posts": [str(d) for d, _, _ in written], "log": lines}
+
+            publish.update_related_posts(log=log)
+            with self.index_lock:
+                publish.update_posts_manifest(log=log, index=self.posts)
+
+            ok = True
+            if push:
+                posts = [(d.name, content) for d, _, content in written]
+                ok = self.git.publish(targets, posts, "、".join(t for _, t, _ in written), log)
+        return {
+            "ok": ok,
+            "posts": [str(d) for d, _, _ in written],
+            "titles": [t for _, t, _ in written],
+            "log": lines,
+        }
+
+
+# ──────────────────────────────────────────
+#  HTTP 接口
+# ──────────────────────────────────────────
+
+def make_handler(service: PublishService, token: str):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _reply(self, code: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            if hmac.compare_digest(self.headers.get("X-Publish-Token", ""), token):
+                return True
+            self._reply(403, {"ok": False, "error": "令牌无效"})
+            return False
+
+        def _read_json(self) -> dict | None:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+                if isinstance(body, dict):
+                    return body
+            except (ValueError, UnicodeDecodeError):
+                pass
+            self._reply(400, {"ok": False, "error": "请求体必须是 JSON 对象"})
+            return None
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if self.path == "/status":
+                self._reply(200, service.status())
+            elif self.path == "/tags":
+                self._reply(200, service.labels())
+            else:
+                self._reply(404, {"ok": False, "error": "未知接口"})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            body = self._read_json()
+            if body is None:
+                return
+            if self.path == "/publish":
+                if not body.get("path"):
+                    self._reply(400, {"ok": False, "error": "缺少 path 参数"})
+                    return
+                self._reply(200, service.publish_items([body], push=body.get("push", True)))
+            elif self.path == "/batch":
+                items = body.get("items")
+                if not isinstance(items, list) or not all(isinstance(i, dict) and i.get("path") for i in items):
+                    self._reply(400, {"ok": False, "error": "items 必须是包含 path 的对象列表"})
+                    return
+                self._reply(200, service.publish_items(items, push=body.get("push", True)))
+            else:
+                self._reply(404, {"ok": False, "error": "未知接口"})
+
+        def log_message(self, fmt, *args):
+            print(f"  [{time.strftime('%H:%M:%S')}] {self.address_string()} {fmt % args}")
+
+    return Handler
+
+
+# ──────────────────────────────────────────
+#  入口
+# ──────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Obsidian → Valaxy 发布工具常驻进程")
+    parser.add_argument("--vault", type=Path, help="Obsidian 库根目录（用于建立附件索引）")
+    parser.add_argument("--port", type=int, default=publish.DAEMON_PORT, help="监听端口")
+    parser.add_argument("--maintain-every", type=float, default=0, metavar="HOURS",
+                        help="每隔多少小时自动维护 Git 仓库（默认不维护）")
+    args = parser.parse_args()
+
+    print("⏳ 正在建立索引...")
+    service = PublishService(args.vault.resolve() if args.vault else None)
+    status = service.status()
+    print(f"  ✅ 文章 {status['posts']} 篇，附件 {status['attachments'] or 0} 个，Git {'可用' if status['git'] else '不可用'}")
+
+    if args.maintain_every > 0:
+        threading.Thread(target=service.maintain_forever, args=(args.maintain_every,), daemon=True).start()
+        print(f"  🔧 每 {args.maintain_every:g} 小时自动维护 Git 仓库")
+
+    token = secrets.token_urlsafe(24)
+    server = ThreadingHTTPServer((publish.DAEMON_HOST, args.port), make_handler(service, token))
+    info_file = publish.CACHE_DIR / "daemon.json"
+    publish.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    info_file.write_text(
+        json.dumps({"port": server.server_address[1], "token": token, "pid": os.getpid()}),
+        encoding="utf-8",
+    )
+
+    # 收到 SIGTERM 时同样走 finally 清理 daemon.json
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🚀 常驻进程已启动：http://{publish.DAEMON_HOST}:{server.server_address[1]}  （Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 常驻进程已退出")
+    finally:
+        server.server_close()
+        info_file.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
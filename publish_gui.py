@@ -24,28 +24,19 @@ except ImportError:
     _sp.check_call([sys.executable, "-m", "pip", "install", "customtkinter"])
     import customtkinter as ctk
 
-try:
-    import yaml
-except ImportError:
-    import subprocess as _sp
-    _sp.check_call([sys.executable, "-m", "pip", "install", "pyyaml"])
-    import yaml
-
-import re
-import shutil
+import json
+import hashlib
+import importlib.util
 import subprocess
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from tkinter import filedialog
 
-# ━━━━━━━━━━━━━━━━ 配置区域 ━━━━━━━━━━━━━━━━
-VALAXY_ROOT = Path(r"D:\myWeb")
-POSTS_DIR = VALAXY_ROOT / "pages" / "posts"
-ASSETS_DIR = VALAXY_ROOT / "public" / "assets"
-OBSIDIAN_ATTACHMENT_NAMES = ["attachments", "assets", "images", "附件", "Attachments"]
-IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".bmp", ".ico"}
-# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+import publish
+
+# 博客根目录、文章 / 附件目录、Obsidian 库等配置统一在 publish.py 的配置区域中修改
 
 # ── 样式常量 ──
 FONT_FAMILY = "Microsoft YaHei"
@@ -60,109 +51,102 @@ COLOR_TAG_BG = "#2d2d44"       # 标签未选中背景
 COLOR_TAG_BORDER = "#4a4a6a"   # 标签边框
 COLOR_MUTED = "#94a3b8"        # 次要文字
 
+# ── 图片预览 ──
+THUMB_SIZE = (120, 90)                      # 缩略图最大尺寸
+THUMB_COLUMNS = 6                           # 预览网格列数
+THUMB_CACHE_MAX_BYTES = 64 * 1024 * 1024    # 缩略图磁盘缓存上限
+
+# ── 发布进度：各阶段在总进度条中所占的比例 ──
+PUBLISH_STAGES = {
+    "migrate": ("迁移附件", 0.55),
+    "front_matter": ("补全 Front Matter", 0.05),
+    "write": ("写入文章", 0.05),
+    "related": ("更新相关文章与清单", 0.10),
+    "git": ("Git 提交推送", 0.25),
+}
+
+# ── 笔记选择器 ──
+PICKER_ROWS = 30                            # 最多显示的搜索结果数
+PICKER_STATUS = {"published": ("已发布", COLOR_SUCCESS),
+                 "modified": ("有更新", COLOR_WARNING),
+                 "unpublished": ("未发布", "#e2e8f0")}
+
+
+class ThumbnailCache:
+    """
+    缩略图磁盘缓存（.publish-cache/thumbnails/），以图片内容哈希为键。
+    命中时更新文件修改时间，总大小超过上限时按修改时间淘汰最久未用的缩略图（LRU）。
+    「路径 + 大小 + 修改时间 → 内容哈希」的映射同样落盘，未修改的大图无需重新读取。
+    Pillow 为可选依赖，在生成缩略图时才导入；未安装时不显示缩略图。
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = cache_dir / "index.json"
+        self._lock = threading.Lock()
+        try:
+            self._hashes: dict[str, str] = json.loads(self.index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._hashes = {}
+
+    def _content_hash(self, path: Path) -> str:
+        st = path.stat()
+        key = f"{path}|{st.st_size}|{st.st_mtime_ns}"
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest:
+            return digest
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._hashes[key] = digest
+        return digest
 
-# ══════════════════════════════════════════
-#  核心逻辑（复用自 publish.py）
-# ══════════════════════════════════════════
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("PIL") is not None
 
-def parse_front_matter(content: str):
-    """解析 Front Matter，返回 (meta_dict | None, body_str)。"""
-    match = re.match(r"^---\s*\n(.*?)\n---\s*\n", content, re.DOTALL)
-    if match:
-        try:
-            meta = yaml.safe_load(match.group(1))
-            if not isinstance(meta, dict):
-                meta = {}
-        except yaml.YAMLError:
-            meta = {}
-        return meta, content[match.end():]
-    return None, content
-
-
-def dump_front_matter(meta: dict, body: str) -> str:
-    """合并 Front Matter 和正文。"""
-    yaml_str = yaml.dump(meta, default_flow_style=False, allow_unicode=True, sort_keys=False)
-    return f"---\n{yaml_str}---\n{body}"
-
-
-def find_image_file(image_ref: str, md_file_path: Path):
-    """在 Obsidian 目录结构中搜索图片文件。"""
-    md_dir = md_file_path.parent
-    image_name = Path(image_ref).name
-
-    # 直接相对路径
-    c = md_dir / image_ref
-    if c.is_file():
-        return c
-    # 同级目录
-    c = md_dir / image_name
-    if c.is_file():
-        return c
-    # 常见附件文件夹
-    for folder in OBSIDIAN_ATTACHMENT_NAMES:
-        c = md_dir / folder / image_name
-        if c.is_file():
-            return c
-    # 父级附件文件夹
-    for folder in OBSIDIAN_ATTACHMENT_NAMES:
-        c = md_dir.parent / folder / image_name
-        if c.is_file():
-            return c
-    # 向上搜索 3 层
-    cur = md_dir
-    for _ in range(3):
-        cur = cur.parent
-        for folder in OBSIDIAN_ATTACHMENT_NAMES:
-            c = cur / folder / image_name
-            if c.is_file():
-                return c
-    return None
-
-
-def collect_existing_tags() -> list[str]:
-    """收集博客已有标签，按使用频率降序。"""
-    tag_count: dict[str, int] = {}
-    if not POSTS_DIR.exists():
-        return []
-    for md_file in POSTS_DIR.glob("*.md"):
+    def get(self, path: Path):
+        """返回 path 的缩略图（PIL Image），无法生成或未安装 Pillow 时返回 None。可在后台线程调用。"""
         try:
-            text = md_file.read_text(encoding="utf-8")
-        except Exception:
-            continue
-        meta, _ = parse_front_matter(text)
-        if meta and "tags" in meta:
-            tags = meta["tags"]
-            if isinstance(tags, list):
-                for t in tags:
-                    s = str(t).strip()
-                    if s:
-                        tag_count[s] = tag_count.get(s, 0) + 1
-            elif isinstance(tags, str) and tags.strip():
-                tag_count[tags.strip()] = tag_count.get(tags.strip(), 0) + 1
-    return [t for t, _ in sorted(tag_count.items(), key=lambda x: x[1], reverse=True)]
-
-
-def collect_existing_categories() -> list[str]:
-    """收集博客已有分类。"""
-    cat_count: dict[str, int] = {}
-    if not POSTS_DIR.exists():
-        return []
-    for md_file in POSTS_DIR.glob("*.md"):
+            from PIL import Image
+        except ImportError:
+            return None
         try:
-            text = md_file.read_text(encoding="utf-8")
-        except Exception:
-            continue
-        meta, _ = parse_front_matter(text)
-        if meta and "categories" in meta:
-            cats = meta["categories"]
-            if isinstance(cats, list):
-                for c in cats:
-                    s = str(c).strip()
-                    if s:
-                        cat_count[s] = cat_count.get(s, 0) + 1
-            elif isinstance(cats, str) and cats.strip():
-                cat_count[cats.strip()] = cat_count.get(cats.strip(), 0) + 1
-    return [c for c, _ in sorted(cat_count.items(), key=lambda x: x[1], reverse=True)]
+            thumb_file = self.cache_dir / f"{self._content_hash(path)}.png"
+            if thumb_file.exists():
+                os.utime(thumb_file)
+                with Image.open(thumb_file) as img:
+                    return img.copy()
+            with Image.open(path) as img:
+                img.thumbnail(THUMB_SIZE)
+                thumb = img.convert("RGBA")
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            thumb.save(thumb_file, "PNG")
+            return thumb
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+    def flush(self):
+        """保存哈希索引，并按 LRU 淘汰超出容量上限的缩略图。"""
+        if not self.cache_dir.exists():
+            return
+        with self._lock:
+            try:
+                self.index_file.write_text(json.dumps(self._hashes), encoding="utf-8")
+            except OSError:
+                pass
+        thumbs = [(f.stat().st_mtime, f.stat().st_size, f) for f in self.cache_dir.glob("*.png")]
+        total = sum(size for _, size, _ in thumbs)
+        for _, size, f in sorted(thumbs):
+            if total <= self.max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
 
 
 # ══════════════════════════════════════════
@@ -209,6 +193,10 @@ class TagChip(ctk.CTkButton):
         if self._on_toggle:
             self._on_toggle(self.tag_name, self.is_selected)
 
+    def set_suggested(self, suggested: bool):
+        """根据正文内容推荐的标签以 ★ 前缀标出。"""
+        self.configure(text=f"★ {self.tag_name}" if suggested else self.tag_name)
+
     def set_selected(self, selected: bool):
         self.is_selected = selected
         if self.is_selected:
@@ -238,6 +226,142 @@ class SectionHeader(ctk.CTkFrame):
         ).pack(side="left")
 
 
+class NotePicker(ctk.CTkToplevel):
+    """
+    笔记模糊搜索选择器：基于 publish.NoteIndex 的内存索引，输入即筛选（在上一次结果中缩小范围），
+    空查询时按修改时间倒序列出最近的笔记。↑/↓ 移动，回车确认，Esc 关闭。
+    """
+
+    def __init__(self, master, index: "publish.NoteIndex", on_pick, on_browse):
+        super().__init__(master)
+        self.title("搜索笔记")
+        self.geometry("720x560")
+        self.transient(master)
+        self.index = index
+        self._on_pick = on_pick
+        self._on_browse = on_browse
+        self._matches: list[Path] = []
+        self._last_query = ""
+        self._cursor = 0
+        self._debounce = None
+
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.pack(fill="x", padx=14, pady=(14, 6))
+        self.query_entry = ctk.CTkEntry(
+            top, placeholder_text="输入标题或路径的片段，如 qsl card",
+            font=(FONT_FAMILY, 14), height=38, corner_radius=8,
+        )
+        self.query_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        ctk.CTkButton(
+            top, text="📁 其它位置…", width=110, height=38, corner_radius=8,
+            font=(FONT_FAMILY, 13), fg_color=COLOR_TAG_BG, hover_color="#3d3d5c",
+            command=self._browse,
+        ).pack(side="right")
+
+        self.summary = ctk.CTkLabel(self, text="正在建立笔记索引...", font=(FONT_FAMILY, 12),
+                                    text_color=COLOR_MUTED, anchor="w")
+        self.summary.pack(fill="x", padx=16)
+
+        body = ctk.CTkScrollableFrame(self, fg_color=COLOR_CARD, corner_radius=12)
+        body.pack(fill="both", expand=True, padx=14, pady=(6, 14))
+        self.rows = []
+        for i in range(PICKER_ROWS):
+            row = ctk.CTkButton(
+                body, text="", anchor="w", height=44, corner_radius=8,
+                font=(FONT_FAMILY, 13), fg_color="transparent", hover_color="#2d2d44",
+                text_color="#e2e8f0", command=lambda i=i: self._pick(i),
+            )
+            self.rows.append(row)
+
+        self.query_entry.bind("<KeyRelease>", self._on_key)
+        self.query_entry.bind("<Return>", lambda _e: self._pick(self._cursor))
+        self.query_entry.bind("<Down>", lambda _e: self._move(1))
+        self.query_entry.bind("<Up>", lambda _e: self._move(-1))
+        self.bind("<Escape>", lambda _e: self.destroy())
+        self.after(50, self.query_entry.focus_set)
+
+    def refresh_index(self):
+        """在后台线程增量刷新索引，完成后重新筛选。"""
+        def _worker():
+            t0 = time.perf_counter()
+            try:
+                count = self.index.refresh()
+            except OSError as e:
+                self.master.after(0, self._on_index_error, e)
+                return
+            elapsed = time.perf_counter() - t0
+            # 选择器可能已关闭，回调挂在主窗口上
+            self.master.after(0, self._on_indexed, count, elapsed)
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def _on_index_error(self, error: OSError):
+        if self.winfo_exists():
+            self.summary.configure(text=f"❌ 无法读取笔记库：{error}")
+
+    def _on_indexed(self, count: int, elapsed: float):
+        if not self.winfo_exists():
+            return
+        self._index_note = f"共 {count} 篇笔记（索引 {elapsed * 1000:.0f} ms）"
+        self._last_query = None  # 索引已变化，下次筛选从全部笔记开始
+        self._filter()
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape"):
+            return
+        if self._debounce:
+            self.after_cancel(self._debounce)
+        self._debounce = self.after(60, self._filter)
+
+    def _filter(self):
+        self._debounce = None
+        query = self.query_entry.get().strip()
+        # 在上一次结果中缩小范围：新查询以旧查询开头时，旧结果的超集一定包含新结果
+        narrow = bool(self._last_query) and query.startswith(self._last_query)
+        self._matches = self.index.search(query, limit=None,
+                                          within=self._matches if narrow else None)
+        self._last_query = query
+        self._cursor = 0
+        self._render()
+
+    def _render(self):
+        shown = self._matches[:PICKER_ROWS]
+        for i, row in enumerate(self.rows):
+            if i >= len(shown):
+                row.pack_forget()
+                continue
+            note = self.index.notes.get(shown[i])
+            if note is None:
+                row.pack_forget()
+                continue
+            label, color = PICKER_STATUS[self.index.status(shown[i])]
+            mtime = datetime.fromtimestamp(note["mtime_ns"] / 1e9).strftime("%Y-%m-%d %H:%M")
+            row.configure(
+                text=f"{note['title']}   [{label}]\n{note['rel']}  ·  {mtime}",
+                fg_color=COLOR_ACCENT if i == self._cursor else "transparent",
+                text_color="white" if i == self._cursor else color,
+            )
+            row.pack(fill="x", pady=1)
+        note = getattr(self, "_index_note", "")
+        self.summary.configure(text=f"{note}，匹配 {len(self._matches)} 篇" if note else "正在建立笔记索引...")
+
+    def _move(self, delta: int):
+        shown = min(len(self._matches), PICKER_ROWS)
+        if shown:
+            self._cursor = (self._cursor + delta) % shown
+            self._render()
+        return "break"
+
+    def _pick(self, i: int):
+        if i < len(self._matches[:PICKER_ROWS]):
+            path = self._matches[i]
+            self.destroy()
+            self._on_pick(path)
+
+    def _browse(self):
+        self.destroy()
+        self._on_browse()
+
+
 # ══════════════════════════════════════════
 #  主应用窗口
 # ══════════════════════════════════════════
@@ -258,10 +382,23 @@ class PublishApp(ctk.CTk):
         self.source_path: Path | None = None
         self.file_content: str = ""
         self._publishing = False
+        self.thumbnails = ThumbnailCache(publish.CACHE_DIR / "thumbnails")
+        self._preview_token = 0
+        self._load_token = 0
+        self._preview_images: list[ctk.CTkImage] = []
+        self._cancel: publish.CancelToken | None = None
+        self._committed = False
+        self._index_tree: str | None = None  # git add 之前的暂存区（git write-tree），取消时据此恢复
+        self._items = (0, 0)
+        self._stage_base = 0.0
+        self._stage_weight = 0.0
+        self._stage_label = ""
+        self.note_index = publish.NoteIndex(publish.OBSIDIAN_VAULT)
 
         # ── 构建界面 ──
         self._build_ui()
         self._load_existing_tags()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     # ──────────────────────────────────────
     #  界面构建
@@ -278,6 +415,7 @@ class PublishApp(ctk.CTk):
 
         self._build_header()
         self._build_file_section()
+        self._build_preview_section()
         self._build_frontmatter_section()
         self._build_tags_section()
         self._build_log_section()
@@ -314,7 +452,7 @@ class PublishApp(ctk.CTk):
 
         self.file_entry = ctk.CTkEntry(
             row,
-            placeholder_text="点击右侧按钮选择 Obsidian 笔记文件...",
+            placeholder_text="点击右侧按钮搜索 Obsidian 笔记...",
             font=(FONT_FAMILY, 13),
             height=38,
             corner_radius=8,
@@ -322,7 +460,7 @@ class PublishApp(ctk.CTk):
         self.file_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
 
         ctk.CTkButton(
-            row, text="📁 浏览",
+            row, text="🔎 选择",
             width=90, height=38,
             corner_radius=8,
             font=(FONT_FAMILY, 13),
@@ -331,6 +469,27 @@ class PublishApp(ctk.CTk):
             command=self._browse_file,
         ).pack(side="right")
 
+    # ── 图片预览 ──
+
+    def _build_preview_section(self):
+        card = ctk.CTkFrame(self.outer, fg_color=COLOR_CARD, corner_radius=12)
+        card.pack(fill="x", pady=4)
+        inner = ctk.CTkFrame(card, fg_color="transparent")
+        inner.pack(fill="x", padx=16, pady=14)
+
+        SectionHeader(inner, "🖼️", "图片预览").pack(fill="x")
+
+        self.preview_summary = ctk.CTkLabel(
+            inner, text="选择笔记后显示将被迁移的图片",
+            font=(FONT_FAMILY, 12),
+            text_color=COLOR_MUTED,
+            anchor="w",
+        )
+        self.preview_summary.pack(fill="x", pady=(6, 0))
+
+        self.preview_grid = ctk.CTkFrame(inner, fg_color="transparent")
+        self.preview_grid.pack(fill="x", pady=(6, 0))
+
     # ── Front Matter 表单 ──
 
     def _build_frontmatter_section(self):
@@ -368,6 +527,11 @@ class PublishApp(ctk.CTk):
         self.excerpt_entry = ctk.CTkEntry(form, placeholder_text="一句话摘要（可选）", **ent_opts)
         self.excerpt_entry.grid(row=1, column=3, sticky="ew", pady=5)
 
+        # 第三行：根据正文推荐的分类（点击填入）
+        ctk.CTkLabel(form, text="推荐：", **lbl_opts).grid(row=2, column=0, sticky="e", padx=(0, 6), pady=5)
+        self.cat_suggest_row = ctk.CTkFrame(form, fg_color="transparent")
+        self.cat_suggest_row.grid(row=2, column=1, columnspan=3, sticky="w", pady=5)
+
     # ── 标签选择 ──
 
     def _build_tags_section(self):
@@ -451,6 +615,19 @@ class PublishApp(ctk.CTk):
         self.log_text.tag_config("info", foreground=COLOR_INFO)
         self.log_text.tag_config("dim", foreground="#6c7086")
 
+        # 发布进度（按阶段与附件数推进，发布期间显示）
+        self.progress_row = ctk.CTkFrame(inner, fg_color="transparent")
+        self.progress_label = ctk.CTkLabel(
+            self.progress_row, text="",
+            font=(FONT_FAMILY, 11),
+            text_color=COLOR_MUTED,
+            anchor="w",
+        )
+        self.progress_label.pack(fill="x")
+        self.progress_bar = ctk.CTkProgressBar(self.progress_row, height=8, progress_color=COLOR_ACCENT)
+        self.progress_bar.pack(fill="x", pady=(2, 0))
+        self.progress_bar.set(0)
+
     # ── 底部操作栏 ──
 
     def _build_footer(self):
@@ -469,10 +646,35 @@ class PublishApp(ctk.CTk):
         )
         self.publish_btn.pack(fill="x")
 
+        # 预览：只演算发布计划（写哪些文件、复制哪些附件、预计耗时），不写文件、不执行 Git
+        self.preview_btn = ctk.CTkButton(
+            footer,
+            text="🔍  预览发布计划",
+            height=36,
+            corner_radius=10,
+            font=(FONT_FAMILY, 13),
+            fg_color=COLOR_TAG_BG,
+            hover_color=COLOR_TAG_BORDER,
+            command=self._on_preview_click,
+        )
+        self.preview_btn.pack(fill="x", pady=(8, 0))
+
+        # 发布期间显示：取消后在下一个检查点停止，并回滚本次新建的文章与附件
+        self.cancel_btn = ctk.CTkButton(
+            footer,
+            text="⏹  取消发布",
+            height=36,
+            corner_radius=10,
+            font=(FONT_FAMILY, 13),
+            fg_color=COLOR_TAG_BG,
+            hover_color=COLOR_ERROR,
+            command=self._on_cancel_click,
+        )
+
         # 底部提示
         ctk.CTkLabel(
             footer,
-            text="发布流程：复制文件 → 迁移图片 → 补全 Front Matter → Git 提交并推送",
+            text="发布流程：复制文件 → 迁移图片 → 补全 Front Matter → 更新相关文章 → Git 提交并推送",
             font=(FONT_FAMILY, 11),
             text_color="#585b70",
         ).pack(pady=(8, 0))
@@ -482,37 +684,85 @@ class PublishApp(ctk.CTk):
     # ──────────────────────────────────────
 
     def _browse_file(self):
+        """打开笔记搜索选择器；未配置 Obsidian 库目录时退回系统文件对话框。"""
+        if not publish.OBSIDIAN_VAULT.is_dir():
+            self._browse_file_dialog()
+            return
+        picker = NotePicker(self, self.note_index, on_pick=self._pick_note,
+                            on_browse=self._browse_file_dialog)
+        picker.refresh_index()
+
+    def _pick_note(self, path: Path):
+        # 发布 / 预览进行中（含其触发的后台加载）时锁定选择，避免加载令牌被作废后按钮卡在“加载中”
+        if self._publishing:
+            self.log("⚠️  正在发布，完成后再切换笔记", "warning")
+            return
+        self.file_entry.delete(0, "end")
+        self.file_entry.insert(0, str(path))
+        self._on_file_selected(path)
+
+    def _browse_file_dialog(self):
         path = filedialog.askopenfilename(
             title="选择 Obsidian Markdown 笔记",
             filetypes=[("Markdown", "*.md *.markdown"), ("所有文件", "*.*")],
         )
         if path:
-            self.file_entry.delete(0, "end")
-            self.file_entry.insert(0, path)
-            self._on_file_selected(Path(path))
-
-    def _on_file_selected(self, path: Path):
-        """文件选中后：读取内容，自动填充表单。"""
+            self._pick_note(Path(path))
+
+    def _on_file_selected(self, path: Path, then=None):
+        """
+        文件选中后：在后台线程读取并解析笔记，完成后一次性填充表单。
+        再次选择文件会使尚未完成的加载作废（令牌失效），过期结果直接丢弃。
+        then 在加载成功并填充表单后于主线程调用。
+        """
+        self._load_token += 1
+        token = self._load_token
         self.source_path = path.resolve()
+        self.file_content = ""
+        source = self.source_path
 
-        if not self.source_path.exists():
-            self.log("❌ 文件不存在：" + str(self.source_path), "error")
-            return
-
-        # 读取文件
-        try:
-            self.file_content = self.source_path.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
+        def _worker():
+            result = {"path": source}
             try:
-                self.file_content = self.source_path.read_text(encoding="gbk")
-            except Exception as e:
-                self.log(f"❌ 无法读取文件：{e}", "error")
-                return
+                raw = source.read_bytes()  # 只读一次，解码失败时在内存中换编码重试
+                if token != self._load_token:
+                    return
+                result["content"] = publish.decode_note_bytes(raw)
+            except FileNotFoundError:
+                result["error"] = "❌ 文件不存在：" + str(source)
+            except (OSError, UnicodeDecodeError) as e:
+                result["error"] = f"❌ 无法读取文件：{e}"
+            else:
+                content = result["content"]
+                result["meta"], _ = publish.parse_front_matter(content)
+                if token != self._load_token:
+                    return
+                suggester = publish.LabelSuggester.load(log=lambda _msg: None)
+                result["tag_suggestions"] = [t for t, _ in suggester.suggest(content, "tags")]
+                result["cat_suggestions"] = [c for c, _ in suggester.suggest(content, "categories", limit=5)]
+                if token != self._load_token:
+                    return
+                refs = [ref for ref, kind in publish.iter_local_media_refs(content) if kind == "image"]
+                result["images"] = [(ref, publish.find_image_file(ref, source)) for ref in refs]
+            self.after(0, self._apply_loaded, token, result, then)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def _apply_loaded(self, token: int, result: dict, then=None):
+        """在主线程中把后台加载结果一次性应用到表单。"""
+        if token != self._load_token:
+            return
+        if "error" in result:
+            self.log(result["error"], "error")
+            if then:
+                self._publish_done()
+            return
 
+        self.file_content = result["content"]
         self.log(f"已加载文件：{self.source_path.name}", "info")
 
         # 解析 Front Matter
-        meta, _ = parse_front_matter(self.file_content)
+        meta = result["meta"]
 
         # 填充标题
         self.title_entry.delete(0, "end")
@@ -563,10 +813,114 @@ class PublishApp(ctk.CTk):
                 self._create_tag_chip(t, selected=True)
 
         self._update_selected_label()
+        self._apply_suggestions(result["tag_suggestions"], result["cat_suggestions"])
+        self._show_previews(result["images"])
+
+        if then:
+            then()
+
+    def _apply_suggestions(self, suggested_tags: list[str], suggested_cats: list[str]):
+        """应用推荐结果：推荐标签排到最前，推荐分类显示为可点击按钮。"""
+        rank = {t: i for i, t in enumerate(suggested_tags)}
+        self.tag_chips.sort(key=lambda c: rank.get(c.tag_name, len(rank)))
+        for chip in self.tag_chips:
+            chip.pack_forget()
+        for chip in self.tag_chips:
+            chip.set_suggested(chip.tag_name in rank)
+            chip.pack(side="left", padx=(0, 6), pady=3)
+
+        for child in self.cat_suggest_row.winfo_children():
+            child.destroy()
+        for cat in suggested_cats:
+            ctk.CTkButton(
+                self.cat_suggest_row, text=cat,
+                width=0, height=26,
+                corner_radius=13,
+                font=(FONT_FAMILY, 12),
+                fg_color=COLOR_TAG_BG,
+                border_width=1,
+                border_color=COLOR_TAG_BORDER,
+                text_color=COLOR_MUTED,
+                hover_color="#3d3d5c",
+                command=lambda c=cat: self._pick_category(c),
+            ).pack(side="left", padx=(0, 6))
+
+    def _pick_category(self, category: str):
+        self.cat_entry.delete(0, "end")
+        self.cat_entry.insert(0, category)
+
+    def _show_previews(self, resolved: list[tuple[str, Path | None]]):
+        """
+        列出笔记引用的所有图片（resolved 为 (引用, 找到的文件或 None) 列表）：
+        先放占位格子，缩略图在后台线程生成后逐个填入。
+        """
+        self._preview_token += 1
+        token = self._preview_token
+        for child in self.preview_grid.winfo_children():
+            child.destroy()
+        self._preview_images.clear()
+
+        missing = sum(1 for _, f in resolved if f is None)
+        if not resolved:
+            self.preview_summary.configure(text="笔记中没有需要迁移的本地图片", text_color=COLOR_MUTED)
+            return
+        summary = f"共 {len(resolved)} 张图片"
+        if missing:
+            summary += f"，其中 {missing} 张未找到（发布时将保留原始引用）"
+        if not ThumbnailCache.available():
+            summary += "；未安装 Pillow，不显示缩略图（pip install pillow）"
+        self.preview_summary.configure(text=summary, text_color=COLOR_WARNING if missing else COLOR_MUTED)
+
+        cells = []
+        for i, (ref, img_file) in enumerate(resolved):
+            cell = ctk.CTkLabel(
+                self.preview_grid,
+                text=("⏳\n" if img_file else "❌ 未找到\n") + Path(ref).name,
+                width=THUMB_SIZE[0], height=THUMB_SIZE[1] + 24,
+                font=(FONT_FAMILY, 10),
+                fg_color="#11111b",
+                corner_radius=6,
+                text_color=COLOR_MUTED if img_file else COLOR_ERROR,
+                compound="top",
+                wraplength=THUMB_SIZE[0],
+            )
+            cell.grid(row=i // THUMB_COLUMNS, column=i % THUMB_COLUMNS, padx=3, pady=3)
+            cells.append(cell)
+
+        def _worker():
+            for cell, (ref, img_file) in zip(cells, resolved):
+                if token != self._preview_token:
+                    return  # 已选择了其它笔记
+                if img_file is None:
+                    continue
+                thumb = self.thumbnails.get(img_file)
+                self.after(0, self._set_preview, token, cell, Path(ref).name, thumb)
+            self.thumbnails.flush()
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def _set_preview(self, token: int, cell: ctk.CTkLabel, name: str, thumb):
+        if token != self._preview_token:
+            return
+        if thumb is None:
+            cell.configure(text="🖼️ 无法预览\n" + name)
+            return
+        image = ctk.CTkImage(light_image=thumb, dark_image=thumb, size=thumb.size)
+        self._preview_images.append(image)
+        cell.configure(image=image, text=name)
 
     def _load_existing_tags(self):
-        """加载博客已有标签，渲染为标签按钮。"""
-        tags = collect_existing_tags()
+        """加载博客已有标签，渲染为标签按钮（常驻进程运行时直接向其查询）。"""
+        tags = None
+        daemon = publish.DaemonClient.connect()
+        if daemon:
+            try:
+                tags = daemon.labels()["tags"]
+                self.log("⚡ 已连接发布常驻进程", "info")
+            except (OSError, ValueError, KeyError):
+                tags = None
+        if tags is None:
+            tags = publish.collect_existing_tags()
         if not tags:
             self.no_tags_label.pack(pady=4)
             return
@@ -638,6 +992,60 @@ class PublishApp(ctk.CTk):
         else:
             self.after(0, _append)
 
+    def log_auto(self, message: str):
+        """供 publish.py 中的共享函数使用：按行首符号推断日志颜色。"""
+        text = message.lstrip()
+        if text.startswith(("❌", "✘")):
+            tag = "error"
+        elif text.startswith("⚠"):
+            tag = "warning"
+        elif text.startswith(("✅", "✔", "📷", "🎞")):
+            tag = "success"
+        elif text.startswith("ℹ"):
+            tag = "dim"
+        else:
+            tag = ""
+        self.log(message, tag)
+
+    def _set_stage(self, stage: str):
+        """进入发布的某个阶段（后台线程调用）：之前各阶段计为已完成。"""
+        base = 0.0
+        for name, (_label, weight) in PUBLISH_STAGES.items():
+            if name == stage:
+                break
+            base += weight
+        self._stage_base = base
+        self._stage_label, self._stage_weight = PUBLISH_STAGES[stage]
+        self._set_progress(0.0, self._stage_label)
+
+    def _set_progress(self, fraction: float, text: str):
+        """更新当前阶段内的进度（0~1）与说明文字，线程安全。"""
+        value = min(self._stage_base + self._stage_weight * fraction, 1.0)
+
+        def _update():
+            if not self.progress_row.winfo_ismapped():
+                self.progress_row.pack(fill="x", pady=(8, 0))
+            self.progress_label.configure(text=f"{value:5.0%}  {text}")
+            self.progress_bar.set(value)
+        self.after(0, _update)
+
+    def _on_item_progress(self, done: int, total: int):
+        """附件迁移的条目进度（后台线程中调用）。"""
+        self._items = (done, total)
+        self._set_progress(done / total if total else 1.0, f"{self._stage_label} {done}/{total}")
+
+    def _on_copy_progress(self, name: str, copied: int, total: int):
+        """大附件复制进度回调（在后台线程中调用），计入当前条目的进度。"""
+        if total < publish.CHUNK_COPY_THRESHOLD or copied >= total:
+            return
+        done, count = self._items
+        fraction = (done + copied / total) / count if count else 0.0
+        self._set_progress(
+            fraction,
+            f"{self._stage_label} {done + 1}/{count}：正在复制 {name}  "
+            f"{copied / 1048576:.1f} / {total / 1048576:.1f} MB",
+        )
+
     def log_clear(self):
         self.log_text.configure(state="normal")
         self.log_text.delete("1.0", "end")
@@ -647,146 +1055,282 @@ class PublishApp(ctk.CTk):
     #  发布流程
     # ──────────────────────────────────────
 
-    def _on_publish_click(self):
-        if self._publishing:
-            return
-
-        # 校验
+    def _selected_source(self) -> Path | None:
+        """校验选中的文件，返回其路径；不可用时输出原因并返回 None。"""
         file_path = self.file_entry.get().strip()
         if not file_path:
             self.log("❌ 请先选择一个 Markdown 文件", "error")
-            return
+            return None
         src = Path(file_path).resolve()
         if not src.exists():
             self.log(f"❌ 文件不存在：{src}", "error")
-            return
+            return None
         if src.suffix.lower() not in (".md", ".markdown"):
             self.log("❌ 请选择 Markdown 文件（.md）", "error")
+            return None
+        return src
+
+    def _on_publish_click(self):
+        if self._publishing:
             return
-        title = self.title_entry.get().strip()
-        if not title:
-            self.log("❌ 文章标题不能为空", "error")
+
+        # 校验
+        src = self._selected_source()
+        if src is None:
             return
+        self._publishing = True
+        self.publish_btn.configure(state="disabled", text="⏳ 发布中...")
 
-        # 读取文件（如果还没有加载过）
+        # 读取文件（如果还没有加载过）：后台加载完成后再开始发布
         if self.source_path != src or not self.file_content:
-            self._on_file_selected(src)
+            self.publish_btn.configure(text="⏳ 加载中...")
+            self._on_file_selected(src, then=self._start_publish)
+            return
+        self._start_publish()
 
+    def _on_preview_click(self):
+        if self._publishing:
+            return
+        src = self._selected_source()
+        if src is None:
+            return
         self._publishing = True
+        self.publish_btn.configure(state="disabled")
+        self.preview_btn.configure(state="disabled", text="⏳ 计算中...")
+        if self.source_path != src or not self.file_content:
+            self._on_file_selected(src, then=self._start_preview)
+            return
+        self._start_preview()
+
+    def _start_preview(self):
+        """在内存中演算发布计划并输出到日志，计划保存到 .publish-cache/plans/，可用 --apply 执行。"""
+        source = self.source_path
+        content = self._build_final_content(self.file_content, quiet=True)
+        self.log_clear()
+
+        def _worker():
+            try:
+                plan = publish.build_publish_plan(source, content)
+                publish.format_plan(plan, log=self.log_auto)
+                path = publish.save_plan(plan)
+                self.log(f"\n💾 计划已保存：{path}", "dim")
+                self.log(f'   可在终端执行：python publish.py --apply "{path}"', "dim")
+            except (OSError, ValueError) as e:
+                self.log(f"❌ 生成发布计划失败：{e}", "error")
+            finally:
+                self.after(0, self._publish_done)
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def _start_publish(self):
+        title = self.title_entry.get().strip()
+        if not title:
+            self.log("❌ 文章标题不能为空", "error")
+            self._publish_done()
+            return
+
         self.publish_btn.configure(state="disabled", text="⏳ 发布中...")
+        self.cancel_btn.configure(state="normal", text="⏹  取消发布")
+        self.cancel_btn.pack(fill="x", pady=(8, 0), after=self.publish_btn)
         self.log_clear()
+        self._cancel = publish.CancelToken()
+        self._committed = False
+        self._index_tree = None
+        self._items = (0, 0)
+        self._stage_base = self._stage_weight = 0.0
 
         thread = threading.Thread(target=self._do_publish, daemon=True)
         thread.start()
 
+    def _on_cancel_click(self):
+        if self._cancel and not self._cancel.cancelled:
+            self._cancel.cancel()
+            self.cancel_btn.configure(state="disabled", text="⏳ 正在取消...")
+            self.log("\n⏹ 已请求取消，将在当前附件 / Git 步骤结束后停止", "warning")
+
+    def _on_close(self):
+        """发布进行中关闭窗口：先取消并等待回滚完成，再退出。"""
+        if not self._publishing:
+            self.destroy()
+            return
+        self._on_cancel_click()
+
+        def _wait():
+            if self._publishing:
+                self.after(200, _wait)
+            else:
+                self.destroy()
+        _wait()
+
     def _do_publish(self):
-        """在后台线程执行完整发布流程。"""
+        """在后台线程执行完整发布流程。取消时回滚本次新建的文章与附件。"""
+        source = self.source_path
+        cancel = self._cancel
+        recorder = publish.RunRecorder("gui", str(source))
+        outcome = "failed"
+        created: list[Path] = []
+        dest = publish.POSTS_DIR / publish.post_filename(source)
+        backups: dict[Path, str | None] = {}  # 本次写入过的文件 → 写入前的内容（None 表示原本不存在）
         try:
-            source = self.source_path
             content = self.file_content
 
             self.log("══════════════════════════════════════", "dim")
             self.log("  开始发布流程", "info")
             self.log("══════════════════════════════════════", "dim")
 
-            # ── 1. 迁移图片 ──
-            self.log("\n▸ 正在处理图片...", "info")
-            content = self._migrate_images(content, source)
+            # 常驻进程运行时：本地只组装 Front Matter，其余交给常驻进程
+            daemon = publish.DaemonClient.connect()
+            if daemon:
+                recorder.record["frontend"] = "gui+daemon"
+                with recorder.stage("daemon"):
+                    self._publish_via_daemon(daemon, source, content)
+                outcome = "ok"
+                return
+
+            # 配置有误时在迁移前就报错
+            targets = publish.load_publish_targets()
+
+            # ── 1. 正文转换流水线（迁移图片等） ──
+            self.log("\n▸ 正在处理图片与附件...", "info")
+            self._set_stage("migrate")
+            with recorder.stage("migrate"):
+                content = publish.transform_content(
+                    content, source, log=self.log_auto, timings=recorder.record["stages"],
+                    progress=self._on_copy_progress, stats=recorder.stats, cancel=cancel,
+                    created=created, on_item=self._on_item_progress,
+                )
 
             # ── 2. 构建 Front Matter ──
+            cancel.check()
             self.log("\n▸ 正在处理 Front Matter...", "info")
-            content = self._build_final_content(content)
+            self._set_stage("front_matter")
+            with recorder.stage("front_matter"):
+                content = self._build_final_content(content)
 
             # ── 3. 写入目标文件 ──
+            cancel.check()
             self.log("\n▸ 正在写入文件...", "info")
-            POSTS_DIR.mkdir(parents=True, exist_ok=True)
-            safe_name = source.stem.replace(" ", "-") + ".md"
-            dest = POSTS_DIR / safe_name
-
-            dest.write_text(content, encoding="utf-8")
-            self.log(f"  ✔ 文章已写入：{dest.relative_to(VALAXY_ROOT)}", "success")
-
-            # ── 4. Git 操作 ──
+            self._set_stage("write")
+            publish.POSTS_DIR.mkdir(parents=True, exist_ok=True)
+            self._backup(backups, dest)
+
+            with recorder.stage("write"):
+                publish.write_text_atomic(dest, content)
+            self.log(f"  ✔ 文章已写入：{dest.relative_to(publish.VALAXY_ROOT)}", "success")
+
+            # ── 4. 更新相关文章与文章清单 ──
+            cancel.check()
+            self.log("\n▸ 正在更新相关文章与文章清单...", "info")
+            self._set_stage("related")
+            with recorder.stage("related"):
+                self._backup(backups, publish.RELATED_POSTS_FILE)
+                self._backup(backups, publish.POSTS_MANIFEST_FILE)
+                publish.update_related_posts(log=self.log_auto)
+                publish.update_posts_manifest(log=self.log_auto)
+
+            # ── 5. Git 操作 ──
+            cancel.check()
             publish_title = self.title_entry.get().strip() or source.stem
             self.log("\n▸ 正在执行 Git 操作...", "info")
-            self._git_publish(publish_title)
-
+            self._set_stage("git")
+            # 经发布队列串行执行，与同时运行的 CLI / 常驻进程互斥
+            with recorder.stage("git"):
+                results = publish.publish_to_targets(
+                    targets, [(dest.name, content)], publish_title, log=self.log_auto,
+                    primary_runner=lambda title, _log: self._git_stage(title, recorder.git_timings),
+                    timings=recorder.git_timings,
+                )
+            cancel.check()  # 提交后、推送前取消：提交保留在本地
+            if not all(results.values()):
+                failed = "、".join(name for name, ok in results.items() if not ok)
+                raise RuntimeError(f"Git 操作失败（{failed}）")
+
+            self._set_progress(1.0, "发布完成")
             self.log("\n══════════════════════════════════════", "dim")
             self.log(f"  🎉 发布成功！「{publish_title}」已推送到远程仓库", "success")
             self.log("══════════════════════════════════════", "dim")
+            outcome = "ok"
 
+        except publish.PublishCancelled:
+            outcome = "cancelled"
+            if self._committed:
+                self.log("\n⏹ 已取消推送：提交保留在本地，可稍后手动执行 git push", "warning")
+            else:
+                self._rollback(created, backups)
+                self.log("\n⏹ 发布已取消，本次新建的文章与附件已回滚", "warning")
         except Exception as e:
             self.log(f"\n❌ 发布过程中出错：{e}", "error")
         finally:
+            recorder.finish(outcome)
             self.after(0, self._publish_done)
 
+    def _publish_via_daemon(self, daemon: "publish.DaemonClient", source: Path, content: str):
+        self.log("\n▸ 已提交给发布常驻进程...", "info")
+        content = self._build_final_content(content)
+        result = daemon.publish(path=str(source), content=content)
+        for line in result.get("log", []):
+            self.log_auto(line)
+        if not result.get("ok"):
+            raise RuntimeError("常驻进程发布失败")
+        publish_title = (result.get("titles") or [source.stem])[0]
+        self.log("\n══════════════════════════════════════", "dim")
+        self.log(f"  🎉 发布成功！「{publish_title}」已推送到远程仓库", "success")
+        self.log("══════════════════════════════════════", "dim")
+
     def _publish_done(self):
         self._publishing = False
+        self._cancel = None
         self.publish_btn.configure(state="normal", text="🚀  一键发布")
-
-    # ── 图片迁移 ──
-
-    def _migrate_images(self, content: str, md_path: Path) -> str:
-        ASSETS_DIR.mkdir(parents=True, exist_ok=True)
-        count = 0
-
-        # 标准 Markdown 图片
-        def _replace_md(m):
-            nonlocal count
-            alt, raw = m.group(1), m.group(2).strip()
-            if raw.startswith(("/assets/", "/images/", "http://", "https://")):
-                return m.group(0)
-            img = find_image_file(raw, md_path)
-            if img:
-                dest = self._copy_image(img)
-                count += 1
-                self.log(f"  📷 {img.name} → public/assets/{dest.name}", "success")
-                return f"![{alt}](/assets/{dest.name})"
-            else:
-                self.log(f"  ⚠ 未找到图片「{raw}」，保留原始引用", "warning")
-                return m.group(0)
-
-        content = re.sub(r"!\[([^\]]*)\]\((?!https?://)([^)]+)\)", _replace_md, content)
-
-        # Obsidian Wiki 链接
-        def _replace_wiki(m):
-            nonlocal count
-            ref = m.group(1).strip()
-            alt_part = m.group(2)
-            alt = alt_part[1:].strip() if alt_part else Path(ref).stem
-            if Path(ref).suffix.lower() not in IMAGE_EXTENSIONS:
-                return m.group(0)
-            img = find_image_file(ref, md_path)
-            if img:
-                dest = self._copy_image(img)
-                count += 1
-                self.log(f"  📷 {img.name} → public/assets/{dest.name}", "success")
-                return f"![{alt}](/assets/{dest.name})"
-            else:
-                self.log(f"  ⚠ 未找到图片「{ref}」，保留原始引用", "warning")
-                return m.group(0)
-
-        content = re.sub(r"!\[\[([^\]|]+?)(\|[^\]]*)?\]\]", _replace_wiki, content)
-
-        if count == 0:
-            self.log("  ℹ 未发现需要迁移的本地图片", "dim")
-        else:
-            self.log(f"  ✔ 共迁移 {count} 张图片", "success")
-        return content
+        self.preview_btn.configure(state="normal", text="🔍  预览发布计划")
+        self.cancel_btn.pack_forget()
+        self.progress_row.pack_forget()
 
     @staticmethod
-    def _copy_image(src: Path) -> Path:
-        dest = ASSETS_DIR / src.name
-        if dest.exists() and dest.stat().st_size != src.stat().st_size:
-            ts = datetime.now().strftime("%Y%m%d%H%M%S")
-            dest = ASSETS_DIR / f"{src.stem}_{ts}{src.suffix}"
-        shutil.copy2(str(src), str(dest))
-        return dest
+    def _backup(backups: dict[Path, str | None], path: Path):
+        """写入 path 之前记录其原内容，同一文件只记录第一次。"""
+        if path not in backups:
+            backups[path] = path.read_text(encoding="utf-8") if path.exists() else None
+
+    def _rollback(self, created: list[Path], backups: dict[Path, str | None]):
+        """
+        取消发布后的回滚（提交之前）：删除本次新建的附件，backups 中记录的文件（文章、
+        related-posts.json、posts.json）恢复为写入前的内容或删除；暂存区恢复为 git add 之前的状态，
+        git add . 顺带暂存的缓存文件等一并取消暂存，发布前已暂存的改动保持不变。
+        """
+        self.log("\n▸ 正在回滚...", "warning")
+        for path in created:
+            if not path.exists():
+                continue  # 复制到一半被取消，尚未落地
+            try:
+                path.unlink()
+                self.log(f"  🗑 已删除附件：{path.name}", "dim")
+            except OSError as e:
+                self.log(f"  ⚠️  无法删除 {path}：{e}", "warning")
+        for path, original in backups.items():
+            try:
+                if original is None:
+                    if path.exists():
+                        path.unlink()
+                        self.log(f"  🗑 已删除：{path.name}", "dim")
+                elif not path.exists() or path.read_text(encoding="utf-8") != original:
+                    publish.write_text_atomic(path, original)
+                    self.log(f"  ↩ 已恢复：{path.name}", "dim")
+            except OSError as e:
+                self.log(f"  ⚠️  无法恢复 {path}：{e}", "warning")
+        if self._index_tree:
+            ok, out = self._run_git(["read-tree", self._index_tree])
+            if not ok:
+                self.log(f"  ⚠️  无法恢复暂存区：{out}", "warning")
+            return
+        # 没有记录到 git add 之前的暂存区（尚未暂存，或 write-tree 失败）：只取消暂存本次写入的文件
+        in_repo = [p for p in created + list(backups) if publish.VALAXY_ROOT in p.parents]
+        if in_repo:
+            self._run_git(["reset", "-q", "--"] + [str(p) for p in in_repo])
 
     # ── 构建最终内容 ──
 
-    def _build_final_content(self, content: str) -> str:
-        meta, body = parse_front_matter(content)
+    def _build_final_content(self, content: str, quiet: bool = False) -> str:
+        meta, _ = publish.parse_front_matter(content)
         title = self.title_entry.get().strip()
         date = self.date_entry.get().strip() or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         category = self.cat_entry.get().strip()
@@ -795,24 +1339,27 @@ class PublishApp(ctk.CTk):
 
         if meta is None:
             meta = {}
-            self.log("  ✔ 自动生成 Front Matter", "success")
-        else:
+            if not quiet:
+                self.log("  ✔ 自动生成 Front Matter", "success")
+        elif not quiet:
             self.log("  ✔ 已有 Front Matter，进行补全", "success")
 
+        changes = {}
         if title:
-            meta["title"] = title
+            changes["title"] = title
         if date:
-            meta["date"] = date
+            changes["date"] = date
         if "updated" not in meta:
-            meta["updated"] = date
+            changes["updated"] = date
         if category:
-            meta["categories"] = [category]
+            changes["categories"] = [category]
         if tags:
-            meta["tags"] = tags
+            changes["tags"] = tags
         if excerpt:
-            meta["excerpt"] = excerpt
+            changes["excerpt"] = excerpt
 
-        return dump_front_matter(meta, body)
+        # 只改写有变化的字段，其余字段逐字节保留；没有变化时内容原样返回
+        return publish.update_front_matter(content, changes)
 
     # ── Git 操作 ──
 
@@ -820,7 +1367,7 @@ class PublishApp(ctk.CTk):
         try:
             r = subprocess.run(
                 ["git"] + args,
-                cwd=str(VALAXY_ROOT),
+                cwd=str(publish.VALAXY_ROOT),
                 capture_output=True, text=True, encoding="utf-8",
             )
             output = (r.stdout.strip() + "\n" + r.stderr.strip()).strip()
@@ -830,19 +1377,41 @@ class PublishApp(ctk.CTk):
         except Exception as e:
             return False, str(e)
 
-    def _git_publish(self, title: str):
+    def _git_stage(self, title: str, timings: dict) -> bool:
+        """queued_git_publish 的执行函数：失败时 _git_publish 会抛出异常。"""
+        self._git_publish(title, timings)
+        return True
+
+    def _git_publish(self, title: str, timings: dict):
+        # 每一步之前检查取消；提交完成后取消只跳过推送
+        cancel = self._cancel
+
         # add
+        cancel.check()
+        self._set_progress(0.0, "git add")
         self.log("  ▶ git add .", "dim")
+        t0 = time.perf_counter()
+        ok, tree = self._run_git(["write-tree"])
+        self._index_tree = tree if ok else None
         ok, out = self._run_git(["add", "."])
+        timings["git_add"] = round(time.perf_counter() - t0, 3)
         if not ok:
             self.log(f"  ✘ git add 失败：{out}", "error")
             raise RuntimeError("git add 失败")
         self.log("    ✔ 暂存完成", "success")
 
+        # 推送前检查站内引用与 Front Matter
+        if not publish.verify_staged_posts(log=self.log_auto):
+            raise RuntimeError("推送前检查未通过")
+
         # commit
+        cancel.check()
+        self._set_progress(1 / 3, "git commit")
         msg = f"feat: publish {title}"
         self.log(f'  ▶ git commit -m "{msg}"', "dim")
+        t0 = time.perf_counter()
         ok, out = self._run_git(["commit", "-m", msg])
+        timings["git_commit"] = round(time.perf_counter() - t0, 3)
         if not ok:
             if "nothing to commit" in out:
                 self.log("    ℹ 没有新的更改需要提交", "warning")
@@ -851,10 +1420,15 @@ class PublishApp(ctk.CTk):
                 raise RuntimeError("git commit 失败")
         else:
             self.log("    ✔ 提交完成", "success")
+        self._committed = True
 
         # push
+        cancel.check()
+        self._set_progress(2 / 3, "git push")
         self.log("  ▶ git push", "dim")
+        t0 = time.perf_counter()
         ok, out = self._run_git(["push"])
+        timings["git_push"] = round(time.perf_counter() - t0, 3)
         if not ok:
             self.log(f"  ✘ git push 失败：{out}", "error")
             self.log("    请检查网络连接或远程仓库配置", "warning")
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""publish.py 测试的公共夹具：把博客根目录、缓存目录等配置指向临时目录。"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import publish  # noqa: E402
+
+
+@pytest.fixture
+def blog_root(tmp_path, monkeypatch) -> Path:
+    """临时的 Valaxy 站点根目录（pages/posts、public/assets、.publish-cache 均在其中）。"""
+    root = tmp_path / "site"
+    (root / "pages" / "posts").mkdir(parents=True)
+    (root / "public" / "assets").mkdir(parents=True)
+    monkeypatch.setattr(publish, "VALAXY_ROOT", root)
+    monkeypatch.setattr(publish, "POSTS_DIR", root / "pages" / "posts")
+    monkeypatch.setattr(publish, "ASSETS_DIR", root / "public" / "assets")
+    monkeypatch.setattr(publish, "CACHE_DIR", root / ".publish-cache")
+    monkeypatch.setattr(publish, "RELATED_POSTS_FILE", root / "public" / "related-posts.json")
+    monkeypatch.setattr(publish, "POSTS_MANIFEST_FILE", root / "public" / "posts.json")
+    monkeypatch.setattr(publish, "OBSIDIAN_VAULT", tmp_path / "vault")
+    return root
+
+
+class LocalServer:
+    """
+    本机 HTTP 替身：handler(request) 返回 (状态码, 响应头, 响应体)。
+    requests 按到达顺序记录 (方法, 路径, 客户端端口, 时间)，用于断言连接复用与节流。
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests: list[tuple[str, str, int, float]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def _handle(self):
+                import time
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                server.requests.append((self.command, self.path, self.client_address[1], time.monotonic()))
+                status, headers, payload = server.handler(self, body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(payload)
+
+            do_GET = do_HEAD = do_PUT = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.netloc = f"127.0.0.1:{self.httpd.server_address[1]}"
+        self.url = f"http://{self.netloc}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def local_server():
+    """用法：server = local_server(handler)；测试结束时自动关闭。"""
+    servers = []
+
+    def start(handler) -> LocalServer:
+        server = LocalServer(handler)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""update_front_matter：只改动变化的字段，其余字节原样保留。"""
+
+import pytest
+
+import publish
+
+QSL_CARD = (
+    "---\n"
+    "title: QSL CARD\n"
+    "date: '2026-04-01 12:24:37'\n"
+    "updated: '2026-04-01 12:24:37'\n"
+    "categories:\n"
+    "- 技术\n"
+    "tags:\n"
+    "- HAM\n"
+    "- 业余无线电\n"
+    "---\n"
+    "##正面\n"
+)
+
+
+def test_unchanged_values_return_identical_content():
+    changes = {"title": "QSL CARD", "date": "2026-04-01 12:24:37", "tags": ["HAM", "业余无线电"],
+               "categories": ["技术"]}
+    assert publish.update_front_matter(QSL_CARD, changes) is QSL_CARD
+
+
+def test_label_order_is_not_a_change():
+    content = "---\ntags:\n  - zeta\n  - alpha\n---\nbody\n"
+    assert publish.update_front_matter(content, {"tags": ["alpha", "zeta"]}) is content
+
+
+def test_quoted_dates_survive_unrelated_edits():
+    out = publish.update_front_matter(QSL_CARD, {"excerpt": "卡片"})
+    assert out == QSL_CARD.replace("- 业余无线电\n", "- 业余无线电\nexcerpt: 卡片\n")
+    assert "date: '2026-04-01 12:24:37'\n" in out
+
+
+def test_changed_key_is_replaced_in_place():
+    out = publish.update_front_matter(QSL_CARD, {"tags": ["HAM"]})
+    assert out == QSL_CARD.replace("tags:\n- HAM\n- 业余无线电\n", "tags:\n  - HAM\n")
+
+
+def test_crlf_and_comments_are_preserved():
+    content = ("---\r\ntitle: \"A\"  # 标题\r\n\r\n# 分类\r\ncategories: [x]\r\n"
+               "long: |\r\n  a\r\n  b\r\n---\r\n\r\nbody\r\n")
+    out = publish.update_front_matter(content, {"categories": ["y"], "excerpt": "e"})
+    assert out == ("---\r\ntitle: \"A\"  # 标题\r\n\r\n# 分类\r\ncategories:\r\n  - y\r\n"
+                   "long: |\r\n  a\r\n  b\r\nexcerpt: e\r\n---\r\n\r\nbody\r\n")
+
+
+@pytest.mark.parametrize("content, header", [
+    ("---\n\n---\nbody", "---\n"),
+    ("---\n# 注释\n---\nbody", "---\n# 注释\n"),
+    ("---\r\n# 注释\r\n---\r\nbody", "---\r\n# 注释\r\n"),
+])
+def test_empty_or_comment_only_header(content, header):
+    eol = "\r\n" if "\r\n" in content else "\n"
+    out = publish.update_front_matter(content, {"title": "T"})
+    assert out == f"{header}title: T{eol}---{eol}body"
+
+
+def test_without_front_matter_a_header_is_created():
+    out = publish.update_front_matter("正文\n", {"title": "T", "date": "2026-01-01 08:00:00"})
+    meta, body = publish.parse_front_matter(out)
+    assert body == "正文\n"
+    assert meta["title"] == "T"
+
+
+def test_unparseable_layout_falls_back_to_full_dump():
+    content = "---\ntitle: a\ntitle: b\n---\nbody\n"  # 重复的键无法逐字段定位
+    out = publish.update_front_matter(content, {"excerpt": "e"})
+    meta, body = publish.parse_front_matter(out)
+    assert meta == {"title": "b", "excerpt": "e"} and body == "body\n"
+
+
+@pytest.mark.parametrize("raw", ["2026/04/01 10:00", "2026-4-1", "2026-04-01T10:00:00"])
+def test_schema_check_and_normalize_share_date_parsing(raw):
+    meta = {"title": "t", "date": raw}
+    assert publish.check_front_matter_schema(meta, is_post=False) == []
+    assert isinstance(publish._canonical_datetime(raw), publish.datetime)
+
+
+def test_schema_check_rejects_unparseable_date():
+    problems = publish.check_front_matter_schema({"date": "明天"}, is_post=False)
+    assert [key for key, _ in problems] == ["date"]
+
+
+def test_dump_front_matter_is_a_plain_serializer():
+    out = publish.dump_front_matter({"tags": "solo", "date": "2026/04/01 10:00"}, "body\n")
+    assert out == "---\ntags: solo\ndate: 2026/04/01 10:00\n---\nbody\n"
+
+
+def test_new_front_matter_is_normalized():
+    out = publish.update_front_matter("body\n", {"tags": "solo", "title": "t", "date": "2026/04/01 10:00"})
+    assert out == "---\ntitle: t\ndate: 2026-04-01 10:00:00\nupdated: 2026-04-01 10:00:00\ntags:\n  - solo\n---\nbody\n"
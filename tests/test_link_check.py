@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""外部链接检查（check_links / _HostChecker）：连接复用、同域名节流、TTL 缓存与状态分类。"""
+
+import publish
+
+ROUTES = {
+    "/ok": (200, {}),
+    "/moved": (301, {"Location": "/ok"}),
+    "/missing": (404, {}),
+    "/broken": (500, {}),
+    "/busy": (429, {}),
+}
+
+
+def site_handler(request, body):
+    path = request.path.split("?", 1)[0]
+    if path == "/no-head":
+        # 不支持 HEAD 的站点：HEAD 返回 405，GET 正常
+        return (405 if request.command == "HEAD" else 200), {}, b"ok"
+    status, headers = ROUTES.get(path, (404, {}))
+    return status, headers, b"x"
+
+
+def quiet(*_):
+    pass
+
+
+def test_statuses_are_classified(blog_root, local_server, monkeypatch):
+    monkeypatch.setattr(publish, "LINK_CHECK_HOST_INTERVAL", 0)
+    server = local_server(site_handler)
+    urls = [server.url + path for path in ("/ok", "/moved", "/missing", "/broken", "/busy", "/no-head")]
+    results = publish.check_links(urls, log=quiet)
+
+    states = {url[len(server.url):]: publish._link_state(results[url]) for url in urls}
+    assert states == {"/ok": "ok", "/moved": "redirect", "/missing": "broken", "/broken": "broken",
+                      "/busy": "unknown", "/no-head": "ok"}
+    assert results[server.url + "/moved"]["location"] == server.url + "/ok"
+    # HEAD 返回 404 / 405 时再用 GET 确认
+    methods = [(m, p) for m, p, _, _ in server.requests if p in ("/missing", "/no-head")]
+    assert ("GET", "/missing") in methods and ("GET", "/no-head") in methods
+
+
+def test_connection_is_reused_per_lane(blog_root, local_server, monkeypatch):
+    monkeypatch.setattr(publish, "LINK_CHECK_HOST_INTERVAL", 0)
+    monkeypatch.setattr(publish, "LINK_CHECK_PER_HOST", 1)
+    server = local_server(site_handler)
+    urls = [f"{server.url}/ok?page={i}" for i in range(6)]
+    publish.check_links(urls, log=quiet)
+
+    assert len(server.requests) == 6
+    assert len({port for _, _, port, _ in server.requests}) == 1
+
+
+def test_same_host_requests_are_throttled(blog_root, local_server, monkeypatch):
+    interval = 0.15
+    monkeypatch.setattr(publish, "LINK_CHECK_HOST_INTERVAL", interval)
+    monkeypatch.setattr(publish, "LINK_CHECK_PER_HOST", 2)
+    server = local_server(site_handler)
+    publish.check_links([f"{server.url}/ok?n={i}" for i in range(5)], log=quiet)
+
+    times = sorted(t for _, _, _, t in server.requests)
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    # 两条连接共用一个节流器：任意两次请求之间都至少间隔 interval（留一点计时误差）
+    assert len(times) == 5
+    assert min(gaps) >= interval * 0.8
+
+
+def test_ttl_cache(blog_root, local_server, monkeypatch):
+    monkeypatch.setattr(publish, "LINK_CHECK_HOST_INTERVAL", 0)
+    server = local_server(site_handler)
+    urls = [server.url + "/ok", server.url + "/broken", server.url + "/busy"]
+
+    publish.check_links(urls, log=quiet)
+    first = len(server.requests)
+
+    # 未过期：ok / broken 直接复用缓存；429 不缓存，重新检查
+    results = publish.check_links(urls, ttl_hours=1, log=quiet)
+    assert [p for _, p, _, _ in server.requests[first:]] == ["/busy"]
+    assert results[server.url + "/broken"]["status"] == 500
+
+    # 过期或 force 时重新检查全部
+    second = len(server.requests)
+    publish.check_links(urls, ttl_hours=0, log=quiet)
+    assert {p for _, p, _, _ in server.requests[second:]} == {"/ok", "/broken", "/busy"}
+    third = len(server.requests)
+    publish.check_links(urls, ttl_hours=1, force=True, log=quiet)
+    assert {p for _, p, _, _ in server.requests[third:]} == {"/ok", "/broken", "/busy"}
+
+
+def test_connection_errors_are_not_cached(blog_root, monkeypatch):
+    monkeypatch.setattr(publish, "LINK_CHECK_HOST_INTERVAL", 0)
+    url = "http://127.0.0.1:9/unreachable"  # discard 端口，本机无服务
+    result = publish.check_links([url], timeout=2, log=quiet)[url]
+    assert result["status"] == 0 and result["error"]
+    cache = (publish.CACHE_DIR / publish.LINK_CACHE_FILE).read_text(encoding="utf-8")
+    assert url not in cache
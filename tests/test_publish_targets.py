@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""publish_to_targets：镜像目标同步整批文章，取消时不被当作普通失败吞掉。"""
+
+import pytest
+
+import publish
+
+
+def _targets(blog_root, tmp_path):
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    return [
+        {"name": "main", "root": blog_root, "push_args": []},
+        {"name": "mirror", "root": mirror, "push_args": []},
+    ]
+
+
+def test_mirror_receives_every_post_and_asset(blog_root, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(publish, "queued_git_publish",
+                        lambda title, log=print, runner=None, timings=None, root=None: calls.append(root) or True)
+    (publish.ASSETS_DIR / "a.png").write_bytes(b"png")
+    posts = [("p1.md", "---\ntitle: a\n---\n![](/assets/a.png)\n"), ("p2.md", "---\ntitle: b\n---\nb\n")]
+    targets = _targets(blog_root, tmp_path)
+
+    results = publish.publish_to_targets(targets, posts, "a、b", log=lambda *_: None)
+
+    mirror = targets[1]["root"]
+    assert results == {"main": True, "mirror": True}
+    assert sorted(p.name for p in (mirror / "pages" / "posts").iterdir()) == ["p1.md", "p2.md"]
+    assert (mirror / "public" / "assets" / "a.png").read_bytes() == b"png"
+    assert sorted(map(str, calls)) == sorted(["None", str(mirror)])
+
+
+def test_cancellation_propagates(blog_root, tmp_path, monkeypatch):
+    def cancelled(title, log=print, runner=None, timings=None, root=None):
+        raise publish.PublishCancelled("发布已取消")
+
+    monkeypatch.setattr(publish, "queued_git_publish", cancelled)
+    with pytest.raises(publish.PublishCancelled):
+        publish.publish_to_targets(_targets(blog_root, tmp_path), [("p.md", "x\n")], "t", log=lambda *_: None)
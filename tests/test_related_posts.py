@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""update_related_posts：稀疏 top-k 邻居、增量更新与缓存损坏时的回退。"""
+
+import json
+
+import pytest
+
+import publish
+
+pytest.importorskip("numpy")
+
+WORDS = ["radio", "antenna", "python", "numpy", "camera", "lens", "travel", "hiking", "coffee", "tea"]
+
+
+def _write_posts(blog_root, bodies: dict[str, str]):
+    for slug, body in bodies.items():
+        (blog_root / "pages" / "posts" / f"{slug}.md").write_text(f"---\ntitle: {slug}\n---\n{body}\n", encoding="utf-8")
+
+
+def _bodies() -> dict[str, str]:
+    return {f"p{i}": " ".join(WORDS[(i + j) % len(WORDS)] for j in range(4)) for i in range(10)}
+
+
+def _related(blog_root) -> dict:
+    return json.loads((blog_root / "public" / "related-posts.json").read_text(encoding="utf-8"))
+
+
+def _rebuild(blog_root) -> dict:
+    (publish.CACHE_DIR / publish.RELATED_CACHE_FILE).unlink()
+    publish.update_related_posts(top_k=3, log=lambda *_: None)
+    return _related(blog_root)
+
+
+def test_cache_keeps_only_top_k_neighbours(blog_root):
+    _write_posts(blog_root, _bodies())
+    assert publish.update_related_posts(top_k=3, log=lambda *_: None)
+    cache = json.loads((publish.CACHE_DIR / publish.RELATED_CACHE_FILE).read_text(encoding="utf-8"))
+    assert set(cache["neighbours"]) == set(_bodies())
+    assert all(len(entries) <= 3 for entries in cache["neighbours"].values())
+    assert not (publish.CACHE_DIR / "related-matrix.npz").exists()
+
+
+def test_incremental_update_matches_full_rebuild(blog_root):
+    bodies = _bodies()
+    _write_posts(blog_root, bodies)
+    publish.update_related_posts(top_k=3, log=lambda *_: None)
+
+    # 只改词频、不改词表（IDF 不变）：相似度有升有降，增量结果应与全量重建一致
+    bodies["p3"] = bodies["p3"] + " " + bodies["p3"].split()[0]
+    bodies["p7"] = bodies["p7"] + (" " + bodies["p7"].split()[-1]) * 20
+    _write_posts(blog_root, {"p3": bodies["p3"], "p7": bodies["p7"]})
+    lines = []
+    assert publish.update_related_posts(top_k=3, log=lines.append)
+    incremental = _related(blog_root)
+
+    assert incremental == _rebuild(blog_root)
+    assert "10/10" not in lines[-1]
+
+
+def test_unchanged_posts_skip_recomputation(blog_root):
+    _write_posts(blog_root, _bodies())
+    publish.update_related_posts(top_k=3, log=lambda *_: None)
+    lines = []
+    assert not publish.update_related_posts(top_k=3, log=lines.append)
+    assert "无需更新" in lines[-1]
+
+
+@pytest.mark.parametrize("payload", ["{not json", "[1, 2]", '{"version": 2, "posts": [], "neighbours": 1}',
+                                     '{"version": 2, "posts": {}, "top_k": 3, "neighbours": {"p1": 5}}'])
+def test_corrupt_cache_is_a_miss(blog_root, payload):
+    _write_posts(blog_root, _bodies())
+    publish.update_related_posts(top_k=3, log=lambda *_: None)
+    expected = _related(blog_root)
+    (publish.CACHE_DIR / publish.RELATED_CACHE_FILE).write_text(payload, encoding="utf-8")
+    (blog_root / "public" / "related-posts.json").unlink()
+
+    assert publish.update_related_posts(top_k=3, log=lambda *_: None)
+    assert _related(blog_root) == expected
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""VaultNoteIndex：进程内复用与按目录修改时间的增量刷新。"""
+
+import os
+
+import pytest
+
+import publish
+
+
+@pytest.fixture
+def vault(blog_root, tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    (root / "a" / "b").mkdir(parents=True)
+    (root / ".obsidian").mkdir()
+    (root / "top.md").write_text("top", encoding="utf-8")
+    (root / "a" / "b" / "Deep.md").write_text("deep", encoding="utf-8")
+    (root / ".obsidian" / "hidden.md").write_text("x", encoding="utf-8")
+    monkeypatch.setattr(publish.VaultNoteIndex, "_memo", {})
+    return root
+
+
+def _count_scans(monkeypatch) -> list:
+    scanned = []
+    original = publish.VaultNoteIndex._scan_dir
+
+    def counting(path, mtime):
+        scanned.append(path)
+        return original(path, mtime)
+
+    monkeypatch.setattr(publish.VaultNoteIndex, "_scan_dir", staticmethod(counting))
+    return scanned
+
+
+def test_index_resolves_notes_and_skips_hidden_dirs(vault):
+    index = publish.VaultNoteIndex.load(vault)
+    assert index.resolve("deep", vault / "top.md") == vault / "a" / "b" / "Deep.md"
+    assert index.resolve("hidden", vault / "top.md") is None
+
+
+def test_load_reuses_index_and_rescans_only_changed_dirs(vault, monkeypatch):
+    index = publish.VaultNoteIndex.load(vault)
+    scanned = _count_scans(monkeypatch)
+
+    assert publish.VaultNoteIndex.load(vault) is index
+    assert scanned == []
+
+    (vault / "a" / "b" / "new.md").write_text("n", encoding="utf-8")
+    os.utime(vault / "a" / "b", ns=(0, 10 ** 9))  # 保证修改时间变化（粗粒度时间戳的文件系统）
+    assert publish.VaultNoteIndex.load(vault).resolve("new", vault / "top.md") == vault / "a" / "b" / "new.md"
+    assert scanned == [vault / "a" / "b"]
+
+
+def test_directory_table_persists_across_processes(vault, monkeypatch):
+    publish.VaultNoteIndex.load(vault)
+    assert (publish.CACHE_DIR / publish.VAULT_INDEX_CACHE).is_file()
+
+    monkeypatch.setattr(publish.VaultNoteIndex, "_memo", {})
+    scanned = _count_scans(monkeypatch)
+    index = publish.VaultNoteIndex.load(vault)
+    assert scanned == []
+    assert index.resolve("top", vault / "a" / "b" / "Deep.md") == vault / "top.md"